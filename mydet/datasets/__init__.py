@@ -6,6 +6,7 @@ from .base_semseg_dataset import BaseSegDataset
 # from .base_video_dataset import BaseVideoDataset
 from .cityscapes import CityscapesDataset
 from .coco import CocoDataset
+from .collate import padded_collate
 # from .coco_caption import CocoCaptionDataset
 # from .coco_panoptic import CocoPanopticDataset
 # from .coco_semantic import CocoSegDataset
@@ -41,5 +42,5 @@ __all__ = [
     'ReIDDataset', 'YouTubeVISDataset', 'TrackAspectRatioBatchSampler',
     'ADE20KPanopticDataset', 'CocoCaptionDataset', 'RefCocoDataset',
     'BaseSegDataset', 'ADE20KSegDataset', 'CocoSegDataset',
-    'ADE20KInstanceDataset', 'iSAIDDataset'
+    'ADE20KInstanceDataset', 'iSAIDDataset', 'padded_collate'
 ]
@@ -0,0 +1,267 @@
+import hashlib
+import json
+import os
+import os.path as osp
+import pickle
+import shutil
+import tempfile
+from collections.abc import Sequence
+from typing import List, Optional, Union
+
+import numpy as np
+
+
+def hash_file(path: str, chunk_size: int = 1 << 22) -> str:
+    """Compute the sha1 hex digest of a local file chunk by chunk."""
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def get_cache_key(prefix: str, **settings) -> str:
+    """Combine a prefix (e.g. the hash of an annotation file) with the
+    settings used to parse the annotations into a single cache key."""
+    settings = json.dumps(settings, sort_keys=True, default=str)
+    return hashlib.sha1(f'{prefix}:{settings}'.encode()).hexdigest()
+
+
+class ColumnarAnnotations:
+    """Column-oriented storage of the box annotations of a dataset.
+
+    Image level columns have one row per image. Instance level columns are
+    the concatenation of all images and the instances of the ``i``-th image
+    are ``inst_offsets[i]:inst_offsets[i + 1]``. File names are interned into
+    a single utf-8 byte blob ``names`` sliced by ``name_offsets``.
+
+    Every column is saved as an ``.npy`` file in ``cache_dir`` and opened with
+    ``np.memmap`` by :meth:`load`, so all processes reading the same cache
+    share one read-only copy through the page cache.
+
+    Note:
+        Only boxes are cached, instance masks are not kept.
+    """
+    VERSION = 1
+    COLUMNS = {
+        # image level
+        'img_ids': np.int64,
+        'widths': np.int32,
+        'heights': np.int32,
+        'has_cat': np.bool_,
+        'name_offsets': np.int64,
+        'inst_offsets': np.int64,
+        # instance level
+        'bboxes': np.float32,
+        'labels': np.int32,
+        'ignore_flags': np.uint8,
+        # others
+        'names': np.uint8,
+        'cat_ids': np.int64,
+    }
+
+    def __init__(self, cache_dir: Optional[str] = None, **columns) -> None:
+        self.cache_dir = cache_dir
+        for name, dtype in self.COLUMNS.items():
+            setattr(self, name, np.asanyarray(columns[name], dtype=dtype))
+        self.bboxes = self.bboxes.reshape(-1, 4)
+
+    def __len__(self) -> int:
+        return len(self.img_ids)
+
+    @property
+    def num_instances(self) -> np.ndarray:
+        """np.ndarray: Number of instances of each image."""
+        return np.diff(self.inst_offsets)
+
+    def get_file_name(self, idx: int) -> str:
+        start, end = self.name_offsets[idx], self.name_offsets[idx + 1]
+        return self.names[start:end].tobytes().decode('utf-8')
+
+    @classmethod
+    def from_data_list(cls, data_list: List[dict], file_names: List[str],
+                       has_cat: List[bool],
+                       cat_ids: List[int]) -> 'ColumnarAnnotations':
+        """Build columns from parsed data information.
+
+        Args:
+            data_list (list[dict]): Data information returned by
+                ``parse_data_info``.
+            file_names (list[str]): File name of each image, relative to the
+                image prefix.
+            has_cat (list[bool]): Whether each image contains annotations of
+                the required categories.
+            cat_ids (list[int]): Category ids of the dataset classes.
+        """
+        names = [name.encode('utf-8') for name in file_names]
+        name_offsets = np.zeros(len(names) + 1, dtype=np.int64)
+        np.cumsum([len(name) for name in names], out=name_offsets[1:])
+        instances = [
+            instance for data_info in data_list
+            for instance in data_info['instances']
+        ]
+        inst_offsets = np.zeros(len(data_list) + 1, dtype=np.int64)
+        np.cumsum([len(data_info['instances']) for data_info in data_list],
+                  out=inst_offsets[1:])
+        return cls(
+            img_ids=[data_info['img_id'] for data_info in data_list],
+            widths=[data_info['width'] for data_info in data_list],
+            heights=[data_info['height'] for data_info in data_list],
+            has_cat=has_cat,
+            name_offsets=name_offsets,
+            inst_offsets=inst_offsets,
+            bboxes=np.array([instance['bbox'] for instance in instances],
+                            dtype=np.float32).reshape(-1, 4),
+            labels=[instance['bbox_label'] for instance in instances],
+            ignore_flags=[instance['ignore_flag'] for instance in instances],
+            names=np.frombuffer(b''.join(names), dtype=np.uint8),
+            cat_ids=cat_ids)
+
+    def dump(self, cache_dir: str) -> None:
+        """Save all columns to ``cache_dir``.
+
+        The columns are written to a temporary directory which is then renamed
+        to ``cache_dir``, so concurrent writers never expose a partial cache.
+        """
+        parent_dir = osp.dirname(osp.abspath(cache_dir))
+        os.makedirs(parent_dir, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(
+            prefix=f'.{osp.basename(cache_dir)}.', dir=parent_dir)
+        for name in self.COLUMNS:
+            np.save(osp.join(tmp_dir, f'{name}.npy'), getattr(self, name))
+        try:
+            os.rename(tmp_dir, cache_dir)
+        except OSError:
+            # another process has already written the same cache
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not osp.isdir(cache_dir):
+                raise
+
+    @classmethod
+    def load(cls, cache_dir: str) -> 'ColumnarAnnotations':
+        """Open the columns saved in ``cache_dir`` as read-only memmaps."""
+        columns = {
+            name: np.load(osp.join(cache_dir, f'{name}.npy'), mmap_mode='r')
+            for name in cls.COLUMNS
+        }
+        return cls(cache_dir=cache_dir, **columns)
+
+    def __getstate__(self) -> dict:
+        # memmaps would be pickled as in-memory copies, reopen them instead
+        if self.cache_dir is not None:
+            return dict(cache_dir=self.cache_dir)
+        return self.__dict__.copy()
+
+    def __setstate__(self, state: dict) -> None:
+        if set(state) == {'cache_dir'}:
+            state = ColumnarAnnotations.load(state['cache_dir']).__dict__
+        self.__dict__.update(state)
+
+
+class ColumnarDataList(Sequence):
+    """A lazy, read-only ``data_list`` backed by :class:`ColumnarAnnotations`.
+
+    Data information is only built when an item is accessed and has the same
+    format as ``CocoDataset.parse_data_info``.
+
+    Args:
+        annotations (ColumnarAnnotations): The annotation columns.
+        img_prefix (str): Prefix of image paths.
+        seg_prefix (str, optional): Prefix of semantic segmentation map
+            paths. Defaults to None.
+        seg_map_suffix (str): Suffix of semantic segmentation map files.
+            Defaults to '.png'.
+        extra_info (dict, optional): Extra items added to every data
+            information. Defaults to None.
+        indices (np.ndarray, optional): Rows of ``annotations`` in this list.
+            Defaults to None, which means all rows.
+    """
+
+    def __init__(self,
+                 annotations: ColumnarAnnotations,
+                 img_prefix: str,
+                 seg_prefix: Optional[str] = None,
+                 seg_map_suffix: str = '.png',
+                 extra_info: Optional[dict] = None,
+                 indices: Optional[np.ndarray] = None) -> None:
+        self.annotations = annotations
+        self.img_prefix = img_prefix
+        self.seg_prefix = seg_prefix
+        self.seg_map_suffix = seg_map_suffix
+        self.extra_info = extra_info or {}
+        if indices is None:
+            indices = np.arange(len(annotations), dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def select(self, indices: Union[Sequence, np.ndarray,
+                                    slice]) -> 'ColumnarDataList':
+        """Return a new list made of the given items of this list."""
+        return ColumnarDataList(self.annotations, self.img_prefix,
+                                self.seg_prefix, self.seg_map_suffix,
+                                self.extra_info, self.indices[indices])
+
+    def __getitem__(self, idx: Union[int, slice]) -> Union[dict, Sequence]:
+        if isinstance(idx, slice):
+            return self.select(idx)
+        row = int(self.indices[idx])
+        anns = self.annotations
+        file_name = anns.get_file_name(row)
+        if self.seg_prefix:
+            seg_map_path = osp.join(
+                self.seg_prefix,
+                file_name.rsplit('.', 1)[0] + self.seg_map_suffix)
+        else:
+            seg_map_path = None
+        data_info = dict(
+            img_path=osp.join(self.img_prefix, file_name),
+            img_id=int(anns.img_ids[row]),
+            seg_map_path=seg_map_path,
+            height=int(anns.heights[row]),
+            width=int(anns.widths[row]))
+        data_info.update(self.extra_info)
+
+        start, end = anns.inst_offsets[row], anns.inst_offsets[row + 1]
+        data_info['instances'] = [
+            dict(ignore_flag=ignore_flag, bbox=bbox, bbox_label=label)
+            for ignore_flag, bbox, label in zip(
+                anns.ignore_flags[start:end].tolist(),
+                anns.bboxes[start:end].tolist(),
+                anns.labels[start:end].tolist())
+        ]
+        return data_info
+
+
+class SerializedDataList(Sequence):
+    """A read-only ``data_list`` whose items are pickled into one byte array.
+
+    The same layout as ``BaseDataset._serialize_data``: holding two numpy
+    arrays instead of a list of dicts, reference counting never touches the
+    data and forked workers keep sharing the pages of the owner.
+
+    Args:
+        data_list (list[dict]): Data information to serialize.
+    """
+
+    def __init__(self, data_list: List[dict]) -> None:
+        buffers = [
+            np.frombuffer(pickle.dumps(data_info, protocol=4), dtype=np.uint8)
+            for data_info in data_list
+        ]
+        self.data_address = np.cumsum([len(buffer) for buffer in buffers],
+                                      dtype=np.int64)
+        self.data_bytes = np.concatenate(buffers) if len(buffers) > 0 \
+            else np.zeros(0, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return len(self.data_address)
+
+    def __getitem__(self, idx: Union[int, slice]) -> Union[dict, List[dict]]:
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        idx = range(len(self))[idx]
+        start = 0 if idx == 0 else int(self.data_address[idx - 1])
+        end = int(self.data_address[idx])
+        return pickle.loads(memoryview(self.data_bytes[start:end]))
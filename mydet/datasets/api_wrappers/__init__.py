@@ -0,0 +1,6 @@
+from .coco_api import COCO, COCOeval, COCOPanoptic, StreamingCOCO
+from .cocoeval_incremental import IncrementalCOCOeval
+
+__all__ = [
+    'COCO', 'COCOeval', 'COCOPanoptic', 'StreamingCOCO', 'IncrementalCOCOeval'
+]
@@ -1,9 +1,15 @@
+import json
+import re
 import warnings
+from array import array
 from collections import defaultdict
-from typing import List, Optional, Union
+from collections.abc import Mapping
+from typing import Iterator, List, Optional, Tuple, Union
 
+import numpy as np
 import pycocotools
 from pycocotools.coco import COCO as _COCO
+from pycocotools.coco import _isArrayLike
 from pycocotools.cocoeval import COCOeval as _COCOeval
 
 class COCO(_COCO):
@@ -39,8 +45,340 @@ class COCO(_COCO):
     def load_imgs(self, ids):
         return self.loadImgs(ids)
     
+
+class _JsonReader:
+    """Decode a json file value by value without reading it at once."""
+    _WS = re.compile(r'[ \t\n\r]*')
+
+    def __init__(self, f, chunk_size: int = 1 << 22) -> None:
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        # drop the consumed text and append the next chunk
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespaces and return the next character."""
+        while True:
+            self.pos = self._WS.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise ValueError('Unexpected end of the json file.')
+
+    def expect(self, chars: str) -> str:
+        """Consume the next character, which must be one of ``chars``."""
+        char = self.peek()
+        if char not in chars:
+            raise ValueError(f'Expect one of {chars!r} at json position '
+                             f'{self.pos}, but got {char!r}.')
+        self.pos += 1
+        return char
+
+    def decode(self):
+        """Decode the next json value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # a number at the end of the buffer may be truncated
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+
+def iter_coco_json(
+        path: str,
+        array_keys: Tuple[str] = ('images', 'annotations', 'categories'),
+        chunk_size: int = 1 << 22) -> Iterator[Tuple[str, object]]:
+    """Iterate over a coco style json file incrementally.
+
+    Items of the top-level arrays in ``array_keys`` are decoded and yielded
+    one by one as ``(key, item)``. Other top-level values are yielded as a
+    whole as ``(key, value)``.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        reader = _JsonReader(f, chunk_size)
+        reader.expect('{')
+        if reader.peek() == '}':
+            return
+        while True:
+            key = reader.decode()
+            reader.expect(':')
+            if key in array_keys and reader.peek() == '[':
+                reader.expect('[')
+                if reader.peek() == ']':
+                    reader.expect(']')
+                else:
+                    while True:
+                        yield key, reader.decode()
+                        if reader.expect(',]') == ']':
+                            break
+            else:
+                yield key, reader.decode()
+            if reader.expect(',}') == '}':
+                break
+
+
+def _map_ids(ids: np.ndarray,
+             known_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Map ids to row indexes of ``known_ids``.
+
+    Ids that are not in ``known_ids`` are appended as extra rows.
+
+    Returns:
+        tuple[np.ndarray]: Row index of each id and the id of each row.
+    """
+    row_ids = np.concatenate([known_ids, np.setdiff1d(ids, known_ids)])
+    sorter = np.argsort(row_ids, kind='stable')
+    rows = sorter[np.searchsorted(row_ids, ids, sorter=sorter)]
+    return rows, row_ids
+
+
+def _lookup_rows(ids, row_ids: np.ndarray, sorter: np.ndarray) -> np.ndarray:
+    """Get the rows of ``ids`` in ``row_ids``, unknown ids are dropped."""
+    ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+    if len(row_ids) == 0:
+        return ids[:0]
+    pos = np.searchsorted(row_ids, ids, sorter=sorter)
+    rows = sorter[np.minimum(pos, len(row_ids) - 1)]
+    return rows[row_ids[rows] == ids]
+
+
+class _ImgAnnMap(Mapping):
+    """Read-only ``imgToAnns`` view over the image->annotation CSR table."""
+
+    def __init__(self, coco: 'StreamingCOCO') -> None:
+        self.coco = coco
+
+    def __getitem__(self, img_id: int) -> list:
+        rows = _lookup_rows(img_id, self.coco._row_img_ids,
+                            self.coco._img_sorter)
+        if len(rows) == 0:
+            raise KeyError(img_id)
+        start, end = self.coco._img_offsets[rows[0]:rows[0] + 2]
+        return self.coco._anns[start:end]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.coco._row_img_ids.tolist())
+
+    def __len__(self) -> int:
+        return len(self.coco._row_img_ids)
+
+
+class _AnnMap(Mapping):
+    """Read-only ``anns`` view that looks annotations up in the sorted id
+    column."""
+
+    def __init__(self, coco: 'StreamingCOCO') -> None:
+        self.coco = coco
+
+    def __getitem__(self, ann_id: int) -> dict:
+        rows = _lookup_rows(ann_id, self.coco._ann_ids, self.coco._ann_sorter)
+        if len(rows) == 0:
+            raise KeyError(ann_id)
+        return self.coco._anns[rows[0]]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.coco._ann_ids.tolist())
+
+    def __len__(self) -> int:
+        return len(self.coco._ann_ids)
+
+
+class _CatImgMap(Mapping):
+    """Read-only ``catToImgs`` view over per-category image bitsets.
+
+    Different from pycocotools, the image ids of a category are unique and
+    follow the order of images in the annotation file.
+    """
+
+    def __init__(self, bitsets: np.ndarray, row_cat_ids: np.ndarray,
+                 row_img_ids: np.ndarray) -> None:
+        self.bitsets = bitsets
+        self.row_cat_ids = row_cat_ids
+        self.row_img_ids = row_img_ids
+        self.cat_rows = {
+            cat_id: i
+            for i, cat_id in enumerate(row_cat_ids.tolist())
+        }
+
+    def get_mask(self, cat_id: int) -> np.ndarray:
+        """Get the boolean image mask of a category."""
+        row = self.cat_rows.get(cat_id, None)
+        if row is None:
+            return np.zeros(len(self.row_img_ids), dtype=bool)
+        return np.unpackbits(
+            self.bitsets[row], count=len(self.row_img_ids)).astype(bool)
+
+    def __getitem__(self, cat_id: int) -> list:
+        # the same as the defaultdict of pycocotools
+        return self.row_img_ids[self.get_mask(cat_id)].tolist()
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.cat_rows)
+
+    def __len__(self) -> int:
+        return len(self.cat_rows)
+
+
+class StreamingCOCO(COCO):
+    """A memory-efficient drop-in replacement of :class:`COCO`.
+
+    The annotation file is stream-parsed item by item instead of being
+    ``json.load``-ed as a whole, and the indexes are array-backed: a CSR-style
+    image->annotation offset table and category->image bitsets, instead of
+    dicts of lists. The public api (``get_ann_ids``, ``get_img_ids``,
+    ``load_anns``, ``cat_img_map`` ...) is the same as :class:`COCO`.
+
+    Use it by overriding ``COCOAPI`` of a dataset:
+
+        >>> class LargeCocoDataset(CocoDataset):
+        >>>     COCOAPI = StreamingCOCO
+
+    Note:
+        ``dataset`` does not hold the ``annotations`` list.
+    """
+
+    def __init__(self, annotation_file: Optional[str] = None) -> None:
+        # pycocotools' __init__ json.load-s the whole file, skip it
+        self.dataset = dict(images=[], categories=[])
+        self.imgs, self.cats = dict(), dict()
+        self._anns = []
+        # annotation columns
+        ann_ids, ann_img_ids, ann_cat_ids = array('q'), array('q'), array('q')
+        ann_areas, ann_iscrowd = array('d'), array('b')
+        if annotation_file is not None:
+            for key, item in iter_coco_json(annotation_file):
+                if key == 'annotations':
+                    self._anns.append(item)
+                    ann_ids.append(item['id'])
+                    ann_img_ids.append(item['image_id'])
+                    ann_cat_ids.append(item['category_id'])
+                    ann_areas.append(item.get('area', 0))
+                    ann_iscrowd.append(item.get('iscrowd', 0))
+                elif key in ('images', 'categories'):
+                    self.dataset[key].append(item)
+                else:
+                    self.dataset[key] = item
+        self.createIndex(
+            np.array(ann_ids, dtype=np.int64),
+            np.array(ann_img_ids, dtype=np.int64),
+            np.array(ann_cat_ids, dtype=np.int64),
+            np.array(ann_areas, dtype=np.float64),
+            np.array(ann_iscrowd, dtype=np.int8))
+
+    def createIndex(self, ann_ids: np.ndarray, ann_img_ids: np.ndarray,
+                    ann_cat_ids: np.ndarray, ann_areas: np.ndarray,
+                    ann_iscrowd: np.ndarray) -> None:
+        self.imgs = {img['id']: img for img in self.dataset['images']}
+        self.cats = {cat['id']: cat for cat in self.dataset['categories']}
+
+        img_rows, self._row_img_ids = _map_ids(
+            ann_img_ids, np.array(list(self.imgs), dtype=np.int64))
+        cat_rows, row_cat_ids = _map_ids(
+            ann_cat_ids, np.array(list(self.cats), dtype=np.int64))
+        self._img_sorter = np.argsort(self._row_img_ids, kind='stable')
+
+        # sort annotations by image to build the CSR table
+        order = np.argsort(img_rows, kind='stable')
+        self._anns = [self._anns[i] for i in order]
+        self._ann_ids = ann_ids[order]
+        self._ann_cat_ids = ann_cat_ids[order]
+        self._ann_areas = ann_areas[order]
+        self._ann_iscrowd = ann_iscrowd[order]
+        self._ann_sorter = np.argsort(self._ann_ids, kind='stable')
+        self._img_offsets = np.zeros(len(self._row_img_ids) + 1, np.int64)
+        np.cumsum(
+            np.bincount(img_rows, minlength=len(self._row_img_ids)),
+            out=self._img_offsets[1:])
+
+        # category -> image bitsets, bit `i` of a row marks image row `i`
+        bitsets = np.zeros(
+            (len(row_cat_ids), (len(self._row_img_ids) + 7) // 8), np.uint8)
+        np.bitwise_or.at(bitsets, (cat_rows, img_rows >> 3),
+                         (128 >> (img_rows & 7)).astype(np.uint8))
+
+        self.anns = _AnnMap(self)
+        self.imgToAnns = self.img_ann_map = _ImgAnnMap(self)
+        self.catToImgs = self.cat_img_map = _CatImgMap(
+            bitsets, row_cat_ids, self._row_img_ids)
+
+    def _img_ann_inds(self, img_ids) -> np.ndarray:
+        """Get the positions of annotations of the given images."""
+        rows = _lookup_rows(img_ids, self._row_img_ids, self._img_sorter)
+        starts = self._img_offsets[rows]
+        lens = self._img_offsets[rows + 1] - starts
+        # concatenate ranges `starts[i]:starts[i] + lens[i]`
+        shifts = np.repeat(starts - (np.cumsum(lens) - lens), lens)
+        return shifts + np.arange(lens.sum())
+
+    def getAnnIds(self, imgIds=[], catIds=[], areaRng=[], iscrowd=None):
+        imgIds = imgIds if _isArrayLike(imgIds) else [imgIds]
+        catIds = catIds if _isArrayLike(catIds) else [catIds]
+
+        if len(imgIds) == 0:
+            inds = np.arange(len(self._anns))
+        else:
+            inds = self._img_ann_inds(imgIds)
+        valid = np.ones(len(inds), dtype=bool)
+        if len(catIds) > 0:
+            valid &= np.isin(self._ann_cat_ids[inds], catIds)
+        if len(areaRng) > 0:
+            areas = self._ann_areas[inds]
+            valid &= (areas > areaRng[0]) & (areas < areaRng[1])
+        if iscrowd is not None:
+            valid &= self._ann_iscrowd[inds] == iscrowd
+        return self._ann_ids[inds[valid]].tolist()
+
+    def getImgIds(self, imgIds=[], catIds=[]):
+        imgIds = imgIds if _isArrayLike(imgIds) else [imgIds]
+        catIds = catIds if _isArrayLike(catIds) else [catIds]
+
+        if len(catIds) == 0:
+            return list(self.imgs) if len(imgIds) == 0 else list(set(imgIds))
+        mask = self.cat_img_map.get_mask(catIds[0])
+        for cat_id in catIds[1:]:
+            mask &= self.cat_img_map.get_mask(cat_id)
+        ids = self._row_img_ids[mask].tolist()
+        if len(imgIds) > 0:
+            ids = list(set(ids) & set(imgIds))
+        return ids
+
+    def loadAnns(self, ids=[]):
+        if not _isArrayLike(ids):
+            ids = [ids]
+        if len(ids) == 0:
+            return []
+        if len(self._ann_ids) == 0:
+            raise KeyError(ids[0])
+        pos = np.searchsorted(self._ann_ids, ids, sorter=self._ann_sorter)
+        pos = self._ann_sorter[np.minimum(pos, len(self._ann_ids) - 1)]
+        anns = []
+        for ann_id, i in zip(ids, pos.tolist()):
+            if self._ann_ids[i] != ann_id:
+                raise KeyError(ann_id)
+            anns.append(self._anns[i])
+        return anns
+
+
 COCOeval = _COCOeval
 
 # TODO
 class COCOPanoptic(COCO):
-    pass 
\ No newline at end of file
+    pass
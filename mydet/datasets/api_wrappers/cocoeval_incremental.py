@@ -0,0 +1,376 @@
+import datetime
+import time
+from multiprocessing import Pool
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pycocotools.mask as maskUtils
+
+from .coco_api import COCOeval
+
+
+def _match_dets(ious: np.ndarray, gt_ignore: np.ndarray, gt_crowd: np.ndarray,
+                iou_thrs: np.ndarray) -> np.ndarray:
+    """Greedily match the detections of an image and a category to the
+    ground truths for all area ranges and IoU thresholds at once.
+
+    The result is the same as the loops in ``COCOeval.evaluateImg``. For a
+    detection, the matched ground truth is the last one with the highest IoU
+    among the unmatched (or crowd) non-ignored ground truths, and among the
+    ignored ones if no non-ignored ground truth can be matched.
+
+    Args:
+        ious (np.ndarray): IoUs between detections sorted by score and ground
+            truths, with shape (D, G).
+        gt_ignore (np.ndarray): Ignore flags of ground truths in every row,
+            with shape (R, G).
+        gt_crowd (np.ndarray): Crowd flags of ground truths, with shape (G, ).
+        iou_thrs (np.ndarray): IoU threshold of every row, with shape (R, ).
+
+    Returns:
+        np.ndarray: Index of the matched ground truth of every detection in
+        every row, -1 means unmatched, with shape (R, D).
+    """
+    num_rows = len(iou_thrs)
+    num_dets, num_gts = ious.shape
+    matches = np.full((num_rows, num_dets), -1, dtype=np.int64)
+    if num_dets == 0 or num_gts == 0:
+        return matches
+    thrs = np.minimum(iou_thrs, 1 - 1e-10)[:, None]
+    gt_matched = np.zeros((num_rows, num_gts), dtype=bool)
+    min_thr = thrs.min()
+    rows = np.arange(num_rows)
+    for dind in np.flatnonzero(ious.max(axis=1) >= min_thr):
+        iou = ious[dind]
+        cands = (iou >= thrs) & ~(gt_matched & ~gt_crowd)
+        regular = cands & ~gt_ignore
+        cands = np.where(regular.any(axis=1, keepdims=True), regular, cands)
+        found = cands.any(axis=1)
+        if not found.any():
+            continue
+        # the last ground truth with the highest IoU wins the ties
+        m = num_gts - 1 - np.argmax(
+            np.where(cands, iou, -1)[:, ::-1], axis=1)
+        matches[found, dind] = m[found]
+        gt_matched[rows[found], m[found]] = True
+    return matches
+
+
+def _accumulate_cat(scores: np.ndarray, ranks: np.ndarray, tps: np.ndarray,
+                    valids: np.ndarray, npigs: np.ndarray, max_dets: list,
+                    num_iou_thrs: int, rec_thrs: np.ndarray
+                    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Accumulate precision and recall of a category.
+
+    Args:
+        scores (np.ndarray): Scores of the detections in evaluation order,
+            with shape (N, ).
+        ranks (np.ndarray): Rank of each detection among the detections of
+            the same image, with shape (N, ).
+        tps (np.ndarray): Packed true positive flags of each row, with shape
+            (N, ceil(A * T / 8)).
+        valids (np.ndarray): Packed not ignored flags of each row, with the
+            same shape as ``tps``.
+        npigs (np.ndarray): Number of not ignored ground truths of each area
+            range, with shape (A, ).
+        max_dets (list[int]): Max detections per image.
+        num_iou_thrs (int): Number of IoU thresholds.
+        rec_thrs (np.ndarray): Recall thresholds.
+
+    Returns:
+        tuple[np.ndarray]: Precision and scores with shape (T, R, A, M) and
+        recall with shape (T, A, M).
+    """
+    T, R, A, M = num_iou_thrs, len(rec_thrs), len(npigs), len(max_dets)
+    precision = -np.ones((T, R, A, M))
+    recall = -np.ones((T, A, M))
+    score_thrs = -np.ones((T, R, A, M))
+    num_rows = A * T
+    tps = np.unpackbits(tps, axis=1, count=num_rows).astype(bool).T
+    valids = np.unpackbits(valids, axis=1, count=num_rows).astype(bool).T
+    for m, max_det in enumerate(max_dets):
+        keep = np.flatnonzero(ranks < max_det)
+        inds = keep[np.argsort(-scores[keep], kind='mergesort')]
+        dt_scores = scores[inds]
+        num_dets = len(inds)
+        for a in range(A):
+            npig = npigs[a]
+            if npig == 0:
+                continue
+            tp = tps[a * T:(a + 1) * T, inds]
+            valid = valids[a * T:(a + 1) * T, inds]
+            tp_sum = np.cumsum(tp, axis=1).astype(dtype=float)
+            fp_sum = np.cumsum(valid & ~tp, axis=1).astype(dtype=float)
+            rc = tp_sum / npig
+            pr = tp_sum / (fp_sum + tp_sum + np.spacing(1))
+            if num_dets == 0:
+                recall[:, a, m] = 0
+                precision[:, :, a, m] = 0
+                score_thrs[:, :, a, m] = 0
+                continue
+            recall[:, a, m] = rc[:, -1]
+            # make precision monotonically decreasing
+            pr = np.maximum.accumulate(pr[:, ::-1], axis=1)[:, ::-1]
+            for t in range(T):
+                pinds = np.searchsorted(rc[t], rec_thrs, side='left')
+                q = np.zeros(R)
+                ss = np.zeros(R)
+                found = pinds < num_dets
+                q[found] = pr[t, pinds[found]]
+                ss[found] = dt_scores[pinds[found]]
+                precision[t, :, a, m] = q
+                score_thrs[t, :, a, m] = ss
+    return precision, recall, score_thrs
+
+
+class IncrementalCOCOeval(COCOeval):
+    """COCOeval that matches detections image by image when they are
+    predicted, so that the final evaluation only accumulates the matches.
+
+    :meth:`evaluate_img` matches the detections of an image to the ground
+    truths for all categories, area ranges and IoU thresholds, and returns a
+    small picklable record. :meth:`accumulate` gathers the records (e.g.
+    collected from all ranks) and computes precision and recall with array
+    operations, optionally with a process pool over categories. The results
+    in ``self.eval`` and :meth:`summarize` are the same as ``COCOeval``.
+
+    Only ``useCats=1`` is supported.
+
+    Example:
+        >>> coco_eval = IncrementalCOCOeval(coco_gt, iouType='bbox')
+        >>> records = [
+        >>>     coco_eval.evaluate_img(img_id, cat_ids, scores, bboxes)
+        >>>     for img_id, cat_ids, scores, bboxes in predictions]
+        >>> coco_eval.accumulate(records)
+        >>> coco_eval.summarize()
+    """
+
+    def __init__(self, cocoGt=None, iouType: str = 'bbox') -> None:
+        super().__init__(cocoGt=cocoGt, iouType=iouType)
+        self._prepared_params = None
+
+    def _prepare_params(self) -> None:
+        """Normalize the parameters as ``COCOeval.evaluate`` does."""
+        p = self.params
+        key = (tuple(p.imgIds), tuple(p.catIds), tuple(p.maxDets),
+               tuple(np.atleast_1d(p.iouThrs)), p.useCats)
+        if key == self._prepared_params:
+            return
+        assert p.useCats, 'IncrementalCOCOeval only supports useCats=1'
+        p.imgIds = list(np.unique(p.imgIds))
+        p.catIds = list(np.unique(p.catIds))
+        p.maxDets = sorted(p.maxDets)
+        p.iouThrs = np.atleast_1d(p.iouThrs)
+        self.params = p
+        self._cat_inds = {cat_id: k for k, cat_id in enumerate(p.catIds)}
+        self._row_iou_thrs = np.tile(p.iouThrs, len(p.areaRng))
+        self._area_rngs = np.repeat(
+            np.asarray(p.areaRng, dtype=np.float64), len(p.iouThrs), axis=0)
+        self._prepared_params = (tuple(p.imgIds), tuple(p.catIds),
+                                 tuple(p.maxDets), tuple(p.iouThrs),
+                                 p.useCats)
+
+    def _load_gts(self, img_id: int) -> List[dict]:
+        """Load the ground truths of an image in the order of ``COCOeval``."""
+        return [
+            ann for ann in self.cocoGt.imgToAnns.get(img_id, [])
+            if ann['category_id'] in self._cat_inds
+        ]
+
+    def evaluate_img(self, img_id: int, cat_ids: Sequence[int],
+                     scores: Sequence[float],
+                     dets: Union[np.ndarray, List[dict]]) -> dict:
+        """Match the detections of an image to its ground truths.
+
+        Args:
+            img_id (int): Image id.
+            cat_ids (Sequence[int]): Category id of each detection.
+            scores (Sequence[float]): Score of each detection.
+            dets (np.ndarray | list[dict]): Boxes in (x, y, w, h) format with
+                shape (N, 4) when ``iouType`` is ``'bbox'``, or RLE encoded
+                masks when ``iouType`` is ``'segm'``.
+
+        Returns:
+            dict: The record of the image used by :meth:`accumulate`.
+        """
+        self._prepare_params()
+        p = self.params
+        iou_type = p.iouType
+        assert iou_type in ('bbox', 'segm')
+        cat_inds = np.array(
+            [self._cat_inds.get(cat_id, -1) for cat_id in cat_ids],
+            dtype=np.int64)
+        scores = np.asarray(scores, dtype=np.float64)
+        if iou_type == 'bbox':
+            dets = np.asarray(dets, dtype=np.float64).reshape(-1, 4)
+            dt_areas = dets[:, 2] * dets[:, 3]
+        else:
+            dt_areas = maskUtils.area(dets).astype(np.float64) \
+                if len(dets) else np.zeros(0)
+
+        gts = self._load_gts(img_id)
+        gt_cat_inds = np.array(
+            [self._cat_inds[gt['category_id']] for gt in gts], dtype=np.int64)
+
+        num_rows = len(self._row_iou_thrs)
+        record_inds, record_cats, record_ranks = [], [], []
+        record_tps, record_valids = [], []
+        for k in np.unique(cat_inds[cat_inds >= 0]):
+            dt_inds = np.flatnonzero(cat_inds == k)
+            dt_inds = dt_inds[np.argsort(-scores[dt_inds], kind='mergesort')]
+            dt_inds = dt_inds[:p.maxDets[-1]]
+            cat_gts = [gts[i] for i in np.flatnonzero(gt_cat_inds == k)]
+
+            gt_areas = np.array([gt['area'] for gt in cat_gts],
+                                dtype=np.float64)
+            gt_crowd = np.array([int(gt['iscrowd']) for gt in cat_gts],
+                                dtype=bool)
+            gt_ids = np.array([gt['id'] for gt in cat_gts], dtype=np.int64)
+            gt_ignore = gt_crowd[None] | \
+                (gt_areas[None] < self._area_rngs[:, :1]) | \
+                (gt_areas[None] > self._area_rngs[:, 1:])
+            if len(cat_gts) == 0:
+                ious = np.zeros((len(dt_inds), 0))
+            elif iou_type == 'bbox':
+                ious = maskUtils.iou(dets[dt_inds],
+                                     [gt['bbox'] for gt in cat_gts],
+                                     gt_crowd.astype(np.uint8).tolist())
+            else:
+                ious = maskUtils.iou([dets[i] for i in dt_inds],
+                                     [self.cocoGt.annToRLE(gt)
+                                      for gt in cat_gts],
+                                     gt_crowd.astype(np.uint8).tolist())
+            ious = np.asarray(ious, dtype=np.float64).reshape(
+                len(dt_inds), len(cat_gts))
+
+            matches = _match_dets(ious, gt_ignore, gt_crowd,
+                                  self._row_iou_thrs)
+            matched = matches >= 0
+            m = np.maximum(matches, 0)
+            rows = np.arange(num_rows)[:, None]
+            # a match to a ground truth with id 0 counts as unmatched in
+            # COCOeval, as it stores the matched id
+            dtm = matched & (gt_ids[m] != 0) if len(cat_gts) else matched
+            dt_ignore = matched & gt_ignore[rows, m] if len(cat_gts) \
+                else np.zeros_like(matched)
+            dt_out = (dt_areas[dt_inds][None] < self._area_rngs[:, :1]) | \
+                (dt_areas[dt_inds][None] > self._area_rngs[:, 1:])
+            dt_ignore |= ~dtm & dt_out
+            tps = dtm & ~dt_ignore
+
+            record_inds.append(dt_inds)
+            record_cats.append(np.full(len(dt_inds), k, dtype=np.int32))
+            record_ranks.append(np.arange(len(dt_inds), dtype=np.int32))
+            record_tps.append(np.packbits(tps.T, axis=1))
+            record_valids.append(np.packbits(~dt_ignore.T, axis=1))
+
+        num_bytes = (num_rows + 7) // 8
+        if len(record_inds) == 0:
+            record_inds = [np.zeros(0, dtype=np.int64)]
+            record_cats = [np.zeros(0, dtype=np.int32)]
+            record_ranks = [np.zeros(0, dtype=np.int32)]
+            record_tps = [np.zeros((0, num_bytes), dtype=np.uint8)]
+            record_valids = [np.zeros((0, num_bytes), dtype=np.uint8)]
+        return dict(
+            img_id=img_id,
+            cat_inds=np.concatenate(record_cats),
+            scores=scores[np.concatenate(record_inds)],
+            ranks=np.concatenate(record_ranks),
+            tps=np.concatenate(record_tps),
+            valids=np.concatenate(record_valids))
+
+    def _count_regular_gts(self) -> np.ndarray:
+        """Count the not ignored ground truths of every category and area
+        range over all images in ``params.imgIds``.
+
+        Returns:
+            np.ndarray: The counts with shape (K, A).
+        """
+        p = self.params
+        cat_inds, areas, crowds = [], [], []
+        for img_id in p.imgIds:
+            for gt in self._load_gts(img_id):
+                cat_inds.append(self._cat_inds[gt['category_id']])
+                areas.append(gt['area'])
+                crowds.append(int(gt['iscrowd']))
+        cat_inds = np.array(cat_inds, dtype=np.int64)
+        areas = np.array(areas, dtype=np.float64)
+        crowds = np.array(crowds, dtype=bool)
+        area_rngs = np.asarray(p.areaRng, dtype=np.float64)
+        regular = ~crowds[None] & (areas[None] >= area_rngs[:, :1]) & \
+            (areas[None] <= area_rngs[:, 1:])
+        npigs = np.zeros((len(p.catIds), len(p.areaRng)), dtype=np.int64)
+        for a in range(len(p.areaRng)):
+            npigs[:, a] = np.bincount(
+                cat_inds[regular[a]], minlength=len(p.catIds))
+        return npigs
+
+    def accumulate(self,
+                   records: Optional[List[dict]] = None,
+                   nproc: int = 0) -> None:
+        """Accumulate the records returned by :meth:`evaluate_img`.
+
+        Args:
+            records (list[dict]): The records of all images. Records of
+                images not in ``params.imgIds`` are ignored.
+            nproc (int): Number of processes to accumulate categories in
+                parallel. 0 means no process pool. Defaults to 0.
+        """
+        print('Accumulating evaluation results...')
+        tic = time.time()
+        self._prepare_params()
+        p = self.params
+        T, R = len(p.iouThrs), len(p.recThrs)
+        K, A, M = len(p.catIds), len(p.areaRng), len(p.maxDets)
+
+        # detections are evaluated in the order of image ids, and in the
+        # order of scores inside an image
+        img_pos = {img_id: i for i, img_id in enumerate(p.imgIds)}
+        records = sorted(
+            (r for r in records or [] if r['img_id'] in img_pos),
+            key=lambda r: img_pos[r['img_id']])
+        num_bytes = (A * T + 7) // 8
+        if len(records):
+            cat_inds = np.concatenate([r['cat_inds'] for r in records])
+            scores = np.concatenate([r['scores'] for r in records])
+            ranks = np.concatenate([r['ranks'] for r in records])
+            tps = np.concatenate([r['tps'] for r in records])
+            valids = np.concatenate([r['valids'] for r in records])
+        else:
+            cat_inds = np.zeros(0, dtype=np.int32)
+            scores = np.zeros(0)
+            ranks = np.zeros(0, dtype=np.int32)
+            tps = valids = np.zeros((0, num_bytes), dtype=np.uint8)
+        order = np.argsort(cat_inds, kind='stable')
+        offsets = np.searchsorted(cat_inds[order], np.arange(K + 1))
+        npigs = self._count_regular_gts()
+
+        args = []
+        for k in range(K):
+            inds = order[offsets[k]:offsets[k + 1]]
+            args.append((scores[inds], ranks[inds], tps[inds], valids[inds],
+                         npigs[k], p.maxDets, T, p.recThrs))
+        if nproc > 0:
+            with Pool(nproc) as pool:
+                cat_results = pool.starmap(_accumulate_cat, args)
+        else:
+            cat_results = [_accumulate_cat(*arg) for arg in args]
+
+        precision = -np.ones((T, R, K, A, M))
+        recall = -np.ones((T, K, A, M))
+        score_thrs = -np.ones((T, R, K, A, M))
+        for k, (cat_precision, cat_recall, cat_scores) in enumerate(
+                cat_results):
+            precision[:, :, k] = cat_precision
+            recall[:, k] = cat_recall
+            score_thrs[:, :, k] = cat_scores
+        self.eval = {
+            'params': p,
+            'counts': [T, R, K, A, M],
+            'date': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'precision': precision,
+            'recall': recall,
+            'scores': score_thrs,
+        }
+        toc = time.time()
+        print(f'DONE (t={toc - tic:0.2f}s).')
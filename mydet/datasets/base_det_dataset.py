@@ -1,25 +1,52 @@
+import atexit
+import gc
+import os
 import os.path as osp
-from typing import List, Optional
+import shutil
+import uuid
+from typing import List, Optional, Tuple
 
+import numpy as np
 from mmengine.dataset import BaseDataset
+from mmengine.dist import (barrier, broadcast_object_list, get_local_rank,
+                           get_rank)
 from mmengine.fileio import load
 from mmengine.utils import is_abs
 
 from ..registry import DATASETS
+from .ann_cache import ColumnarAnnotations, ColumnarDataList
+from .transforms.geometric import LazyGeometricCompose
 
 @DATASETS.register_module()
 class BaseDetDataset(BaseDataset):
     """
     检测任务的数据集基类
+
+    shm_dir: 节点本地的内存文件系统目录（如 '/dev/shm'）。设置后，每个节点只由
+        local rank 0 序列化一次 data_list 并写入该目录，节点上所有 rank 和
+        dataloader worker 都以只读 memmap 的方式共享同一份数据，进程常驻内存
+        不再随 worker 数量增长。worker 需要以 fork 方式启动（Linux 默认），
+        否则会各自拷贝一份。所有 rank 打开之后文件即被删除，不会因进程崩溃
+        残留在内存文件系统中。注意其他 rank 仍然会完整执行 load_data_list 和
+        filter_data（子类在其中设置的 cat_ids 等属性各个 rank 都需要），只是
+        在共享之前释放各自的 data_list，加载阶段的耗时和内存峰值不变。
+        默认为 None，即每个进程各自序列化。
     """
-    def __init(self, 
-               *args,
-               seg_map_suffix: str='.png',
-               proposal_file: Optional[str]=None,
-               file_client_args: dict=None,
-               backend_args: dict=None,
-               return_classes: bool=False,
-               **kwargs) -> None:
+    # 可选的列式标注，由支持的子类在 load_data_list 中生成。ann_rows 是每个
+    # 样本在 ann_columns 中的行号，用于快速过滤和采样器。
+    ann_columns: Optional[ColumnarAnnotations] = None
+    ann_rows: Optional[np.ndarray] = None
+
+    def __init__(self,
+                 *args,
+                 seg_map_suffix: str='.png',
+                 proposal_file: Optional[str]=None,
+                 file_client_args: dict=None,
+                 backend_args: dict=None,
+                 return_classes: bool=False,
+                 shm_dir: Optional[str]=None,
+                 **kwargs) -> None:
+        self.shm_dir = shm_dir
         self.seg_map_suffix = seg_map_suffix
         self.proposal_file = proposal_file
         self.backend_args = backend_args
@@ -31,6 +58,8 @@ class BaseDetDataset(BaseDataset):
                 'https://github.com/open-mmlab/mmdetection/blob/main/configs/_base_/datasets/coco_detection.py'  # noqa: E501
             )
         super().__init__(*args, **kwargs)
+        # 不支持 lazy 状态的变换执行前，先执行尚未执行的几何变换
+        self.pipeline = LazyGeometricCompose(self.pipeline.transforms)
         
     # override full_init()
     def full_init(self) -> None:
@@ -48,12 +77,60 @@ class BaseDetDataset(BaseDataset):
         # 3. get subset (optional)
         if self._indices is not None:
             self.data_list = self._get_unserialized_subset(self._indices)
+            if self.ann_rows is not None:
+                indices = self._indices
+                if isinstance(indices, int):
+                    indices = slice(None, indices) if indices >= 0 \
+                        else slice(indices, None)
+                self.ann_rows = self.ann_rows[indices]
         # 4. serialize data (optional)
         # 默认操作为序列化全部样本。
+        if isinstance(self.data_list, ColumnarDataList):
+            # columnar annotations are memory-mapped and already shared
+            # among processes, there is nothing to serialize.
+            self.serialize_data = False
         if self.serialize_data:
-            self.data_bytes, self.data_address = self._serialize_data()
+            if self.shm_dir is None:
+                self.data_bytes, self.data_address = self._serialize_data()
+            else:
+                self.data_bytes, self.data_address = \
+                    self._share_serialized_data()
         
         self._fully_initialized = True
+
+    def _share_serialized_data(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        每个节点只由 local rank 0 序列化 data_list 并保存到 ``shm_dir``，
+        其他 rank 等待写完后直接以 memmap 只读打开
+        """
+        # all ranks must agree on the directory name
+        token = [uuid.uuid4().hex if get_rank() == 0 else None]
+        broadcast_object_list(token)
+        share_dir = osp.join(self.shm_dir, f'mydet_data_{token[0]}')
+
+        if get_local_rank() == 0:
+            data_bytes, data_address = self._serialize_data()
+            os.makedirs(share_dir, exist_ok=True)
+            np.save(osp.join(share_dir, 'data_bytes.npy'), data_bytes)
+            np.save(osp.join(share_dir, 'data_address.npy'), data_address)
+            del data_bytes, data_address
+            # in case another rank fails before the files are removed below
+            atexit.register(shutil.rmtree, share_dir, True)
+        else:
+            self.data_list.clear()
+        gc.collect()
+        barrier()
+
+        data_bytes = np.load(
+            osp.join(share_dir, 'data_bytes.npy'), mmap_mode='r')
+        data_address = np.load(
+            osp.join(share_dir, 'data_address.npy'), mmap_mode='r')
+        # once every rank has mapped the files they can be unlinked, the
+        # mappings stay valid and the memory is freed with the last process.
+        barrier()
+        if get_local_rank() == 0:
+            shutil.rmtree(share_dir, ignore_errors=True)
+        return data_bytes, data_address
             
     def load_proposals(self) -> None:
         """
@@ -81,6 +158,16 @@ class BaseDetDataset(BaseDataset):
             proposals = proposals_list[file_name]
             data_info['proposals'] = proposals
     
+    def get_img_column(self, name: str) -> Optional[np.ndarray]:
+        """
+        获取与样本一一对应的图片级标注列（例如 'widths'、'heights'），
+        数据集没有列式标注时返回 None
+        """
+        if self.ann_columns is None or self.ann_rows is None or \
+                len(self.ann_rows) != len(self):
+            return None
+        return getattr(self.ann_columns, name)[self.ann_rows]
+
     def get_cat_ids(self, idx: int) -> List[int]:
         """
         返回指定idx样本中包含的所有实例id
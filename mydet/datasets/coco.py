@@ -1,10 +1,14 @@
 import copy
 import os.path as osp
-from typing import List, Union
+from typing import List, Optional, Union
 
+import numpy as np
+from mmengine.dataset import force_full_init
 from mmengine.fileio import get_local_path
 
 from mydet.registry import DATASETS
+from .ann_cache import (ColumnarAnnotations, ColumnarDataList,
+                        SerializedDataList, get_cache_key, hash_file)
 from .api_wrappers import COCO
 from .base_det_dataset import BaseDetDataset
 
@@ -51,7 +55,27 @@ class CocoDataset(BaseDetDataset):
     COCOAPI = COCO
     # ann_id is unique in coco dataset.
     ANN_ID_UNIQUE = True
-    
+
+    def __init__(self,
+                 *args,
+                 ann_cache_dir: Optional[str] = None,
+                 columnar_ann: bool = False,
+                 **kwargs) -> None:
+        """
+        ann_cache_dir: 列式标注缓存的目录。设置后，首次运行时解析标注文件并把
+            bbox、label 等保存为扁平的 numpy 数组，之后的运行和所有 dataloader
+            worker 直接以 ``np.memmap`` 只读共享该缓存，不再解析 json。
+            缓存只包含 bbox，不支持 mask 和 proposal_file。
+        columnar_ann: 不使用缓存时，是否也生成列式标注 ``ann_columns``，用于
+            向量化过滤、``refilter`` 和采样器，同时保留未过滤样本的序列化
+            副本。设置 ann_cache_dir 时总是生成。默认为 False，即逐个样本过滤。
+        """
+        self.ann_cache_dir = ann_cache_dir
+        self.columnar_ann = columnar_ann
+        # 未过滤的 data_list，与 ann_columns 的行一一对应，用于 apply_rows
+        self._unfiltered_data_list = None
+        super().__init__(*args, **kwargs)
+
     # override load_data_list
     def load_data_list(self) -> List[dict]:
         """
@@ -65,14 +89,49 @@ class CocoDataset(BaseDetDataset):
         """
         with get_local_path(
                 self.ann_file, backend_args=self.backend_args) as local_path:
-            self.coco = self.COCOAPI(local_path)
-            
+            if self.ann_cache_dir is not None:
+                return self._load_cached_data_list(local_path)
+            raw_data_infos = self._load_raw_data_infos(local_path)
+
+        data_list = self.parse_data_infos(raw_data_infos)
+        if self.columnar_ann:
+            self.ann_columns = self._build_ann_columns(raw_data_infos,
+                                                       data_list)
+            self.ann_rows = np.arange(len(data_list))
+        return data_list
+
+    def _build_ann_columns(self, raw_data_infos: List[dict],
+                           data_list: List[dict]) -> ColumnarAnnotations:
+        """
+        生成列式标注，其中 has_cat 表示图片是否包含所需类别的标注
+        """
+        img_ids = np.array(
+            [info['raw_img_info']['img_id'] for info in raw_data_infos])
+        ids_in_cat = [
+            np.asarray(self.cat_img_map[class_id]) for class_id in self.cat_ids
+        ]
+        has_cat = np.isin(img_ids, np.concatenate(ids_in_cat)) \
+            if len(ids_in_cat) > 0 else np.zeros(len(img_ids), dtype=bool)
+        return ColumnarAnnotations.from_data_list(
+            data_list,
+            file_names=[
+                info['raw_img_info']['file_name'] for info in raw_data_infos
+            ],
+            has_cat=has_cat,
+            cat_ids=self.cat_ids)
+
+    def _load_raw_data_infos(self, local_path: str) -> List[dict]:
+        """
+        用 COCO api 读取标注文件，返回每张图片的原始图片信息和标注信息
+        """
+        self.coco = self.COCOAPI(local_path)
+
         self.cat_ids = self.coco.get_cat_ids(cat_names=self.metainfo['classes'])
         self.cat2label = {cat_id: i for i, cat_id in enumerate(self.cat_ids)}
         self.cat_img_map = copy.deepcopy(self.coco.cat_img_map)
         
         img_ids = self.coco.get_img_ids()
-        data_list = []
+        raw_data_infos = []
         total_ann_ids = []
         for img_id in img_ids:
             raw_img_info = self.coco.load_imgs([img_id])[0]
@@ -82,17 +141,74 @@ class CocoDataset(BaseDetDataset):
             raw_ann_info = self.coco.load_anns(ann_ids)
             total_ann_ids.extend(ann_ids)
             
-            parsed_data_info = self.parse_data_info({
+            raw_data_infos.append({
                 'raw_ann_info': raw_ann_info, 
                 'raw_img_info': raw_img_info})
-            data_list.append(parsed_data_info)
         if self.ANN_ID_UNIQUE:
             assert len(set(total_ann_ids)) == len(total_ann_ids), \
                 f"Annotation ids in '{self.ann_file}' are not unique!"
         
         del self.coco
-        return data_list
+        return raw_data_infos
+
+    def _load_cached_data_list(self, local_path: str) -> ColumnarDataList:
+        """
+        读取列式标注缓存，缓存不存在时解析标注文件并生成缓存。
+        缓存以标注文件的哈希和解析、过滤设置作为 key。
+        """
+        assert self.proposal_file is None, \
+            '`ann_cache_dir` does not support `proposal_file`.'
+        # 缓存中没有 mask，提前报错，而不是在 LoadAnnotations 中报 KeyError
+        assert not self._pipeline_loads_masks(), \
+            '`ann_cache_dir` does not support loading instance masks, ' \
+            'set `with_mask=False` in `LoadAnnotations`.'
+        cache_key = get_cache_key(
+            hash_file(local_path),
+            version=ColumnarAnnotations.VERSION,
+            classes=self.metainfo['classes'],
+            filter_cfg=self.filter_cfg,
+            test_mode=self.test_mode)
+        cache_dir = osp.join(self.ann_cache_dir, cache_key)
+
+        if not osp.isdir(cache_dir):
+            raw_data_infos = self._load_raw_data_infos(local_path)
+            self._build_ann_columns(
+                raw_data_infos,
+                self.parse_data_infos(raw_data_infos)).dump(cache_dir)
+            del raw_data_infos
+
+        # always reopen the dumped cache so that the arrays are memory-mapped
+        annotations = ColumnarAnnotations.load(cache_dir)
+        self.ann_columns = annotations
+        self.ann_rows = np.arange(len(annotations))
+        self.cat_ids = annotations.cat_ids.tolist()
+        self.cat2label = {cat_id: i for i, cat_id in enumerate(self.cat_ids)}
+
+        extra_info = {}
+        if self.return_classes:
+            extra_info['text'] = self.metainfo['classes']
+            extra_info['custom_entities'] = True
+        self._unfiltered_data_list = ColumnarDataList(
+            annotations,
+            img_prefix=self.data_prefix['img'],
+            seg_prefix=self.data_prefix.get('seg', None),
+            seg_map_suffix=self.seg_map_suffix,
+            extra_info=extra_info)
+        return self._unfiltered_data_list
     
+    def _pipeline_loads_masks(self) -> bool:
+        """
+        pipeline 中（包括 RandomChoice 等包装变换内部）是否有加载 mask 的变换
+        """
+
+        def loads_masks(transform) -> bool:
+            if getattr(transform, 'with_mask', False):
+                return True
+            return any(
+                loads_masks(t) for t in getattr(transform, 'transforms', []))
+
+        return loads_masks(self.pipeline)
+
     # override parse_data_info
     def parse_data_info(self, raw_data_info: dict) -> Union[dict, List[dict]]:
         """
@@ -103,23 +219,7 @@ class CocoDataset(BaseDetDataset):
         img_info = raw_data_info['raw_img_info']
         ann_info = raw_data_info['raw_ann_info']
 
-        data_info = {}
-        
-        img_path = osp.join(self.data_prefix['img'], img_info['file_name'])
-        if self.data_prefix.get('seg', None):
-            seg_map_path = osp.join(self.data_prefix['seg'],
-                                    img_info['file_name'].rsplit('.', 1)[0] + self.seg_map_suffix)
-        else:
-            seg_map_path = None
-        data_info['img_path'] = img_path
-        data_info['img_id'] = img_info['img_id']
-        data_info['seg_map_path'] = seg_map_path
-        data_info['height'] = img_info['height']
-        data_info['width'] = img_info['width']
-        
-        if self.return_classes:
-            data_info['text'] = self.metainfo['classes']
-            data_info['custom_entities'] = True
+        data_info = self._parse_img_info(img_info)
         
         instances = []
         for i, ann in enumerate(ann_info):
@@ -144,7 +244,7 @@ class CocoDataset(BaseDetDataset):
             else:
                 instance['ignore_flag'] = 0
             instance['bbox'] = bbox
-            instance['bbox_labeel'] = self.cat2label[ann['category_id']]
+            instance['bbox_label'] = self.cat2label[ann['category_id']]
             
             if ann.get('segmentation', None):
                 instance['mask'] = ann['segmentation']
@@ -152,37 +252,250 @@ class CocoDataset(BaseDetDataset):
             instances.append(instance)
         data_info['instances'] = instances
         return data_info
+
+    def parse_data_infos(self, raw_data_infos: List[dict]) -> List[dict]:
+        """
+        批量版本的 parse_data_info：把所有图片的标注拼在一起，用 numpy 一次性完成
+        xywh -> xyxy 转换、与图片求交、面积/尺寸过滤、类别映射和 crowd -> 
+        ignore_flag，结果与逐个调用 parse_data_info 完全相同。
+        如果子类重写了 parse_data_info，则退回逐个解析。
+        """
+        if type(self).parse_data_info is not CocoDataset.parse_data_info:
+            return [self.parse_data_info(info) for info in raw_data_infos]
+
+        img_infos = [info['raw_img_info'] for info in raw_data_infos]
+        anns = [ann for info in raw_data_infos for ann in info['raw_ann_info']]
+        num_anns = [len(info['raw_ann_info']) for info in raw_data_infos]
+        valid, bboxes, labels, ignore_flags = self._parse_instances_bulk(
+            anns,
+            img_w=np.repeat([info['width'] for info in img_infos], num_anns),
+            img_h=np.repeat([info['height'] for info in img_infos], num_anns))
+
+        valid_inds = np.flatnonzero(valid)
+        # split the valid instances back to images
+        splits = np.searchsorted(valid_inds, np.cumsum(num_anns)[:-1])
+        bboxes = bboxes[valid_inds].tolist()
+        labels = labels[valid_inds].tolist()
+        ignore_flags = ignore_flags[valid_inds].tolist()
+        starts = [0] + splits.tolist()
+        ends = splits.tolist() + [len(valid_inds)]
+
+        data_list = []
+        for img_info, start, end in zip(img_infos, starts, ends):
+            data_info = self._parse_img_info(img_info)
+            instances = []
+            for i in range(start, end):
+                instance = {
+                    'ignore_flag': ignore_flags[i],
+                    'bbox': bboxes[i],
+                    'bbox_label': labels[i]
+                }
+                segmentation = anns[valid_inds[i]].get('segmentation', None)
+                if segmentation:
+                    instance['mask'] = segmentation
+                instances.append(instance)
+            data_info['instances'] = instances
+            data_list.append(data_info)
+        return data_list
+
+    def _parse_img_info(self, img_info: dict) -> dict:
+        """
+        解析图片信息，生成不含 instances 的 data_info
+        """
+        data_info = {}
+        
+        img_path = osp.join(self.data_prefix['img'], img_info['file_name'])
+        if self.data_prefix.get('seg', None):
+            seg_map_path = osp.join(self.data_prefix['seg'],
+                                    img_info['file_name'].rsplit('.', 1)[0] + self.seg_map_suffix)
+        else:
+            seg_map_path = None
+        data_info['img_path'] = img_path
+        data_info['img_id'] = img_info['img_id']
+        data_info['seg_map_path'] = seg_map_path
+        data_info['height'] = img_info['height']
+        data_info['width'] = img_info['width']
+        
+        if self.return_classes:
+            data_info['text'] = self.metainfo['classes']
+            data_info['custom_entities'] = True
+        return data_info
+
+    def _parse_instances_bulk(self, anns: List[dict], img_w: np.ndarray,
+                              img_h: np.ndarray) -> tuple:
+        """
+        向量化地过滤和转换一组标注
+
+        Args:
+            anns (list[dict]): coco 格式的原始标注
+            img_w (np.ndarray): 每个标注所属图片的宽
+            img_h (np.ndarray): 每个标注所属图片的高
+
+        Returns:
+            tuple: 有效标注的掩码 (N, )，xyxy 格式的 bbox (N, 4)，
+            类别标签 (N, ) 和 ignore_flag (N, )
+        """
+        bboxes = np.array([ann['bbox'] for ann in anns],
+                          dtype=np.float64).reshape(-1, 4)
+        areas = np.array([ann['area'] for ann in anns], dtype=np.float64)
+        cat_ids = np.array([ann['category_id'] for ann in anns],
+                           dtype=np.int64)
+        ignore = np.array([bool(ann.get('ignore', False)) for ann in anns],
+                          dtype=bool)
+        iscrowd = np.array([bool(ann.get('iscrowd', False)) for ann in anns],
+                           dtype=bool)
+
+        x1, y1, w, h = bboxes.T
+        inter_w = np.maximum(
+            0, np.minimum(x1 + w, img_w) - np.maximum(x1, 0))
+        inter_h = np.maximum(
+            0, np.minimum(y1 + h, img_h) - np.maximum(y1, 0))
+
+        # category id -> label lookup table, -1 for unused categories
+        lut = np.full(max(self.cat_ids, default=-1) + 2, -1, dtype=np.int64)
+        lut[self.cat_ids] = np.arange(len(self.cat_ids))
+        in_lut = (cat_ids >= 0) & (cat_ids < len(lut))
+        labels = lut[np.where(in_lut, cat_ids, -1)]
+
+        valid = ~ignore & (inter_w * inter_h != 0) & (areas > 0) & \
+            (w >= 1) & (h >= 1) & (labels >= 0)
+        bboxes = np.stack([x1, y1, x1 + w, y1 + h], axis=1)
+        ignore_flags = iscrowd.astype(np.int64)
+        return valid, bboxes, labels, ignore_flags
     
     def filter_data(self) -> List[dict]:
-        
+
+        if self.ann_columns is not None and \
+                self._unfiltered_data_list is None:
+            # 在 load_proposals 之后保存未过滤样本的序列化副本，不持有 dict，
+            # 不会因引用计数破坏 worker 之间的写时复制共享
+            self._unfiltered_data_list = SerializedDataList(self.data_list)
+
         if self.test_mode:
             return self.data_list
 
         if self.filter_cfg is None:
             return self.data_list
 
-        filter_empty_gt = self.filter_cfg.get('filter_empty_gt', False)
-        min_size = self.filter_cfg.get('min_size', 0)
+        if self.ann_columns is None:
+            return self._filter_data_list(self.filter_cfg)
+        return self._select_rows(self.get_valid_rows(self.filter_cfg))
+
+    def _filter_data_list(self, filter_cfg: dict) -> List[dict]:
+        """
+        没有列式标注时逐个样本过滤，过滤条件与 ``get_valid_rows`` 相同
+        """
+        filter_empty_gt = filter_cfg.get('filter_empty_gt', False)
+        min_size = filter_cfg.get('min_size', 0)
+        max_aspect_ratio = filter_cfg.get('max_aspect_ratio', None)
+        classes = filter_cfg.get('classes', None)
+        min_instances = filter_cfg.get('min_instances', 0)
+        if classes is not None:
+            min_instances = max(min_instances, 1)
+            labels = {self.metainfo['classes'].index(c) for c in classes}
 
-        # obtain images that contain annotation
-        ids_with_ann = set(data_info['img_id'] for data_info in self.data_list)
         # obtain images that contain annotations of the required categories
         ids_in_cat = set()
-        for i, class_id in enumerate(self.cat_ids):
+        for class_id in self.cat_ids:
             ids_in_cat |= set(self.cat_img_map[class_id])
-        # merge the image id sets of the two conditions and use the merged set
-        # to filter out images if self.filter_empty_gt=True
-        ids_in_cat &= ids_with_ann
 
         valid_data_infos = []
-        for i, data_info in enumerate(self.data_list):
-            img_id = data_info['img_id']
+        for data_info in self.data_list:
             width = data_info['width']
             height = data_info['height']
-            if filter_empty_gt and img_id not in ids_in_cat:
+            short_side = min(width, height)
+            if short_side < min_size:
+                continue
+            if filter_empty_gt and data_info['img_id'] not in ids_in_cat:
+                continue
+            if max_aspect_ratio is not None and \
+                    max(width, height) > max_aspect_ratio * short_side:
                 continue
-            if min(width, height) >= min_size:
-                valid_data_infos.append(data_info)
+            if min_instances > 0:
+                num_instances = sum(
+                    1 for instance in data_info['instances']
+                    if instance['ignore_flag'] == 0 and (
+                        classes is None or instance['bbox_label'] in labels))
+                if num_instances < min_instances:
+                    continue
+            valid_data_infos.append(data_info)
+        return valid_data_infos
+
+    def _select_rows(self, rows: np.ndarray) -> List[dict]:
+        """
+        从未过滤的 data_list 中取出 ``rows`` 对应的样本，并更新 ann_rows
+        """
+        self.ann_rows = rows
+        data_list = self._unfiltered_data_list
+        if isinstance(data_list, ColumnarDataList):
+            return data_list.select(rows)
+        return [data_list[i] for i in rows]
+
+    @force_full_init
+    def apply_rows(self, rows: np.ndarray) -> None:
+        """
+        用 ``get_valid_rows`` 返回的行号重建 ``data_list`` 和 ``ann_rows``，
+        开启序列化时重新序列化 data_list。需要列式标注（``columnar_ann`` 或
+        ``ann_cache_dir``），``indices`` 设置的子集不会再次应用。
+
+        Args:
+            rows (np.ndarray): Rows of the kept images in ``ann_columns``.
+        """
+        assert self.ann_columns is not None, \
+            '`apply_rows` requires `columnar_ann=True` or `ann_cache_dir`.'
+        self.data_list = self._select_rows(np.asarray(rows, dtype=np.int64))
+        if self.serialize_data:
+            self.data_bytes, self.data_address = self._serialize_data()
+
+    def refilter(self, filter_cfg: dict) -> None:
+        """
+        用新的过滤条件重新过滤数据集，不重新加载标注
+
+        Args:
+            filter_cfg (dict): Filter config, see ``get_valid_rows``.
+        """
+        self.filter_cfg = copy.deepcopy(filter_cfg)
+        self.apply_rows(self.get_valid_rows(self.filter_cfg))
+
+    def get_valid_rows(self, filter_cfg: dict) -> np.ndarray:
+        """
+        在列式标注上用向量化的掩码过滤图片，返回满足条件的图片在
+        ``self.ann_columns`` 中的行号。换一组过滤条件（例如换一个类别子集）
+        只需要重新调用本函数并用 ``apply_rows`` 应用结果（或直接调用
+        ``refilter``），无需重新加载标注。
+
+        支持的过滤条件:
+            filter_empty_gt (bool): 过滤不包含所需类别标注的图片
+            min_size (int): 图片短边的最小值
+            max_aspect_ratio (float): 图片长边/短边的最大值
+            min_instances (int): 有效 (非 ignore) 实例数量的最小值
+            classes (Sequence[str]): 类别白名单，只保留包含白名单类别有效实例
+                的图片，此时 min_instances 只统计白名单内的类别
+        """
+        cols = self.ann_columns
+        widths = cols.widths.astype(np.int64)
+        heights = cols.heights.astype(np.int64)
+        short_sides = np.minimum(widths, heights)
+
+        valid = short_sides >= filter_cfg.get('min_size', 0)
+        if filter_cfg.get('filter_empty_gt', False):
+            valid &= cols.has_cat
+        max_aspect_ratio = filter_cfg.get('max_aspect_ratio', None)
+        if max_aspect_ratio is not None:
+            valid &= np.maximum(widths, heights) <= \
+                max_aspect_ratio * short_sides
 
-        return valid_data_infos    
-            
\ No newline at end of file
+        classes = filter_cfg.get('classes', None)
+        min_instances = filter_cfg.get('min_instances', 0)
+        if classes is not None:
+            min_instances = max(min_instances, 1)
+        if min_instances > 0:
+            inst_valid = cols.ignore_flags == 0
+            if classes is not None:
+                labels = [self.metainfo['classes'].index(c) for c in classes]
+                inst_valid &= np.isin(cols.labels, labels)
+            inst_rows = np.repeat(np.arange(len(cols)), cols.num_instances)
+            num_instances = np.bincount(
+                inst_rows[inst_valid], minlength=len(cols))
+            valid &= num_instances >= min_instances
+        return np.flatnonzero(valid)
@@ -0,0 +1,103 @@
+import math
+from typing import Any, Sequence
+
+import torch
+from mmengine.dataset import pseudo_collate
+from torch.utils.data import get_worker_info
+
+from mydet.registry import FUNCTIONS
+
+
+def _collate_gt_records(gt_records: Sequence[torch.Tensor]) -> dict:
+    """Concatenate the (K, 6) records packed by
+    ``PackDetInputs(flat_instances=True)``.
+
+    记录按 (图片, 是否忽略) 稳定排序，每张图片的有效实例和忽略实例各占
+    连续的一段，DetDataPreprocessor 只需要一次 ``split`` 就能得到每张图片
+    的 ``gt_instances`` 和 ``ignored_instances``。
+
+    Returns:
+        dict: ``records`` of shape (sum(K), 6) and ``split_sizes``, the
+        numbers of the valid and ignored instances of every image.
+    """
+    num_imgs = len(gt_records)
+    counts = torch.tensor([len(records) for records in gt_records])
+    records = torch.cat(list(gt_records))
+    keys = torch.repeat_interleave(torch.arange(num_imgs), counts) * 2 + (
+        records[:, 5] > 0).long()
+    order = torch.argsort(keys, stable=True)
+    split_sizes = torch.bincount(keys, minlength=2 * num_imgs).tolist()
+    return dict(records=records[order], split_sizes=split_sizes)
+
+
+@FUNCTIONS.register_module()
+def padded_collate(data_batch: Sequence[dict],
+                   pad_size_divisor: int = 1,
+                   pad_value: int = 0) -> Any:
+    """Collate the samples and write the images into one padded batch.
+
+    与 ``pseudo_collate`` 相同，除 ``inputs`` 外的数据不合并。``inputs`` 中的
+    图片在 dataloader 的 worker 中直接拷贝到一个预先分配在共享内存中的
+    (N, C, H, W) 张量里，H、W 已经 pad 到 ``pad_size_divisor`` 的整数倍。
+    送回主进程时只传递共享内存的句柄，DetDataPreprocessor 也不再逐张
+    stack 和 pad。
+
+    ``PackDetInputs(contiguous=False)`` 输出的是 HWC 图片的 CHW 视图，
+    此时每张图片只拷贝一次。``PackDetInputs(flat_instances=True)`` 输出的
+    ``gt_records`` 会合并成一个 batch 的扁平张量。
+
+    Examples:
+        >>> train_dataloader = dict(
+        >>>     collate_fn=dict(type='padded_collate', pad_size_divisor=32),
+        >>>     pin_memory=True,
+        >>>     ...)
+
+    Args:
+        data_batch (Sequence[dict]): Samples output by the pipeline.
+        pad_size_divisor (int): The size of the batch is padded to be
+            divisible by it, which should be the same as the one of the data
+            preprocessor. Defaults to 1.
+        pad_value (int): The padded pixel value. The data preprocessor fills
+            the padding with its own ``pad_value`` after normalization, so
+            this only matters without a data preprocessor. Defaults to 0.
+
+    Returns:
+        Any: The collated data, ``inputs`` is a (N, C, H, W) tensor if all the
+        inputs are (C, H, W) tensors.
+    """
+    data = pseudo_collate(data_batch)
+    if isinstance(data, dict) and 'gt_records' in data:
+        data['gt_records'] = _collate_gt_records(data['gt_records'])
+    inputs = data.get('inputs') if isinstance(data, dict) else None
+    if not inputs or not all(
+            isinstance(img, torch.Tensor) and img.dim() == 3
+            for img in inputs):
+        return data
+
+    elem = inputs[0]
+    num_channels = elem.shape[0]
+    assert all(img.shape[0] == num_channels and img.dtype == elem.dtype
+               for img in inputs), \
+        'the images in a batch should have the same channels and dtype'
+    max_h = max(img.shape[1] for img in inputs)
+    max_w = max(img.shape[2] for img in inputs)
+    pad_h = int(math.ceil(max_h / pad_size_divisor)) * pad_size_divisor
+    pad_w = int(math.ceil(max_w / pad_size_divisor)) * pad_size_divisor
+    shape = (len(inputs), num_channels, pad_h, pad_w)
+
+    if get_worker_info() is not None:
+        # 与 torch 的 default_collate 相同，在 worker 中直接分配共享内存，
+        # 送回主进程时不会再拷贝一次
+        numel = len(inputs) * num_channels * pad_h * pad_w
+        storage = elem._typed_storage()._new_shared(numel, device=elem.device)
+        batch = elem.new(storage).resize_(shape)
+    else:
+        batch = elem.new_empty(shape)
+    for i, img in enumerate(inputs):
+        h, w = img.shape[1:]
+        batch[i, :, :h, :w].copy_(img)
+        # 只填充 padding 的部分
+        batch[i, :, h:].fill_(pad_value)
+        batch[i, :, :h, w:].fill_(pad_value)
+    data['inputs'] = batch
+    return data
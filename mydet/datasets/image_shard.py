@@ -0,0 +1,257 @@
+import os
+import os.path as osp
+import shutil
+import tempfile
+from typing import List, Optional, Tuple, Union
+
+import mmcv
+import numpy as np
+from mmengine.fileio import get
+
+SHARD_MODES = ('encoded', 'decoded')
+
+
+def encode_image(img_path: str,
+                 mode: str = 'encoded',
+                 scale: Optional[Tuple[int, int]] = None,
+                 backend_args: Optional[dict] = None,
+                 color_type: str = 'color'
+                 ) -> Tuple[bytes, Tuple[int, int], Tuple[int, ...]]:
+    """Read an image and convert it to the payload stored in a shard.
+
+    Args:
+        img_path (str): Path of the image.
+        mode (str): ``'encoded'`` keeps the original file bytes,
+            ``'decoded'`` stores the decoded uint8 pixels. Defaults to
+            ``'encoded'``.
+        scale (tuple[int, int], optional): Only used in ``'decoded'`` mode.
+            The image is rescaled with the aspect ratio kept so that it fits
+            in ``scale`` (the same rule as ``Resize(keep_ratio=True)``).
+            Defaults to None, which means no resizing.
+        backend_args (dict, optional): Arguments to instantiate the file
+            backend. Defaults to None.
+        color_type (str): The flag argument for :func:`mmcv.imfrombytes`,
+            which should be the same as the ``color_type`` of
+            ``LoadImageFromShard``. ``'color'`` applies the EXIF orientation,
+            so the original (h, w) is the one of the rotated image. Defaults
+            to ``'color'``.
+
+    Returns:
+        tuple: The payload, the original (h, w) of the image as decoded by
+        the loader and the shape of the stored pixels, which is empty in
+        ``'encoded'`` mode.
+    """
+    assert mode in SHARD_MODES, f'unsupported shard mode {mode}'
+    img_bytes = get(img_path, backend_args=backend_args)
+    # 与 LoadImageFromShard 用同样的 flag 解码，EXIF 旋转后的图片宽高互换
+    img = mmcv.imfrombytes(img_bytes, flag=color_type)
+    if mode == 'encoded' and scale is None:
+        return img_bytes, img.shape[:2], ()
+    assert mode == 'decoded', 'only decoded images can be pre-resized'
+    ori_shape = img.shape[:2]
+    if scale is not None:
+        img = mmcv.imrescale(img, scale)
+    img = np.ascontiguousarray(img, dtype=np.uint8)
+    return img.tobytes(), ori_shape, img.shape
+
+
+class ImageShardWriter:
+    """Pack images into a few large shard files with an offset index.
+
+    目录结构::
+
+        out_dir
+        ├── shard_00000.bin
+        ├── shard_00001.bin
+        ├── ...
+        └── index_*.npy
+
+    每张图片在 shard 中占一段连续的字节，index 中记录所在的 shard、offset、
+    长度、原图大小以及存储的形状，key（图片路径）与 ``ColumnarAnnotations``
+    一样存成一个 utf-8 字节串。所有文件先写到临时目录，``close`` 时再重命名
+    为 ``out_dir``。
+
+    Args:
+        out_dir (str): The output directory.
+        mode (str): ``'encoded'`` or ``'decoded'``, see :func:`encode_image`.
+            Defaults to ``'encoded'``.
+        shard_size (int): A new shard is started once the current one
+            exceeds this number of bytes. Defaults to 1 GiB.
+    """
+    INDEX_COLUMNS = {
+        'names': np.uint8,
+        'name_offsets': np.int64,
+        'shard_ids': np.int32,
+        'offsets': np.int64,
+        'lengths': np.int64,
+        'ori_shapes': np.int32,
+        'shapes': np.int32,
+        'mode': np.uint8,
+    }
+
+    def __init__(self,
+                 out_dir: str,
+                 mode: str = 'encoded',
+                 shard_size: int = 1 << 30) -> None:
+        assert mode in SHARD_MODES, f'unsupported shard mode {mode}'
+        self.out_dir = out_dir
+        self.mode = mode
+        self.shard_size = shard_size
+        parent_dir = osp.dirname(osp.abspath(out_dir))
+        os.makedirs(parent_dir, exist_ok=True)
+        self.tmp_dir = tempfile.mkdtemp(
+            prefix=f'.{osp.basename(out_dir)}.', dir=parent_dir)
+        self._file = None
+        self._shard_id = -1
+        self._shard_bytes = 0
+        self._names: List[bytes] = []
+        self._shard_ids: List[int] = []
+        self._offsets: List[int] = []
+        self._lengths: List[int] = []
+        self._ori_shapes: List[Tuple[int, int]] = []
+        self._shapes: List[Tuple[int, int, int]] = []
+
+    def _next_shard(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        self._shard_id += 1
+        self._shard_bytes = 0
+        self._file = open(
+            osp.join(self.tmp_dir, f'shard_{self._shard_id:05d}.bin'), 'wb')
+
+    def write(self, key: str, payload: bytes, ori_shape: Tuple[int, int],
+              shape: Tuple[int, ...] = ()) -> None:
+        """Append the payload of an image returned by :func:`encode_image`.
+
+        Args:
+            key (str): The key to look up the image, usually its path.
+            payload (bytes): The bytes to store.
+            ori_shape (tuple[int, int]): The original (h, w) of the image.
+            shape (tuple[int]): Shape of the stored pixels in ``'decoded'``
+                mode.
+        """
+        if self._file is None or self._shard_bytes >= self.shard_size:
+            self._next_shard()
+        if self.mode == 'decoded':
+            assert int(np.prod(shape)) == len(payload)
+            # 灰度图也按 (h, w, 1) 记录
+            shape = tuple(shape[:2]) + (shape[2] if len(shape) > 2 else 1, )
+        else:
+            shape = (0, 0, 0)
+        self._file.write(payload)
+        self._names.append(key.encode('utf-8'))
+        self._shard_ids.append(self._shard_id)
+        self._offsets.append(self._shard_bytes)
+        self._lengths.append(len(payload))
+        self._ori_shapes.append(tuple(ori_shape[:2]))
+        self._shapes.append(shape)
+        self._shard_bytes += len(payload)
+
+    def close(self) -> None:
+        """Write the index and move the shards to ``out_dir``."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        name_offsets = np.zeros(len(self._names) + 1, dtype=np.int64)
+        np.cumsum([len(name) for name in self._names], out=name_offsets[1:])
+        columns = dict(
+            names=np.frombuffer(b''.join(self._names), dtype=np.uint8),
+            name_offsets=name_offsets,
+            shard_ids=self._shard_ids,
+            offsets=self._offsets,
+            lengths=self._lengths,
+            ori_shapes=np.array(self._ori_shapes).reshape(-1, 2),
+            shapes=np.array(self._shapes).reshape(-1, 3),
+            mode=np.frombuffer(self.mode.encode('utf-8'), dtype=np.uint8))
+        for name, dtype in self.INDEX_COLUMNS.items():
+            np.save(
+                osp.join(self.tmp_dir, f'index_{name}.npy'),
+                np.asarray(columns[name], dtype=dtype))
+        if osp.isdir(self.out_dir):
+            shutil.rmtree(self.out_dir)
+        os.rename(self.tmp_dir, self.out_dir)
+
+    def __enter__(self) -> 'ImageShardWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            if self._file is not None:
+                self._file.close()
+            shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+class ImageShardReader:
+    """Read images packed by :class:`ImageShardWriter`.
+
+    shard 文件用 ``np.memmap`` 打开，读取一张图片只是对 memmap 的切片，
+    不会拷贝数据，同一台机器上的所有 worker 通过 page cache 共享同一份数据。
+
+    Args:
+        shard_dir (str): The directory written by :class:`ImageShardWriter`.
+    """
+
+    def __init__(self, shard_dir: str) -> None:
+        self.shard_dir = shard_dir
+        for name in ImageShardWriter.INDEX_COLUMNS:
+            setattr(
+                self, name,
+                np.load(osp.join(shard_dir, f'index_{name}.npy'),
+                        mmap_mode='r'))
+        self.mode = self.mode.tobytes().decode('utf-8')
+        self._shards: dict = {}
+        self._key2idx: Optional[dict] = None
+
+    def __len__(self) -> int:
+        return len(self.shard_ids)
+
+    def get_key(self, idx: int) -> str:
+        start, end = self.name_offsets[idx], self.name_offsets[idx + 1]
+        return self.names[start:end].tobytes().decode('utf-8')
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.key2idx
+
+    @property
+    def key2idx(self) -> dict:
+        """dict: Map from the key of an image to its row in the index, built
+        on the first access."""
+        if self._key2idx is None:
+            self._key2idx = {self.get_key(i): i for i in range(len(self))}
+        return self._key2idx
+
+    def _get_shard(self, shard_id: int) -> np.memmap:
+        shard = self._shards.get(shard_id)
+        if shard is None:
+            shard = np.memmap(
+                osp.join(self.shard_dir, f'shard_{shard_id:05d}.bin'),
+                dtype=np.uint8,
+                mode='r')
+            self._shards[shard_id] = shard
+        return shard
+
+    def get(self, key: Union[str, int]) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """Get an image by its key or row.
+
+        Returns:
+            tuple: A read-only view into the shard, which holds the file
+            bytes in ``'encoded'`` mode and the (h, w, c) uint8 pixels in
+            ``'decoded'`` mode, and the original (h, w) of the image.
+        """
+        idx = key if isinstance(key, (int, np.integer)) else self.key2idx[key]
+        offset = int(self.offsets[idx])
+        data = self._get_shard(int(self.shard_ids[idx]))[
+            offset:offset + int(self.lengths[idx])]
+        if self.mode == 'decoded':
+            data = data.reshape(tuple(int(s) for s in self.shapes[idx]))
+        ori_shape = tuple(int(s) for s in self.ori_shapes[idx])
+        return data, ori_shape
+
+    def __getstate__(self) -> dict:
+        # memmaps would be pickled as in-memory copies, reopen them instead
+        return dict(shard_dir=self.shard_dir)
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state['shard_dir'])
@@ -0,0 +1,8 @@
+from .batch_sampler import (AspectRatioBatchSampler,
+                            MultiBucketAspectRatioBatchSampler)
+from .class_aware_sampler import ClassAwareSampler, FastClassAwareSampler
+
+__all__ = [
+    'AspectRatioBatchSampler', 'MultiBucketAspectRatioBatchSampler',
+    'ClassAwareSampler', 'FastClassAwareSampler'
+]
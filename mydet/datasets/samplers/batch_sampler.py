@@ -1,5 +1,6 @@
-from typing import Iterator, List, Sequence
+from typing import Iterator, List, Sequence, Tuple
 
+import numpy as np
 from torch.utils.data import BatchSampler, Sampler
 
 # from mydet.datasets.samplers.track_img_sampler import TrackImgSampler
@@ -56,4 +57,113 @@ class AspectRatioBatchSampler(BatchSampler):
         if self.drop_last:
             return len(self.sampler) // self.batch_size
         else:
-            return (len(self.sampler) + self.batch_size - 1) // self.batch_size
\ No newline at end of file
+            return (len(self.sampler) + self.batch_size - 1) // self.batch_size
+
+
+@DATA_SAMPLERS.register_module()
+class MultiBucketAspectRatioBatchSampler(BatchSampler):
+    """
+    按长宽比（和面积）把样本分到多个桶中生成 batch，减少 DetDataPreprocessor
+    把一个 batch 填充到相同尺寸时的 padding。
+
+    与 AspectRatioBatchSampler 不同，所有样本的宽高在初始化时一次性读取
+    （优先使用数据集的列式标注），每个 epoch 不再逐个反序列化 data_info。
+    每个桶攒够 ``pool_batches`` 个 batch 的样本后，先按长宽比和面积排序再
+    切分成 batch，使同一个 batch 内的图片形状尽量接近。样本顺序来自
+    ``sampler``，因此分布式采样的语义不变。
+
+    Args:
+        sampler (Sampler): Base sampler.
+        batch_size (int): Size of mini-batch.
+        drop_last (bool): If ``True``, the sampler will drop the last batch if
+            its size would be less than ``batch_size``. Defaults to False.
+        ratio_boundaries (Sequence[float]): Boundaries of the aspect ratio
+            (w / h) buckets. The default ``(1.0, )`` gives the portrait and
+            landscape buckets of :class:`AspectRatioBatchSampler`.
+        area_boundaries (Sequence[float]): Boundaries of the image area
+            (w * h) buckets, which split every aspect ratio bucket further.
+            Defaults to ().
+        pool_batches (int): Number of batches of a bucket that are sorted
+            together. Larger values give less padding but less randomness.
+            Defaults to 1.
+    """
+
+    def __init__(self,
+                 sampler: Sampler,
+                 batch_size: int,
+                 drop_last: bool = False,
+                 ratio_boundaries: Sequence[float] = (1.0, ),
+                 area_boundaries: Sequence[float] = (),
+                 pool_batches: int = 1) -> None:
+        if not isinstance(sampler, Sampler):
+            raise TypeError('sampler should be an instance of ``Sampler``, '
+                            f'but got {sampler}')
+        if not isinstance(batch_size, int) or batch_size <= 0:
+            raise ValueError('batch_size should be a positive integer value, '
+                             f'but got batch_size={batch_size}')
+        if not isinstance(pool_batches, int) or pool_batches <= 0:
+            raise ValueError('pool_batches should be a positive integer '
+                             f'value, but got pool_batches={pool_batches}')
+        self.sampler = sampler
+        self.batch_size = batch_size
+        self.drop_last = drop_last
+        self.pool_batches = pool_batches
+
+        widths, heights = self._get_shapes(sampler.dataset)
+        self.aspect_ratios = widths / np.maximum(heights, 1)
+        self.areas = widths * heights
+        ratio_bins = np.digitize(self.aspect_ratios, sorted(ratio_boundaries))
+        area_bins = np.digitize(self.areas, sorted(area_boundaries))
+        self.num_buckets = (len(ratio_boundaries) + 1) * \
+            (len(area_boundaries) + 1)
+        self.bucket_ids = ratio_bins * (len(area_boundaries) + 1) + area_bins
+
+    @staticmethod
+    def _get_shapes(dataset) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        获取所有样本的宽和高，数据集没有列式标注时逐个读取一次
+        """
+        if hasattr(dataset, 'get_img_column'):
+            widths = dataset.get_img_column('widths')
+            heights = dataset.get_img_column('heights')
+            if widths is not None and heights is not None:
+                return widths.astype(np.float64), heights.astype(np.float64)
+        shapes = np.zeros((len(dataset), 2), dtype=np.float64)
+        for idx in range(len(dataset)):
+            data_info = dataset.get_data_info(idx)
+            shapes[idx] = data_info['width'], data_info['height']
+        return shapes[:, 0], shapes[:, 1]
+
+    def _sort_by_shape(self, indices: List[int]) -> List[int]:
+        """Sort indices by aspect ratio and then by area."""
+        inds = np.asarray(indices, dtype=np.int64)
+        order = np.lexsort((self.areas[inds], self.aspect_ratios[inds]))
+        return inds[order].tolist()
+
+    def __iter__(self) -> Iterator[List[int]]:
+        pool_size = self.batch_size * self.pool_batches
+        buckets = [[] for _ in range(self.num_buckets)]
+        for idx in self.sampler:
+            bucket = buckets[self.bucket_ids[idx]]
+            bucket.append(idx)
+            if len(bucket) == pool_size:
+                pool = self._sort_by_shape(bucket) \
+                    if self.pool_batches > 1 else bucket[:]
+                del bucket[:]
+                for i in range(0, pool_size, self.batch_size):
+                    yield pool[i:i + self.batch_size]
+
+        # 剩余数据，排序后相邻桶的样本尽量放在一起
+        left_data = self._sort_by_shape(
+            [idx for bucket in buckets for idx in bucket])
+        for i in range(0, len(left_data), self.batch_size):
+            batch = left_data[i:i + self.batch_size]
+            if len(batch) < self.batch_size and self.drop_last:
+                break
+            yield batch
+
+    def __len__(self) -> int:
+        if self.drop_last:
+            return len(self.sampler) // self.batch_size
+        else:
+            return (len(self.sampler) + self.batch_size - 1) // self.batch_size
@@ -200,3 +200,188 @@ class RandomCycleIter:
         idx = self.data[self.index[self.i]]
         self.i += 1
         return idx
+
+
+@DATA_SAMPLERS.register_module()
+class FastClassAwareSampler(ClassAwareSampler):
+    """Vectorized version of :class:`ClassAwareSampler` with an optional
+    repeat factor sampling mode.
+
+    The per-label image lists are stored as a CSR table built from the
+    columnar annotations of the dataset (``ann_columns`` and ``ann_rows``) in
+    one pass, falling back to ``get_cat_ids`` when they are not available.
+    The indices of a whole epoch are generated with NumPy at once.
+
+    In ``'class_aware'`` mode the sampling distribution is the same as
+    :class:`ClassAwareSampler`: every bin is a random permutation of the
+    valid labels and the images of each label are drawn from a cycle of
+    random permutations.
+
+    In ``'repeat_factor'`` mode the images are sampled as in `LVIS
+    <https://arxiv.org/abs/1908.03195>`_. The repeat factor of a label is
+    ``max(1, sqrt(repeat_thr / f))`` where ``f`` is the fraction of images
+    containing the label, the repeat factor of an image is the maximum over
+    its labels and is stochastically rounded every epoch.
+
+    Args:
+        dataset: Dataset used for sampling.
+        seed (int, optional): random seed used to shuffle the sampler.
+            This number should be identical across all
+            processes in the distributed group. Defaults to None.
+        num_sample_class (int): The number of samples taken from each
+            per-label list. Only used in ``'class_aware'`` mode.
+            Defaults to 1.
+        sample_mode (str): ``'class_aware'`` or ``'repeat_factor'``.
+            Defaults to ``'class_aware'``.
+        repeat_thr (float): Frequency threshold of the repeat factor
+            sampling. Defaults to 0.001.
+    """
+
+    def __init__(self,
+                 dataset: BaseDataset,
+                 seed: Optional[int] = None,
+                 num_sample_class: int = 1,
+                 sample_mode: str = 'class_aware',
+                 repeat_thr: float = 0.001) -> None:
+        assert sample_mode in ('class_aware', 'repeat_factor')
+        self.sample_mode = sample_mode
+        self.repeat_thr = repeat_thr
+        super().__init__(dataset, seed, num_sample_class)
+
+        if sample_mode == 'repeat_factor':
+            self.repeat_factors = self.get_repeat_factors()
+            self.num_samples = int(
+                math.ceil(self.repeat_factors.sum() / self.world_size))
+            self.total_size = self.num_samples * self.world_size
+
+    def get_cat2imgs(self) -> Dict[int, np.ndarray]:
+        """Get a dict with class as key and image indices as values.
+
+        Besides the dict, the CSR table ``cat_offsets`` / ``cat_imgs`` and
+        the unique (image, label) pairs ``pair_imgs`` / ``pair_labels`` are
+        kept for vectorized sampling.
+
+        Returns:
+            dict[int, np.ndarray]: A dict of per-label image indices.
+        """
+        classes = self.dataset.metainfo.get('classes', None)
+        if classes is None:
+            raise ValueError('dataset metainfo must contain `classes`')
+        num_classes = len(classes)
+
+        anns = getattr(self.dataset, 'ann_columns', None)
+        rows = getattr(self.dataset, 'ann_rows', None)
+        if anns is not None and rows is not None and \
+                len(rows) == len(self.dataset):
+            rows = np.asarray(rows, dtype=np.int64)
+            counts = anns.inst_offsets[rows + 1] - anns.inst_offsets[rows]
+            imgs = np.repeat(np.arange(len(rows)), counts)
+            # instance indices of the selected rows in dataset order
+            inst_inds = np.arange(counts.sum()) + np.repeat(
+                anns.inst_offsets[rows] - (np.cumsum(counts) - counts),
+                counts)
+            labels = np.asarray(anns.labels[inst_inds], dtype=np.int64)
+        else:
+            cat_ids = [self.dataset.get_cat_ids(i)
+                       for i in range(len(self.dataset))]
+            imgs = np.repeat(
+                np.arange(len(cat_ids)), [len(x) for x in cat_ids])
+            labels = np.array([cat for x in cat_ids for cat in x],
+                              dtype=np.int64)
+
+        valid = (labels >= 0) & (labels < num_classes)
+        # unique (image, label) pairs sorted by label and then image
+        num_imgs = max(len(self.dataset), 1)
+        pairs = np.unique(labels[valid] * num_imgs + imgs[valid])
+        self.pair_labels = pairs // num_imgs
+        self.pair_imgs = pairs % num_imgs
+        self.cat_offsets = np.zeros(num_classes + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(self.pair_labels, minlength=num_classes),
+            out=self.cat_offsets[1:])
+        return {
+            i: self.pair_imgs[self.cat_offsets[i]:self.cat_offsets[i + 1]]
+            for i in range(num_classes)
+        }
+
+    def get_repeat_factors(self) -> np.ndarray:
+        """Get the repeat factor of every image.
+
+        Returns:
+            np.ndarray: The repeat factors, images without labels have a
+            repeat factor of 1.
+        """
+        num_imgs = len(self.dataset)
+        cat_freq = np.diff(self.cat_offsets) / max(num_imgs, 1)
+        with np.errstate(divide='ignore'):
+            cat_repeat = np.maximum(1.0, np.sqrt(self.repeat_thr / cat_freq))
+        repeat_factors = np.ones(num_imgs, dtype=np.float64)
+        np.maximum.at(repeat_factors, self.pair_imgs,
+                      cat_repeat[self.pair_labels])
+        return repeat_factors
+
+    def _class_aware_indices(self, rng: np.random.Generator) -> np.ndarray:
+        """Generate the indices of an epoch in ``'class_aware'`` mode."""
+        valid_cats = np.asarray(self.valid_cat_inds, dtype=np.int64)
+        num_bins = int(
+            math.ceil(self.total_size * 1.0 / self.num_classes /
+                      self.num_sample_class))
+        # draws of each label, the same for all labels
+        num_draws = num_bins * self.num_sample_class
+
+        # every label draws from ``num_rounds`` random permutations of its
+        # images. Shuffle all permutations at once by sorting random keys
+        # inside each (label, round) group.
+        num_cat_imgs = np.diff(self.cat_offsets)[valid_cats]
+        num_rounds = -(-num_draws // num_cat_imgs)
+        block_sizes = num_rounds * num_cat_imgs
+        block_starts = np.concatenate([[0], np.cumsum(block_sizes)[:-1]])
+        cat_of_elem = np.repeat(np.arange(len(valid_cats)), block_sizes)
+        pos_in_block = np.arange(block_sizes.sum()) - block_starts[cat_of_elem]
+        num_imgs_of_elem = num_cat_imgs[cat_of_elem]
+        group = cat_of_elem * num_rounds.max() + \
+            pos_in_block // num_imgs_of_elem
+        imgs = self.pair_imgs[self.cat_offsets[valid_cats][cat_of_elem] +
+                              pos_in_block % num_imgs_of_elem]
+        imgs = imgs[np.lexsort((rng.random(len(imgs)), group))]
+        # (num_classes, num_draws) image sequence of every label
+        cat_img_seqs = imgs[block_starts[:, None] + np.arange(num_draws)]
+
+        # every bin visits all labels in a random order, so the label of the
+        # ``b``-th bin takes the ``b``-th group of its image sequence
+        cat_seqs = rng.permuted(
+            np.tile(np.arange(len(valid_cats)), (num_bins, 1)), axis=1)
+        draw_inds = np.arange(num_bins)[:, None, None] * \
+            self.num_sample_class + np.arange(self.num_sample_class)
+        return cat_img_seqs[cat_seqs[..., None], draw_inds].reshape(-1)
+
+    def _repeat_factor_indices(self, rng: np.random.Generator) -> np.ndarray:
+        """Generate the indices of an epoch in ``'repeat_factor'`` mode."""
+        int_part = np.floor(self.repeat_factors)
+        repeats = int_part + (rng.random(len(self.repeat_factors)) <
+                              self.repeat_factors - int_part)
+        indices = np.repeat(
+            np.arange(len(self.repeat_factors)), repeats.astype(np.int64))
+        return rng.permutation(indices)
+
+    def __iter__(self) -> Iterator[int]:
+        # deterministically shuffle based on epoch
+        rng = np.random.default_rng(self.epoch + self.seed)
+        if self.sample_mode == 'class_aware':
+            indices = self._class_aware_indices(rng)
+        else:
+            indices = self._repeat_factor_indices(rng)
+
+        # fix extra samples to make it evenly divisible
+        if len(indices) >= self.total_size:
+            indices = indices[:self.total_size]
+        else:
+            indices = np.resize(indices, self.total_size)
+        assert len(indices) == self.total_size
+
+        # subsample
+        offset = self.num_samples * self.rank
+        indices = indices[offset:offset + self.num_samples]
+        assert len(indices) == self.num_samples
+
+        return iter(indices.tolist())
@@ -10,6 +10,8 @@ from mydet.registry import TRANSFORMS
 from mmdet.structures import DetDataSample, ReIDDataSample, TrackDataSample
 from mmdet.structures.bbox import BaseBoxes
 
+from .geometric import apply_lazy_geometric
+
 
 @TRANSFORMS.register_module()
 class PackDetInputs(BaseTransform):
@@ -40,17 +42,84 @@ class PackDetInputs(BaseTransform):
             ``mmcv.DataContainer`` and collected in ``data[img_metas]``.
             Default: ``('img_id', 'img_path', 'ori_shape', 'img_shape',
             'scale_factor', 'flip', 'flip_direction')``
+        contiguous (bool): Whether to copy the image into a contiguous CHW
+            tensor. Set it to False with ``padded_collate``, which copies the
+            CHW view of the image into the batch directly. Default: True.
+        flat_instances (bool): Whether to pack ``gt_bboxes``,
+            ``gt_bboxes_labels`` and ``gt_ignore_flags`` into one (K, 6)
+            float32 record ``[x1, y1, x2, y2, label, ignore_flag]`` in
+            ``packed_results['gt_records']`` instead of building
+            ``InstanceData``. ``padded_collate`` concatenates the records of
+            a batch and ``DetDataPreprocessor`` splits them back into
+            ``gt_instances`` and ``ignored_instances``. Masks are not
+            supported. Default: False.
     """
     mapping_table = {
         'gt_bboxes': 'bboxes',
         'gt_bboxes_labels': 'labels',
         'gt_masks': 'masks'
     }
+    supports_lazy_geometric = True
 
     def __init__(self,
                  meta_keys=('img_id', 'img_path', 'ori_shape', 'img_shape',
-                            'scale_factor', 'flip', 'flip_direction')):
+                            'scale_factor', 'flip', 'flip_direction'),
+                 contiguous: bool = True,
+                 flat_instances: bool = False):
         self.meta_keys = meta_keys
+        self.contiguous = contiguous
+        self.flat_instances = flat_instances
+
+    def _pack_instances(self, results: dict,
+                        data_sample: DetDataSample) -> None:
+        """Pack the annotations into ``gt_instances`` and
+        ``ignored_instances`` of the data sample."""
+        if 'gt_ignore_flags' in results:
+            valid_idx = np.where(results['gt_ignore_flags'] == 0)[0]
+            ignore_idx = np.where(results['gt_ignore_flags'] == 1)[0]
+
+        instance_data = InstanceData()
+        ignore_instance_data = InstanceData()
+
+        for key in self.mapping_table.keys():
+            if key not in results:
+                continue
+            if key == 'gt_masks' or isinstance(results[key], BaseBoxes):
+                if 'gt_ignore_flags' in results:
+                    instance_data[
+                        self.mapping_table[key]] = results[key][valid_idx]
+                    ignore_instance_data[
+                        self.mapping_table[key]] = results[key][ignore_idx]
+                else:
+                    instance_data[self.mapping_table[key]] = results[key]
+            else:
+                if 'gt_ignore_flags' in results:
+                    instance_data[self.mapping_table[key]] = to_tensor(
+                        results[key][valid_idx])
+                    ignore_instance_data[self.mapping_table[key]] = to_tensor(
+                        results[key][ignore_idx])
+                else:
+                    instance_data[self.mapping_table[key]] = to_tensor(
+                        results[key])
+        data_sample.gt_instances = instance_data
+        data_sample.ignored_instances = ignore_instance_data
+
+    @staticmethod
+    def _pack_gt_records(results: dict) -> np.ndarray:
+        """Write boxes, labels and ignore flags into one preallocated
+        (K, 6) float32 array."""
+        assert 'gt_masks' not in results, \
+            'flat_instances does not support gt_masks'
+        bboxes = results['gt_bboxes']
+        if isinstance(bboxes, BaseBoxes):
+            bboxes = bboxes.tensor.numpy()
+        assert bboxes.shape[-1] == 4, \
+            'flat_instances only supports horizontal boxes'
+        records = np.empty((len(bboxes), 6), dtype=np.float32)
+        records[:, :4] = bboxes
+        records[:, 4] = results.get('gt_bboxes_labels', -1)
+        records[:, 5] = results.get('gt_ignore_flags', 0)
+        return records
 
     def transform(self, results: dict) -> dict:
         """Method to pack the input data.
@@ -65,6 +134,8 @@ class PackDetInputs(BaseTransform):
             - 'data_sample' (obj:`DetDataSample`): The annotation info of the
                 sample.
         """
+        # 执行 lazy 几何变换中尚未执行的部分
+        results = apply_lazy_geometric(results)
         packed_results = dict()
         if 'img' in results:
             img = results['img']
@@ -77,7 +148,10 @@ class PackDetInputs(BaseTransform):
             # `torch.permute()` followed by `torch.contiguous()`
             # Refer to https://github.com/open-mmlab/mmdetection/pull/9533
             # for more details
-            if not img.flags.c_contiguous:
+            if not self.contiguous:
+                # 只是 CHW 的视图，由 padded_collate 拷贝到 batch 中
+                img = to_tensor(np.ascontiguousarray(img)).permute(2, 0, 1)
+            elif not img.flags.c_contiguous:
                 img = np.ascontiguousarray(img.transpose(2, 0, 1))
                 img = to_tensor(img)
             else:
@@ -85,36 +159,13 @@ class PackDetInputs(BaseTransform):
 
             packed_results['inputs'] = img
 
-        if 'gt_ignore_flags' in results:
-            valid_idx = np.where(results['gt_ignore_flags'] == 0)[0]
-            ignore_idx = np.where(results['gt_ignore_flags'] == 1)[0]
-
         data_sample = DetDataSample()
-        instance_data = InstanceData()
-        ignore_instance_data = InstanceData()
-
-        for key in self.mapping_table.keys():
-            if key not in results:
-                continue
-            if key == 'gt_masks' or isinstance(results[key], BaseBoxes):
-                if 'gt_ignore_flags' in results:
-                    instance_data[
-                        self.mapping_table[key]] = results[key][valid_idx]
-                    ignore_instance_data[
-                        self.mapping_table[key]] = results[key][ignore_idx]
-                else:
-                    instance_data[self.mapping_table[key]] = results[key]
-            else:
-                if 'gt_ignore_flags' in results:
-                    instance_data[self.mapping_table[key]] = to_tensor(
-                        results[key][valid_idx])
-                    ignore_instance_data[self.mapping_table[key]] = to_tensor(
-                        results[key][ignore_idx])
-                else:
-                    instance_data[self.mapping_table[key]] = to_tensor(
-                        results[key])
-        data_sample.gt_instances = instance_data
-        data_sample.ignored_instances = ignore_instance_data
+        if self.flat_instances and 'gt_bboxes' in results:
+            # 不构建 InstanceData，由 DetDataPreprocessor 按 batch 恢复
+            packed_results['gt_records'] = to_tensor(
+                self._pack_gt_records(results))
+        else:
+            self._pack_instances(results, data_sample)
 
         if 'proposals' in results:
             proposals = InstanceData(
@@ -144,7 +195,9 @@ class PackDetInputs(BaseTransform):
 
     def __repr__(self) -> str:
         repr_str = self.__class__.__name__
-        repr_str += f'(meta_keys={self.meta_keys})'
+        repr_str += f'(meta_keys={self.meta_keys}, '
+        repr_str += f'contiguous={self.contiguous}, '
+        repr_str += f'flat_instances={self.flat_instances})'
         return repr_str
 
 
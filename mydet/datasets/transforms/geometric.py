@@ -0,0 +1,363 @@
+"""
+延迟执行的几何变换
+
+Resize、RandomFlip、RandomCrop、Pad 等几何变换都可以表示为一个轴对齐的仿射
+矩阵。lazy 模式下这些变换只把矩阵累乘到 ``results['lazy_geom']`` 中并更新
+``img_shape`` 等元信息，图片、gt_masks、gt_seg_map 在 ``apply_lazy_geometric``
+中只做一次 ``cv2.warpAffine``，gt_bboxes 也只通过 ``BaseBoxes.project_`` 投影
+一次。
+
+lazy_geom 中保存的状态：
+
+    - matrix: 从 ``results['img']`` 到当前画布的 3x3 矩阵，坐标以像素边界为准
+    - out_shape: 当前画布的 (h, w)
+    - region: 原图内容在当前画布中的区域 (x1, y1, x2, y2)，被裁剪后缩小，
+      padding 后不变，区域外填充 pad_val
+    - interpolation: 图片插值方式
+    - pad_val: dict(img=0, masks=0, seg=255)
+    - clip_border: 投影后是否将 gt_bboxes 裁剪到 region 中
+    - recompute_bbox: 是否根据变换后的 gt_masks 重新计算 gt_bboxes
+
+Note:
+    lazy 变换之后，``results`` 中的图片和标注仍然是变换前的。能处理 lazy 状态
+    的变换将类属性 ``supports_lazy_geometric`` 设为 True，其余变换执行前由
+    :class:`LazyGeometricCompose` 调用 ``apply_lazy_geometric``，因此光度变换、
+    按内容裁剪、读取 gt_bboxes 的过滤等变换看到的总是变换后的数据。
+
+    RandomChoice、TestTimeAug 等包装变换内部的 pipeline 由普通的 ``Compose``
+    执行，不会在其中的变换之前执行 lazy 状态，所以包装变换内部不支持
+    ``lazy=True``，:class:`LazyGeometricCompose` 构建时会报错。
+"""
+from typing import Callable, Iterator, Optional, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+from mmengine.dataset import Compose
+
+from mydet.structures.bbox import BaseBoxes
+from mydet.structures.mask import BitmapMasks, PolygonMasks, RLEMasks
+
+cv2_interp_codes = {
+    'nearest': cv2.INTER_NEAREST,
+    'bilinear': cv2.INTER_LINEAR,
+    'bicubic': cv2.INTER_CUBIC,
+    'lanczos': cv2.INTER_LANCZOS4
+}
+
+# cv2 每次 warp 最多支持的通道数（OpenCV 5 中 CV_CN_MAX 为 128）
+_MAX_WARP_CHANNELS = 128
+
+
+def _get_lazy_state(results: dict) -> dict:
+    """Get the pending geometric state of ``results``, create it if there is
+    none."""
+    state = results.get('lazy_geom')
+    if state is None:
+        h, w = results['img_shape'][:2] if 'img_shape' in results \
+            else results['img'].shape[:2]
+        state = dict(
+            matrix=np.eye(3),
+            out_shape=(h, w),
+            region=np.array([0, 0, w, h], dtype=np.float64),
+            interpolation='bilinear',
+            pad_val=dict(img=0, masks=0, seg=255),
+            clip_border=False,
+            recompute_bbox=False)
+        results['lazy_geom'] = state
+    return state
+
+
+def add_lazy_geometric(results: dict,
+                       matrix: np.ndarray,
+                       out_shape: Tuple[int, int],
+                       crop: bool = False,
+                       interpolation: Optional[str] = None,
+                       pad_val: Optional[dict] = None,
+                       clip_border: bool = False,
+                       recompute_bbox: bool = False) -> dict:
+    """Compose an axis-aligned geometric transform into the pending state.
+
+    Args:
+        results (dict): Result dict from the data pipeline.
+        matrix (np.ndarray): The 3x3 matrix of the transform, in pixel-edge
+            coordinates.
+        out_shape (tuple[int, int]): The (h, w) of the canvas after the
+            transform.
+        crop (bool): Whether the transform crops the canvas, in which case
+            the content outside the new canvas is discarded even if the
+            canvas is padded later. Defaults to False.
+        interpolation (str, optional): Interpolation of the image.
+        pad_val (dict, optional): Padding values of ``img``, ``masks`` and
+            ``seg``.
+        clip_border (bool): Whether to clip the boxes to the content region.
+        recompute_bbox (bool): Whether to recompute the boxes from masks.
+
+    Returns:
+        dict: The result dict.
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    assert matrix[0, 1] == 0 and matrix[1, 0] == 0, \
+        'only axis-aligned transforms can be composed lazily'
+    state = _get_lazy_state(results)
+    state['matrix'] = matrix @ state['matrix']
+
+    x1, y1, x2, y2 = state['region']
+    corners = matrix @ np.array([[x1, x2], [y1, y2], [1, 1]])
+    region = np.concatenate(
+        [corners[:2].min(axis=1), corners[:2].max(axis=1)])
+    if crop:
+        region[:2] = np.maximum(region[:2], 0)
+        region[2:] = np.minimum(region[2:], out_shape[::-1])
+    state['region'] = region
+    state['out_shape'] = tuple(out_shape)
+    if interpolation is not None:
+        state['interpolation'] = interpolation
+    if pad_val is not None:
+        state['pad_val'] = {**state['pad_val'], **pad_val}
+    state['clip_border'] |= clip_border
+    state['recompute_bbox'] |= recompute_bbox
+
+    homography_matrix = results.get('homography_matrix')
+    if homography_matrix is None:
+        homography_matrix = np.eye(3, dtype=np.float32)
+    results['homography_matrix'] = (matrix @ homography_matrix).astype(
+        np.float32)
+    results['img_shape'] = tuple(out_shape)
+    return results
+
+
+def _clip_bboxes(bboxes: BaseBoxes, region: np.ndarray) -> None:
+    """Clip boxes to a region in-place."""
+    x1, y1, x2, y2 = region
+    if x1 == 0 and y1 == 0:
+        bboxes.clip_((y2, x2))
+    else:
+        bboxes.translate_((-x1, -y1))
+        bboxes.clip_((y2 - y1, x2 - x1))
+        bboxes.translate_((x1, y1))
+
+
+def get_lazy_bboxes(results: dict) -> Optional[BaseBoxes]:
+    """Get a copy of ``gt_bboxes`` projected with the pending transforms,
+    without materializing the image.
+
+    Returns:
+        BaseBoxes, optional: The projected boxes, None if there are no
+        ``gt_bboxes``.
+    """
+    bboxes = results.get('gt_bboxes')
+    if bboxes is None:
+        return None
+    bboxes = bboxes.clone()
+    state = results.get('lazy_geom')
+    if state is not None:
+        bboxes.project_(state['matrix'])
+        if state['clip_border']:
+            _clip_bboxes(bboxes, state['region'])
+    return bboxes
+
+
+def _warp(data: np.ndarray, matrix: np.ndarray, out_shape: Tuple[int, int],
+          region: Tuple[int, int, int, int], interpolation: int,
+          pad_val: Union[int, float, tuple]) -> np.ndarray:
+    """Warp an image like array into the content region of a canvas with a
+    single ``cv2.warpAffine`` and fill the rest of the canvas."""
+    out_h, out_w = out_shape
+    x1, y1, x2, y2 = region
+    channels = data.shape[2:]
+    if x2 <= x1 or y2 <= y1:
+        out = np.empty((out_h, out_w) + channels, dtype=data.dtype)
+        out[...] = pad_val
+        return out
+
+    # cv2 使用像素中心坐标
+    to_edge = np.array([[1, 0, 0.5], [0, 1, 0.5], [0, 0, 1]])
+    to_center = np.array([[1, 0, -0.5 - x1], [0, 1, -0.5 - y1], [0, 0, 1]])
+    affine = (to_center @ matrix @ to_edge)[:2]
+    if data.shape[:2] == (y2 - y1, x2 - x1) and np.allclose(
+            affine, np.eye(3)[:2], atol=1e-6):
+        content = data
+    else:
+        # 内容区域内复制边缘像素，与 resize 的边界处理一致
+        content = cv2.warpAffine(
+            data,
+            affine, (x2 - x1, y2 - y1),
+            flags=interpolation,
+            borderMode=cv2.BORDER_REPLICATE)
+        content = content.reshape(content.shape[:2] + channels)
+    if (x1, y1, x2, y2) == (0, 0, out_w, out_h):
+        return content
+    out = np.empty((out_h, out_w) + channels, dtype=data.dtype)
+    out[...] = pad_val
+    out[y1:y2, x1:x2] = content
+    return out
+
+
+def _warp_bitmap_masks(masks: BitmapMasks, matrix: np.ndarray,
+                       out_shape: Tuple[int, int],
+                       region: Tuple[int, int, int, int],
+                       pad_val: int) -> BitmapMasks:
+    """Warp bitmap masks, several masks are warped in one call."""
+    out_h, out_w = out_shape
+    if len(masks) == 0:
+        return BitmapMasks(
+            np.zeros((0, out_h, out_w), dtype=masks.masks.dtype), out_h,
+            out_w)
+    data = masks.masks.transpose(1, 2, 0)
+    warped = [
+        _warp(data[..., i:i + _MAX_WARP_CHANNELS], matrix, out_shape, region,
+              cv2.INTER_NEAREST, pad_val)
+        for i in range(0, data.shape[2], _MAX_WARP_CHANNELS)
+    ]
+    warped = np.concatenate(warped, axis=2).transpose(2, 0, 1)
+    return BitmapMasks(np.ascontiguousarray(warped), out_h, out_w)
+
+
+def _project_polygon_masks(masks: PolygonMasks, matrix: np.ndarray,
+                           out_shape: Tuple[int, int],
+                           region: np.ndarray) -> PolygonMasks:
+    """Project polygon masks and crop them to the content region."""
+    out_h, out_w = out_shape
+    src_region = np.array([0, 0, masks.width, masks.height], dtype=np.float64)
+    projected = []
+    for poly_per_obj in masks.masks:
+        projected_poly = []
+        for p in poly_per_obj:
+            p = p.reshape(-1, 2) @ matrix[:2, :2].T + matrix[:2, 2]
+            projected_poly.append(p.reshape(-1))
+        projected.append(projected_poly)
+    masks = PolygonMasks(projected, out_h, out_w)
+
+    corners = matrix @ np.array([[src_region[0], src_region[2]],
+                                 [src_region[1], src_region[3]], [1, 1]])
+    full = np.concatenate([corners[:2].min(axis=1), corners[:2].max(axis=1)])
+    if len(masks) == 0 or (np.all(full[:2] >= region[:2] - 1e-6)
+                           and np.all(full[2:] <= region[2:] + 1e-6)):
+        return masks
+    # 有裁剪时与 RandomCrop 相同，用 shapely 求交集，再平移回画布坐标
+    cropped = masks.crop(region.copy())
+    x1, y1 = region[:2]
+    for poly_per_obj in cropped.masks:
+        for p in poly_per_obj:
+            p[0::2] += x1
+            p[1::2] += y1
+    return PolygonMasks(cropped.masks, out_h, out_w)
+
+
+def apply_lazy_geometric(results: dict) -> dict:
+    """Apply the pending geometric transforms to the image, masks,
+    segmentation map and boxes.
+
+    Args:
+        results (dict): Result dict from the data pipeline.
+
+    Returns:
+        dict: The result dict, unchanged if there are no pending transforms.
+    """
+    state = results.pop('lazy_geom', None)
+    if state is None:
+        return results
+    matrix = state['matrix']
+    out_shape = state['out_shape']
+    region_f = state['region']
+    region = tuple(int(v) for v in np.round(region_f))
+    pad_val = state['pad_val']
+
+    if results.get('img', None) is not None:
+        results['img'] = _warp(results['img'], matrix, out_shape, region,
+                               cv2_interp_codes[state['interpolation']],
+                               pad_val.get('img', 0))
+    if results.get('gt_seg_map', None) is not None:
+        results['gt_seg_map'] = _warp(results['gt_seg_map'], matrix,
+                                      out_shape, region, cv2.INTER_NEAREST,
+                                      pad_val.get('seg', 255))
+    gt_masks = results.get('gt_masks', None)
+    if isinstance(gt_masks, BitmapMasks):
+        results['gt_masks'] = _warp_bitmap_masks(gt_masks, matrix, out_shape,
+                                                 region,
+                                                 pad_val.get('masks', 0))
+    elif isinstance(gt_masks, RLEMasks):
+        # RLE 不解码，只记录变换
+        results['gt_masks'] = gt_masks.project(matrix, out_shape, region_f)
+    elif isinstance(gt_masks, PolygonMasks):
+        results['gt_masks'] = _project_polygon_masks(gt_masks, matrix,
+                                                     out_shape, region_f)
+
+    if results.get('gt_bboxes', None) is not None:
+        results['gt_bboxes'].project_(matrix)
+        if state['clip_border']:
+            _clip_bboxes(results['gt_bboxes'], region_f)
+        if state['recompute_bbox'] and results.get('gt_masks') is not None:
+            results['gt_bboxes'] = results['gt_masks'].get_bboxes(
+                type(results['gt_bboxes']))
+    return results
+
+
+def materialize_lazy_geometric(transform: Callable, results: dict) -> dict:
+    """Apply the pending geometric transforms if ``transform`` does not
+    support the lazy state.
+
+    A transform supports the lazy state if its class attribute
+    ``supports_lazy_geometric`` is True, i.e. it either composes its own
+    geometric transform into ``results['lazy_geom']`` or applies the pending
+    state itself before reading the image and annotations.
+
+    Args:
+        transform (Callable): The transform to run next.
+        results (dict): Result dict from the data pipeline.
+
+    Returns:
+        dict: The result dict.
+    """
+    if 'lazy_geom' in results and not getattr(
+            transform, 'supports_lazy_geometric', False):
+        results = apply_lazy_geometric(results)
+    return results
+
+
+def _iter_nested_transforms(transform: Callable) -> Iterator[Callable]:
+    """Yield the transforms nested in wrappers such as ``RandomChoice``,
+    ``TestTimeAug`` and ``MultiBranch``, recursively."""
+    for name in ('transforms', 'subroutines', 'branch_pipelines'):
+        nested = getattr(transform, name, None)
+        if isinstance(nested, dict):
+            nested = list(nested.values())
+        if not isinstance(nested, (list, tuple)):
+            continue
+        for t in nested:
+            yield t
+            yield from _iter_nested_transforms(t)
+
+
+class LazyGeometricCompose(Compose):
+    """Compose transforms and apply the pending geometric transforms before
+    each transform that does not support the lazy state.
+
+    Only the top-level transforms are checked, so ``lazy=True`` is not
+    supported by the transforms nested in wrappers, which raises a
+    ``ValueError``.
+
+    Args:
+        transforms (Sequence[dict, callable], optional): Sequence of transform
+            object or config dict to be composed.
+    """
+
+    def __init__(self,
+                 transforms: Optional[Sequence[Union[dict, Callable]]]
+                 ) -> None:
+        super().__init__(transforms)
+        for transform in self.transforms:
+            for nested in _iter_nested_transforms(transform):
+                if getattr(nested, 'lazy', False) is True:
+                    raise ValueError(
+                        f'{type(nested).__name__}(lazy=True) nested in '
+                        f'{type(transform).__name__} is not supported, '
+                        'set `lazy=False` or move it to the top level of '
+                        'the pipeline.')
+
+    def __call__(self, data: dict) -> Optional[dict]:
+        for t in self.transforms:
+            data = t(materialize_lazy_geometric(t, data))
+            if data is None:
+                return None
+        return data
@@ -1,5 +1,7 @@
+import os.path as osp
 from typing import Optional, Tuple, Union
 
+import cv2
 import mmcv
 import numpy as np
 import pycocotools.mask as maskUtils
@@ -10,10 +12,11 @@ from mmcv.transforms import LoadImageFromFile
 from mmengine.fileio import get
 from mmengine.structures import BaseDataElement
 
+from mydet.datasets.image_shard import ImageShardReader
 from mydet.registry import TRANSFORMS
 from mydet.structures.bbox import get_box_type
 from mydet.structures.bbox.box_type import autocast_box_type
-from mydet.structures.mask import BitmapMasks, PolygonMasks
+from mydet.structures.mask import BitmapMasks, PolygonMasks, RLEMasks
 
 @TRANSFORMS.register_module()
 class LoadAnnotations(MMCV_LoadAnnotations):
@@ -24,6 +27,7 @@ class LoadAnnotations(MMCV_LoadAnnotations):
     def __init__(self, 
                  with_mask: bool = False,
                  poly2mask: bool = True,
+                 rle_mask: bool = False,
                  box_type: str = 'hbox',
                  # use for semseg
                  reduce_zero_label: bool = False,
@@ -32,6 +36,11 @@ class LoadAnnotations(MMCV_LoadAnnotations):
         super(LoadAnnotations, self).__init__(**kwargs)
         self.with_mask = with_mask
         self.poly2mask = poly2mask
+        # 以压缩的 RLE 形式保存 mask（RLEMasks），几何变换不解码，
+        # 只在需要时（如计算 mask target）解码
+        self.rle_mask = rle_mask
+        if rle_mask:
+            assert poly2mask, 'rle_mask requires poly2mask=True'
         self.box_type = box_type
         self.reduce_zero_label = reduce_zero_label
         self.ignore_index = ignore_index
@@ -57,12 +66,12 @@ class LoadAnnotations(MMCV_LoadAnnotations):
         # TODO: 待解决的问题（与mmcv不一致）
         results['gt_bboxes_labels'] = np.array(get_bboxes_labels, dtype=np.int64)
         
-    def _poly2mask(self, mask_ann: Union[list, dict], 
-                   img_h: int, img_w: int) -> np.ndarray:
+    def _poly2rle(self, mask_ann: Union[list, dict],
+                  img_h: int, img_w: int) -> dict:
         """
-        额外的方法：将多边形Polygon的坐标转化成bitmap，即像素值的形式。
+        将多边形Polygon或未压缩的RLE转化成压缩的RLE。
         """
-        if issubclass(mask_ann, list):
+        if isinstance(mask_ann, list):
             # 一个物体的可能由好几个polygon区域构成
             rles = maskUtils.frPyObjects(mask_ann, img_h, img_w)
             rle = maskUtils.merge(rles)
@@ -70,7 +79,14 @@ class LoadAnnotations(MMCV_LoadAnnotations):
             rle = maskUtils.frPyObjects(mask_ann, img_h, img_w)
         else:
             rle = mask_ann
-        mask = maskUtils.decode(rle)
+        return rle
+
+    def _poly2mask(self, mask_ann: Union[list, dict], 
+                   img_h: int, img_w: int) -> np.ndarray:
+        """
+        额外的方法：将多边形Polygon的坐标转化成bitmap，即像素值的形式。
+        """
+        mask = maskUtils.decode(self._poly2rle(mask_ann, img_h, img_w))
         return mask
     
     def _process_masks(self, results: dict) -> list:
@@ -110,7 +126,10 @@ class LoadAnnotations(MMCV_LoadAnnotations):
     def _load_masks(self, results: dict) -> None:
         h, w = results['ori_shape']
         gt_masks = self._process_masks(results)
-        if self.poly2mask:
+        if self.rle_mask:
+            gt_masks = RLEMasks([self._poly2rle(mask, h, w)
+                                 for mask in gt_masks], h, w)
+        elif self.poly2mask:
             gt_masks = BitmapMasks([self._poly2mask(mask, h, w) 
                                     for mask in gt_masks], h, w)
         else:
@@ -151,7 +170,30 @@ class LoadAnnotations(MMCV_LoadAnnotations):
             self._load_masks(results)
         if self.with_seg:
             self._load_seg_map(results)
+        if results.get('load_scale_factor', None) is not None:
+            self._rescale_to_img(results)
         return results
+
+    def _rescale_to_img(self, results: dict) -> None:
+        """
+        读取的图片比原图小时（shard 中预先 resize 过或降采样解码），将标注
+        缩放到图片的大小。
+        """
+        w_scale, h_scale = results['load_scale_factor']
+        img_shape = results['img_shape'][:2]
+        gt_bboxes = results.get('gt_bboxes', None)
+        if isinstance(gt_bboxes, np.ndarray):
+            gt_bboxes[:, 0::2] *= w_scale
+            gt_bboxes[:, 1::2] *= h_scale
+        elif gt_bboxes is not None:
+            gt_bboxes.rescale_((w_scale, h_scale))
+        if results.get('gt_masks', None) is not None:
+            results['gt_masks'] = results['gt_masks'].resize(img_shape)
+        if results.get('gt_seg_map', None) is not None:
+            results['gt_seg_map'] = mmcv.imresize(
+                results['gt_seg_map'], img_shape[::-1],
+                interpolation='nearest',
+                backend='cv2')
     
     def __repr__(self) -> str:
         repr_str = self.__class__.__name__
@@ -160,6 +202,295 @@ class LoadAnnotations(MMCV_LoadAnnotations):
         repr_str += f'with_mask={self.with_mask}, '
         repr_str += f'with_seg={self.with_seg}, '
         repr_str += f'poly2mask={self.poly2mask}, '
+        repr_str += f'rle_mask={self.rle_mask}, '
         repr_str += f"imdecode_backend='{self.imdecode_backend}', "
         repr_str += f'backend_args={self.backend_args})'
-        return repr_str
\ No newline at end of file
+        return repr_str
+
+
+@TRANSFORMS.register_module()
+class LoadImageFromShard(BaseTransform):
+    """
+        从 ``tools/misc/pack_image_shards.py`` 打包好的 shard 中读取图片，
+        代替 LoadImageFromFile。图片通过 memmap 切片读取，不会产生大量小文件
+        的随机 IO；'decoded' 模式的 shard 中保存的是解码后的像素，不需要再解码。
+
+        'decoded' 模式下得到的图片是只读的 memmap 视图，后面的变换都会生成新的
+        数组，不要原地修改图片。如果 shard 中的图片预先 resize 过，
+        ``img_shape`` 为 shard 中的大小，``ori_shape`` 为原图大小，并记录
+        ``load_scale_factor``，LoadAnnotations 会据此缩放标注，Resize 计算
+        ``scale_factor`` 时也会乘上它。'encoded' 模式下 ``ori_shape`` 就是
+        解码后的大小。打包时的 ``--color-type`` 应与 ``color_type`` 相同。
+
+    Required Keys:
+
+    - img_path
+
+    Modified Keys:
+
+    - img
+    - img_shape
+    - ori_shape
+    - load_scale_factor (optional)
+    - homography_matrix (optional)
+
+    Args:
+        shard_dir (str): The directory of the shards.
+        key_root (str, optional): The images are packed with keys relative
+            to this directory. Defaults to None, which means the keys are
+            the image paths.
+        to_float32 (bool): Whether to convert the loaded image to a float32
+            numpy array. Defaults to False.
+        color_type (str): The flag argument for :func:`mmcv.imfrombytes`,
+            only used for 'encoded' shards. Defaults to 'color'.
+        imdecode_backend (str): The image decoding backend type, only used
+            for 'encoded' shards. Defaults to 'cv2'.
+    """
+
+    def __init__(self,
+                 shard_dir: str,
+                 key_root: Optional[str] = None,
+                 to_float32: bool = False,
+                 color_type: str = 'color',
+                 imdecode_backend: str = 'cv2') -> None:
+        self.shard_dir = shard_dir
+        self.key_root = key_root
+        self.to_float32 = to_float32
+        self.color_type = color_type
+        self.imdecode_backend = imdecode_backend
+        # 在每个 worker 中第一次使用时再打开
+        self._reader = None
+
+    @property
+    def reader(self) -> ImageShardReader:
+        if self._reader is None:
+            self._reader = ImageShardReader(self.shard_dir)
+        return self._reader
+
+    def transform(self, results: dict) -> Optional[dict]:
+        key = results['img_path']
+        if self.key_root is not None:
+            key = osp.relpath(key, self.key_root)
+        data, ori_shape = self.reader.get(key)
+        if self.reader.mode == 'encoded':
+            img = mmcv.imfrombytes(
+                data, flag=self.color_type, backend=self.imdecode_backend)
+        else:
+            img = data
+        if self.to_float32:
+            img = img.astype(np.float32)
+
+        results['img'] = img
+        results['img_shape'] = img.shape[:2]
+        if self.reader.mode == 'encoded':
+            # encoded shard 中是原始文件，解码得到的就是原图，不需要缩放
+            # 标注，也不依赖打包时记录的大小
+            results['ori_shape'] = img.shape[:2]
+            return results
+        results['ori_shape'] = ori_shape
+        if img.shape[:2] != ori_shape:
+            h_scale = img.shape[0] / ori_shape[0]
+            w_scale = img.shape[1] / ori_shape[1]
+            results['load_scale_factor'] = (w_scale, h_scale)
+            results['homography_matrix'] = np.array(
+                [[w_scale, 0, 0], [0, h_scale, 0], [0, 0, 1]],
+                dtype=np.float32)
+        return results
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state['_reader'] = None
+        return state
+
+    def __repr__(self) -> str:
+        repr_str = self.__class__.__name__
+        repr_str += f"(shard_dir='{self.shard_dir}', "
+        repr_str += f'key_root={self.key_root}, '
+        repr_str += f'to_float32={self.to_float32}, '
+        repr_str += f"color_type='{self.color_type}', "
+        repr_str += f"imdecode_backend='{self.imdecode_backend}')"
+        return repr_str
+
+
+def _get_exif_orientation(segment: bytes) -> int:
+    """
+        从 APP1 段的内容中读取 EXIF 的 Orientation，没有时返回 1。
+    """
+    if segment[:6] != b'Exif\x00\x00':
+        return 1
+    tiff = segment[6:]
+    if tiff[:2] == b'II':
+        byteorder = 'little'
+    elif tiff[:2] == b'MM':
+        byteorder = 'big'
+    else:
+        return 1
+    ifd = int.from_bytes(tiff[4:8], byteorder)
+    if ifd + 2 > len(tiff):
+        return 1
+    num_entries = int.from_bytes(tiff[ifd:ifd + 2], byteorder)
+    for i in range(num_entries):
+        entry = ifd + 2 + 12 * i
+        if entry + 12 > len(tiff):
+            break
+        if int.from_bytes(tiff[entry:entry + 2], byteorder) == 0x0112:
+            return int.from_bytes(tiff[entry + 8:entry + 10], byteorder)
+    return 1
+
+
+def _get_jpeg_size(content: bytes) -> Optional[Tuple[int, int]]:
+    """
+        从 JPEG 的 SOF 段中读取图片的 (h, w)，不解码图片。不是 JPEG 时返回 None。
+        EXIF 的 Orientation 表示旋转 90° 时交换 h、w，与 cv2 解码的结果一致。
+    """
+    if content[:2] != b'\xff\xd8':
+        return None
+    pos, length = 2, len(content)
+    orientation = 1
+    while pos + 9 <= length:
+        if content[pos] != 0xFF:
+            return None
+        marker = content[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            # 没有长度字段的 marker
+            pos += 2
+            continue
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            h = int.from_bytes(content[pos + 5:pos + 7], 'big')
+            w = int.from_bytes(content[pos + 7:pos + 9], 'big')
+            # orientation 5~8 为转置或旋转 90°
+            return (w, h) if orientation in (5, 6, 7, 8) else (h, w)
+        segment_length = int.from_bytes(content[pos + 2:pos + 4], 'big')
+        if marker == 0xE1 and orientation == 1:
+            orientation = _get_exif_orientation(
+                content[pos + 4:pos + 2 + segment_length])
+        pos += 2 + segment_length
+    return None
+
+
+@TRANSFORMS.register_module()
+class LoadReducedImageFromFile(LoadImageFromFile):
+    """
+        用 libjpeg 的 DCT 域降采样（1/2、1/4、1/8）直接把 JPEG 解码成较小的
+        图片，用于后面的 Resize 无论如何都会缩小图片的情况，例如测试时用
+        ``Resize(scale=(1333, 800), keep_ratio=True)`` 处理 4K 图片。
+
+        ``scale`` 和 ``keep_ratio`` 应与后面 Resize 的参数一致，解码时选择
+        解码结果不小于 Resize 目标大小的最大降采样倍数（即最小的解码图片），
+        所以 Resize 始终只做缩小。
+        ``ori_shape`` 为原图大小，降采样时记录 ``load_scale_factor``，
+        LoadAnnotations 和 Resize 会据此调整标注和 ``scale_factor``，评测时
+        能正确地映射回原图。非 JPEG 图片按原大小解码。
+
+    Required Keys:
+
+    - img_path
+
+    Modified Keys:
+
+    - img
+    - img_shape
+    - ori_shape
+    - load_scale_factor (optional)
+    - homography_matrix (optional)
+
+    Args:
+        scale (int or tuple): The scale of the following Resize.
+        keep_ratio (bool): The keep_ratio of the following Resize.
+            Defaults to True.
+        **kwargs: Arguments of :class:`mmcv.transforms.LoadImageFromFile`,
+            only the 'cv2' decoding backend is supported.
+    """
+    REDUCE_FACTORS = (8, 4, 2)
+    REDUCED_FLAGS = {
+        'color': {
+            2: cv2.IMREAD_REDUCED_COLOR_2,
+            4: cv2.IMREAD_REDUCED_COLOR_4,
+            8: cv2.IMREAD_REDUCED_COLOR_8
+        },
+        'grayscale': {
+            2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+            4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+            8: cv2.IMREAD_REDUCED_GRAYSCALE_8
+        }
+    }
+
+    def __init__(self,
+                 scale: Union[int, Tuple[int, int]],
+                 keep_ratio: bool = True,
+                 **kwargs) -> None:
+        super().__init__(**kwargs)
+        assert self.imdecode_backend == 'cv2', \
+            'reduced decoding is only supported by the cv2 backend'
+        self.scale = (scale, scale) if isinstance(scale, int) else scale
+        self.keep_ratio = keep_ratio
+
+    def _get_reduce_factor(self, h: int, w: int) -> int:
+        """
+            解码结果的宽高都不小于 Resize 目标大小的最大降采样倍数，
+            没有满足条件的倍数时返回 1。
+        """
+        if self.keep_ratio:
+            new_w, new_h = mmcv.rescale_size((w, h), self.scale)
+        else:
+            new_w, new_h = self.scale
+        for factor in self.REDUCE_FACTORS:
+            if -(-h // factor) >= new_h and -(-w // factor) >= new_w:
+                return factor
+        return 1
+
+    def transform(self, results: dict) -> Optional[dict]:
+        filename = results['img_path']
+        try:
+            img_bytes = get(filename, backend_args=self.backend_args)
+        except Exception as e:
+            if self.ignore_empty:
+                return None
+            else:
+                raise e
+
+        ori_shape = _get_jpeg_size(img_bytes)
+        factor = 1
+        if ori_shape is not None and self.color_type in self.REDUCED_FLAGS:
+            factor = self._get_reduce_factor(*ori_shape)
+        if factor > 1:
+            img = cv2.imdecode(
+                np.frombuffer(img_bytes, np.uint8),
+                self.REDUCED_FLAGS[self.color_type][factor])
+        else:
+            img = mmcv.imfrombytes(
+                img_bytes, flag=self.color_type, backend=self.imdecode_backend)
+        # in some cases, images are not read successfully, the img would be
+        # `None`, refer to https://github.com/open-mmlab/mmpretrain/issues/1427
+        assert img is not None, f'failed to load image: {filename}'
+        if self.to_float32:
+            img = img.astype(np.float32)
+
+        img_shape = img.shape[:2]
+        if factor == 1:
+            ori_shape = img_shape
+        else:
+            h, w = ori_shape
+            if (-(-h // factor), -(-w // factor)) != img_shape and (
+                    -(-w // factor), -(-h // factor)) == img_shape:
+                # 按 EXIF 旋转过，但没有从 EXIF 中读到 Orientation
+                ori_shape = (w, h)
+            h_scale = img_shape[0] / ori_shape[0]
+            w_scale = img_shape[1] / ori_shape[1]
+            results['load_scale_factor'] = (w_scale, h_scale)
+            results['homography_matrix'] = np.array(
+                [[w_scale, 0, 0], [0, h_scale, 0], [0, 0, 1]],
+                dtype=np.float32)
+        results['img'] = img
+        results['img_shape'] = img_shape
+        results['ori_shape'] = ori_shape
+        return results
+
+    def __repr__(self) -> str:
+        repr_str = super().__repr__()[:-1]
+        repr_str += f', scale={self.scale}, '
+        repr_str += f'keep_ratio={self.keep_ratio})'
+        return repr_str
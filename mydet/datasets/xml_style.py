@@ -1,13 +1,114 @@
+import os
 import os.path as osp
+import pickle
 import xml.etree.ElementTree as ET
-from typing import List, Optional, Union
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, List, Optional, Union
 
 import mmcv
 from mmengine.fileio import get, get_local_path, list_from_file
 
 from mydet.registry import DATASETS
+from .ann_cache import get_cache_key
 from .base_det_dataset import BaseDetDataset
 
+
+def _get_mtime(path: str) -> Optional[int]:
+    """Get the modification time of a file, None if it can not be stat-ed
+    (e.g. files of remote backends)."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _parse_xml_data_info(img_info: dict, sub_data_root: str,
+                         backend_args: Optional[dict],
+                         cat2label: Dict[str, int],
+                         bbox_min_size: Optional[int],
+                         parse_instances: Optional[Callable] = None) -> dict:
+    """Parse the xml annotation of an image, see
+    :meth:`XMLDataset.parse_data_info`.
+
+    The function is at module level so that a process pool only pickles its
+    arguments instead of the whole dataset. ``parse_instances`` replaces
+    :func:`_parse_xml_instances` when it is given.
+    """
+    data_info = {}
+    img_path = osp.join(sub_data_root, img_info['file_name'])
+    data_info['img_path'] = img_path
+    data_info['img_id'] = img_info['img_id']
+    data_info['xml_path'] = img_info['xml_path']
+
+    # deal with xml file
+    with get_local_path(
+            img_info['xml_path'], backend_args=backend_args) as local_path:
+        raw_ann_info = ET.parse(local_path)
+    root = raw_ann_info.getroot()
+    size = root.find('size')
+    if size is not None:
+        width = int(size.find('width').text)
+        height = int(size.find('height').text)
+    else:
+        img_bytes = get(img_path, backend_args=backend_args)
+        img = mmcv.imfrombytes(img_bytes, backend='cv2')
+        height, width = img.shape[:2]
+        del img, img_bytes
+
+    data_info['height'] = height
+    data_info['width'] = width
+
+    if parse_instances is None:
+        data_info['instances'] = _parse_xml_instances(
+            raw_ann_info, cat2label, bbox_min_size, minus_one=True)
+    else:
+        data_info['instances'] = parse_instances(raw_ann_info, minus_one=True)
+
+    return data_info
+
+
+def _parse_xml_instances(raw_ann_info: ET,
+                         cat2label: Dict[str, int],
+                         bbox_min_size: Optional[int],
+                         minus_one: bool = True) -> List[dict]:
+    """Parse the objects of an xml annotation."""
+    instances = []
+    for obj in raw_ann_info.findall('object'):
+        instance = {}
+        name = obj.find('name').text
+        if name not in cat2label:
+            continue
+        difficult = obj.find('difficult')
+        difficult = 0 if difficult is None else int(difficult.text)
+        bnd_box = obj.find('bndbox')
+        bbox = [
+            int(float(bnd_box.find('xmin').text)),
+            int(float(bnd_box.find('ymin').text)),
+            int(float(bnd_box.find('xmax').text)),
+            int(float(bnd_box.find('ymax').text))
+        ]
+
+        # VOC needs to subtract 1 from the coordinates
+        if minus_one:
+            bbox = [x - 1 for x in bbox]
+
+        ignore = False
+        if bbox_min_size is not None:
+            w = bbox[2] - bbox[0]
+            h = bbox[3] - bbox[1]
+            if w < bbox_min_size or h < bbox_min_size:
+                ignore = True
+        if difficult or ignore:
+            instance['ignore_flag'] = 1
+        else:
+            instance['ignore_flag'] = 0
+        instance['bbox'] = bbox
+        instance['bbox_label'] = cat2label[name]
+        instances.append(instance)
+    return instances
+
+
 @DATASETS.register_module()
 class XMLDataset(BaseDetDataset):
     """
@@ -39,14 +140,37 @@ class XMLDataset(BaseDetDataset):
             </bndbox>  
         </object>  
     </annotation> 
+
+    Args:
+        img_subdir (str): Subdir where images are stored.
+            Defaults to 'JPEGImages'.
+        ann_subdir (str): Subdir where annotations are stored.
+            Defaults to 'Annotations'.
+        num_workers (int): Number of workers to fetch and parse xml files in
+            parallel, 0 means parsing sequentially. The output order is the
+            same as ``ann_file`` anyway. Defaults to 0.
+        worker_type (str): Use a 'thread' pool (good for I/O bound network
+            storages) or a 'process' pool (good for CPU bound parsing).
+            Defaults to 'thread'.
+        ann_cache_dir (str, optional): Directory to save parsed annotations.
+            A cached xml file is parsed again only if its mtime has changed.
+            Defaults to None.
     """
     
     def __init__(self, 
                img_subdir: str='JPEGImages',
                ann_subdir: str ='Annotations',
+               num_workers: int = 0,
+               worker_type: str = 'thread',
+               ann_cache_dir: Optional[str] = None,
                **kwargs) -> None:
+        assert worker_type in ('thread', 'process'), \
+            f'worker_type should be "thread" or "process", got {worker_type}'
         self.img_subdir = img_subdir
         self.ann_subdir = ann_subdir
+        self.num_workers = num_workers
+        self.worker_type = worker_type
+        self.ann_cache_dir = ann_cache_dir
         super().__init__(**kwargs)
         
     # sub data root
@@ -64,7 +188,7 @@ class XMLDataset(BaseDetDataset):
         self.cat2label = {
             cat: i for i, cat in enumerate(self._metainfo['classes'])}
 
-        data_list = []
+        raw_img_infos = []
         img_ids = list_from_file(self.ann_file, backend_args=self.backend_args)
         for img_id in img_ids:
             file_name = osp.join(self.img_subdir, f'{img_id}.jpg')
@@ -75,8 +199,70 @@ class XMLDataset(BaseDetDataset):
             raw_img_info['file_name'] = file_name
             raw_img_info['xml_path'] = xml_path
 
-            parsed_data_info = self.parse_data_info(raw_img_info)
-            data_list.append(parsed_data_info)
+            raw_img_infos.append(raw_img_info)
+
+        if self.ann_cache_dir is None:
+            return self._map(self._get_parse_func(), raw_img_infos)
+        return self._load_cached_data_list(raw_img_infos)
+
+    def _map(self, func: Callable, items: list) -> list:
+        """Apply ``func`` to ``items`` with the worker pool, keep the order."""
+        if self.num_workers <= 0 or len(items) <= 1:
+            return [func(item) for item in items]
+        if self.worker_type == 'thread':
+            executor = ThreadPoolExecutor(self.num_workers)
+        else:
+            executor = ProcessPoolExecutor(self.num_workers)
+        chunksize = max(1, len(items) // (self.num_workers * 4))
+        with executor:
+            return list(executor.map(func, items, chunksize=chunksize))
+
+    def _load_cached_data_list(self, raw_img_infos: List[dict]) -> List[dict]:
+        """
+        读取解析结果的缓存，只重新解析 mtime 发生变化或新增的 xml 文件，
+        并更新缓存
+        """
+        cache_key = get_cache_key(
+            type(self).__name__,
+            classes=self._metainfo['classes'],
+            sub_data_root=self.sub_data_root,
+            img_subdir=self.img_subdir,
+            bbox_min_size=self.bbox_min_size)
+        cache_file = osp.join(self.ann_cache_dir, f'{cache_key}.pkl')
+        cache = {}
+        if osp.isfile(cache_file):
+            with open(cache_file, 'rb') as f:
+                cache = pickle.load(f)
+
+        xml_paths = [info['xml_path'] for info in raw_img_infos]
+        mtimes = self._map(_get_mtime, xml_paths)
+        data_list = [None] * len(raw_img_infos)
+        stale_inds = []
+        for i, (xml_path, mtime) in enumerate(zip(xml_paths, mtimes)):
+            cached = cache.get(xml_path, None)
+            if mtime is not None and cached is not None and \
+                    cached[0] == mtime:
+                data_list[i] = cached[1]
+            else:
+                stale_inds.append(i)
+
+        parsed = self._map(self._get_parse_func(),
+                           [raw_img_infos[i] for i in stale_inds])
+        for i, data_info in zip(stale_inds, parsed):
+            data_list[i] = data_info
+
+        if len(stale_inds) > 0:
+            cache = {
+                xml_path: (mtime, data_info)
+                for xml_path, mtime, data_info in zip(xml_paths, mtimes,
+                                                      data_list)
+                if mtime is not None
+            }
+            os.makedirs(self.ann_cache_dir, exist_ok=True)
+            tmp_file = f'{cache_file}.{os.getpid()}.tmp'
+            with open(tmp_file, 'wb') as f:
+                pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, cache_file)
         return data_list
     
     def parse_data_info(self, img_info: dict) -> Union[dict, List[dict]]:
@@ -89,74 +275,44 @@ class XMLDataset(BaseDetDataset):
         Returns:
             Union[dict, List[dict]]: Parsed annotation.
         """
-        data_info = {}
-        img_path = osp.join(self.sub_data_root, img_info['file_name'])
-        data_info['img_path'] = img_path
-        data_info['img_id'] = img_info['img_id']
-        data_info['xml_path'] = img_info['xml_path']
-
-        # deal with xml file
-        with get_local_path(
-                img_info['xml_path'],
-                backend_args=self.backend_args) as local_path:
-            raw_ann_info = ET.parse(local_path)
-        root = raw_ann_info.getroot()
-        size = root.find('size')
-        if size is not None:
-            width = int(size.find('width').text)
-            height = int(size.find('height').text)
-        else:
-            img_bytes = get(img_path, backend_args=self.backend_args)
-            img = mmcv.imfrombytes(img_bytes, backend='cv2')
-            height, width = img.shape[:2]
-            del img, img_bytes
-
-        data_info['height'] = height
-        data_info['width'] = width
-
-        data_info['instances'] = self._parse_instance_info(
-            raw_ann_info, minus_one=True)
+        parse_instances = None
+        if type(self)._parse_instance_info is not \
+                XMLDataset._parse_instance_info:
+            parse_instances = self._parse_instance_info
+        return _parse_xml_data_info(
+            img_info, parse_instances=parse_instances,
+            **self._get_parse_args())
 
-        return data_info
-    
     def _parse_instance_info(self,
                              raw_ann_info: ET,
                              minus_one: bool = True) -> List[dict]:
-        instances = []
-        for obj in raw_ann_info.findall('object'):
-            instance = {}
-            name = obj.find('name').text
-            if name not in self._metainfo['classes']:
-                continue
-            difficult = obj.find('difficult')
-            difficult = 0 if difficult is None else int(difficult.text)
-            bnd_box = obj.find('bndbox')
-            bbox = [
-                int(float(bnd_box.find('xmin').text)),
-                int(float(bnd_box.find('ymin').text)),
-                int(float(bnd_box.find('xmax').text)),
-                int(float(bnd_box.find('ymax').text))
-            ]
-
-            # VOC needs to subtract 1 from the coordinates
-            if minus_one:
-                bbox = [x - 1 for x in bbox]
-
-            ignore = False
-            if self.bbox_min_size is not None:
-                assert not self.test_mode
-                w = bbox[2] - bbox[0]
-                h = bbox[3] - bbox[1]
-                if w < self.bbox_min_size or h < self.bbox_min_size:
-                    ignore = True
-            if difficult or ignore:
-                instance['ignore_flag'] = 1
-            else:
-                instance['ignore_flag'] = 0
-            instance['bbox'] = bbox
-            instance['bbox_label'] = self.cat2label[name]
-            instances.append(instance)
-        return instances
+        parse_args = self._get_parse_args()
+        return _parse_xml_instances(raw_ann_info, parse_args['cat2label'],
+                                    parse_args['bbox_min_size'], minus_one)
+
+    def _get_parse_args(self) -> dict:
+        """
+        解析 xml 需要的数据集属性，传给模块级的解析函数，进程池中只需要
+        pickle 这些属性而不是整个数据集
+        """
+        if self.bbox_min_size is not None:
+            assert not self.test_mode
+        return dict(
+            sub_data_root=self.sub_data_root,
+            backend_args=self.backend_args,
+            cat2label=self.cat2label,
+            bbox_min_size=self.bbox_min_size)
+
+    def _get_parse_func(self) -> Callable:
+        """
+        返回解析单个 xml 的函数。子类没有重写解析方法时使用模块级函数，
+        否则退回绑定方法（使用进程池时会 pickle 整个数据集）
+        """
+        if type(self).parse_data_info is XMLDataset.parse_data_info and \
+                type(self)._parse_instance_info is \
+                XMLDataset._parse_instance_info:
+            return partial(_parse_xml_data_info, **self._get_parse_args())
+        return self.parse_data_info
 
     def filter_data(self) -> List[dict]:
         if self.test_mode:
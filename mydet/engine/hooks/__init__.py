@@ -2,6 +2,7 @@ from .checkloss_hook import CheckInvalidLossHook
 from .mean_teacher_hook import MeanTeacherHook
 from .memory_profiler_hook import MemoryProfilerHook
 from .num_class_check_hook import NumClassCheckHook
+from .pipeline_profiler_hook import PipelineProfilerHook
 from .pipeline_switch_hook import PipelineSwitchHook
 from .set_epoch_info_hook import SetEpochInfoHook
 from .sync_norm_hook import SyncNormHook
@@ -13,5 +14,5 @@ __all__ = [
     'YOLOXModeSwitchHook', 'SyncNormHook', 'CheckInvalidLossHook',
     'SetEpochInfoHook', 'MemoryProfilerHook', 'DetVisualizationHook',
     'NumClassCheckHook', 'MeanTeacherHook', 'trigger_visualization_hook',
-    'PipelineSwitchHook', 'TrackVisualizationHook'
+    'PipelineSwitchHook', 'TrackVisualizationHook', 'PipelineProfilerHook'
 ]
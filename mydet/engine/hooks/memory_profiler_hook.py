@@ -0,0 +1,235 @@
+import heapq
+import json
+import os.path as osp
+from functools import wraps
+from typing import List, Optional, Sequence
+
+import torch
+from mmengine.dist import get_rank, get_world_size
+from mmengine.hooks import Hook
+from mmengine.optim import OptimWrapper
+from terminaltables import AsciiTable
+
+from mydet.registry import HOOKS
+
+DATA_BATCH = Optional[Sequence[dict]]
+
+# 一个训练 iter 依次经过的阶段
+STAGES = ('data', 'forward', 'backward', 'step')
+
+
+@HOOKS.register_module()
+class MemoryProfilerHook(Hook):
+    """Record the memory of each stage of every training iteration.
+
+    每个 iter 分为 data（取数据）、forward、backward、step 四个阶段，
+    forward 和 backward 的分界由包装 ``optim_wrapper.backward`` 得到，
+    backward 和 step 的分界由包装 ``optim_wrapper.step`` 得到。每个阶段结束
+    时记录 torch 分配器的峰值、当前值和保留的显存（阶段之间重置峰值），
+    取数据阶段还记录主进程和各个 dataloader worker 的 RSS。
+
+    每个 iter 的记录与 batch 的统计量（图片大小、GT 数量、图片路径）一起
+    写到 ``memory_profile.jsonl``，显存峰值最高的 ``topk`` 个 iter 在每个
+    epoch 结束时输出到日志中，可以直接定位到引起显存尖峰的样本。分布式训练
+    时每个 rank 写各自的文件 ``memory_profile_rank{rank}.jsonl``，记录中也
+    包含 rank。
+
+    Examples:
+        >>> custom_hooks = [dict(type='MemoryProfilerHook', interval=50)]
+
+    Args:
+        interval (int): Interval of iterations to log the memory.
+            Defaults to 50.
+        topk (int): Number of the iterations with the highest peak memory to
+            report at the end of each epoch. Defaults to 5.
+        out_file (str, optional): The file to write the time series, with
+            ``_rank{rank}`` added before the extension in distributed
+            training. Defaults to None, which means
+            ``{runner.log_dir}/memory_profile.jsonl``.
+    """
+    priority = 'VERY_LOW'
+
+    def __init__(self,
+                 interval: int = 50,
+                 topk: int = 5,
+                 out_file: Optional[str] = None) -> None:
+        try:
+            from psutil import Process
+            self._process = Process()
+        except ImportError:
+            raise ImportError('psutil is not installed, please install it by: '
+                              'pip install psutil')
+        self.interval = interval
+        self.topk = topk
+        self.out_file = out_file
+        self._rank = 0
+        self._file = None
+        self._record: Optional[dict] = None
+        self._topk: List[tuple] = []
+
+    def before_train(self, runner) -> None:
+        if self.out_file is None:
+            self.out_file = osp.join(runner.log_dir, 'memory_profile.jsonl')
+        self._rank = get_rank()
+        if get_world_size() > 1:
+            root, ext = osp.splitext(self.out_file)
+            self.out_file = f'{root}_rank{self._rank}{ext}'
+        self._file = open(self.out_file, 'a')
+
+        optim_wrapper = runner.optim_wrapper
+        if isinstance(optim_wrapper, OptimWrapper):
+            optim_wrapper.backward = self._wrap_stage(optim_wrapper.backward,
+                                                      'forward')
+            optim_wrapper.step = self._wrap_stage(optim_wrapper.step,
+                                                  'backward')
+        else:
+            runner.logger.warning(
+                'MemoryProfilerHook: forward, backward and step are recorded '
+                f'as one stage with {type(optim_wrapper).__name__}.')
+        self._reset_peak()
+
+    def _wrap_stage(self, func, stage: str):
+        """End ``stage`` before calling ``func``."""
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            self._end_stage(stage)
+            return func(*args, **kwargs)
+
+        return wrapper
+
+    @staticmethod
+    def _reset_peak() -> None:
+        if torch.cuda.is_available():
+            torch.cuda.reset_peak_memory_stats()
+
+    def _end_stage(self, stage: str) -> None:
+        """Record the allocator memory of a stage and reset the peak."""
+        if self._record is None:
+            return
+        if torch.cuda.is_available():
+            mb = 1. / 2**20
+            self._record['cuda'][stage] = dict(
+                peak=torch.cuda.max_memory_allocated() * mb,
+                allocated=torch.cuda.memory_allocated() * mb,
+                reserved=torch.cuda.memory_reserved() * mb)
+            torch.cuda.reset_peak_memory_stats()
+        self._record['rss'][stage] = self._process.memory_info().rss / 2**20
+
+    def _worker_rss(self) -> List[float]:
+        """RSS of the child processes, i.e. the dataloader workers."""
+        rss = []
+        for child in self._process.children(recursive=True):
+            try:
+                rss.append(child.memory_info().rss / 2**20)
+            except Exception:
+                # worker 可能已经退出
+                continue
+        return rss
+
+    @staticmethod
+    def _batch_stats(data_batch: DATA_BATCH) -> dict:
+        """Image sizes, numbers of GTs and paths of a batch."""
+        stats = dict(num_imgs=0, max_shape=[0, 0], pixels=0, num_gts=[])
+        if not isinstance(data_batch, dict):
+            return stats
+        data_samples = data_batch.get('data_samples') or []
+        inputs = data_batch.get('inputs')
+        if data_samples and 'img_shape' in data_samples[0]:
+            shapes = [ds.img_shape[:2] for ds in data_samples]
+        elif isinstance(inputs, torch.Tensor):
+            shapes = [inputs.shape[-2:]] * inputs.shape[0]
+        else:
+            shapes = [img.shape[-2:] for img in inputs or []]
+        stats['num_imgs'] = len(shapes)
+        if shapes:
+            stats['max_shape'] = [
+                int(max(s[0] for s in shapes)),
+                int(max(s[1] for s in shapes))
+            ]
+            stats['pixels'] = int(sum(s[0] * s[1] for s in shapes))
+
+        gt_records = data_batch.get('gt_records')
+        if isinstance(gt_records, dict):
+            stats['num_gts'] = list(gt_records['split_sizes'][0::2])
+        else:
+            stats['num_gts'] = [
+                len(ds.gt_instances) for ds in data_samples
+                if 'gt_instances' in ds
+            ]
+        stats['img_paths'] = [
+            ds.img_path for ds in data_samples if 'img_path' in ds
+        ]
+        return stats
+
+    def before_train_iter(self,
+                          runner,
+                          batch_idx: int,
+                          data_batch: DATA_BATCH = None) -> None:
+        self._record = dict(
+            rank=self._rank,
+            iter=runner.iter + 1,
+            epoch=runner.epoch + 1,
+            batch=self._batch_stats(data_batch),
+            rss=dict(),
+            cuda=dict())
+        self._end_stage('data')
+        self._record['rss']['workers'] = self._worker_rss()
+
+    def after_train_iter(self,
+                         runner,
+                         batch_idx: int,
+                         data_batch: DATA_BATCH = None,
+                         outputs: Optional[dict] = None) -> None:
+        self._end_stage('step')
+        record, self._record = self._record, None
+        self._file.write(json.dumps(record) + '\n')
+
+        peaks = [
+            (stats['peak'], stage) for stage, stats in record['cuda'].items()
+        ] or [(rss, stage) for stage, rss in record['rss'].items()
+              if stage != 'workers']
+        peak, stage = max(peaks)
+        # 小顶堆保存峰值最高的 topk 个 iter
+        item = (peak, record['iter'], stage, record['batch'])
+        if len(self._topk) < self.topk:
+            heapq.heappush(self._topk, item)
+        elif peak > self._topk[0][0]:
+            heapq.heapreplace(self._topk, item)
+
+        if self.every_n_train_iters(runner, self.interval):
+            self._file.flush()
+            batch = record['batch']
+            workers = record['rss']['workers']
+            msg = f'rss: {record["rss"]["step"]:.0f} MB, ' \
+                f'workers rss: {sum(workers):.0f} MB ({len(workers)}), '
+            for stage in STAGES:
+                if stage in record['cuda']:
+                    msg += f'{stage} peak: ' \
+                        f'{record["cuda"][stage]["peak"]:.0f} MB, '
+            if record['cuda']:
+                msg += f'reserved: {record["cuda"]["step"]["reserved"]:.0f}' \
+                    ' MB, '
+            msg += f'max shape: {batch["max_shape"]}, ' \
+                f'gts: {sum(batch["num_gts"])}'
+            runner.logger.info(msg)
+
+    def after_train_epoch(self, runner) -> None:
+        if not self._topk:
+            return
+        rows = [['iter', 'stage', 'peak(MB)', 'max shape', 'gts', 'images']]
+        for peak, it, stage, batch in sorted(self._topk, reverse=True):
+            rows.append([
+                str(it), stage, f'{peak:.0f}', str(batch['max_shape']),
+                str(batch['num_gts']), '\n'.join(batch.get('img_paths', []))
+            ])
+        runner.logger.info(
+            f'Iterations with the highest memory of epoch {runner.epoch + 1}:'
+            '\n' + AsciiTable(rows).table)
+        self._topk = []
+        self._file.flush()
+
+    def after_train(self, runner) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
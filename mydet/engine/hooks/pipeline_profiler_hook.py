@@ -0,0 +1,354 @@
+import json
+import os
+import os.path as osp
+import time
+import tracemalloc
+from typing import List, Optional, Sequence
+
+import numpy as np
+import torch
+from mmengine.dataset import Compose
+from mmengine.dist import barrier, get_rank, master_only
+from mmengine.hooks import Hook
+from mmengine.structures import BaseDataElement
+from terminaltables import AsciiTable
+from torch.utils.data import get_worker_info
+
+from mydet.datasets.transforms.geometric import materialize_lazy_geometric
+from mydet.registry import HOOKS
+
+# 计数表中每个 transform 的统计量，后面接 wall time 的直方图
+_STATS = ('count', 'wall', 'cpu', 'alloc', 'max_alloc', 'out_bytes')
+# wall time 直方图的边界：1us 到 100s 按对数等分，相邻边界相差约 27%
+_HIST_EDGES = np.geomspace(1e-6, 100., 79)
+_HIST_BINS = len(_HIST_EDGES) + 1
+
+
+def _nbytes(obj) -> int:
+    """Sum the sizes of the arrays and tensors in the results of a
+    transform."""
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, torch.Tensor):
+        return obj.element_size() * obj.numel()
+    if isinstance(obj, dict):
+        return sum(_nbytes(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(_nbytes(v) for v in obj)
+    if isinstance(obj, BaseDataElement):
+        return sum(_nbytes(v) for v in obj.values())
+    # BaseBoxes 和 BitmapMasks
+    for attr in ('tensor', 'masks'):
+        value = getattr(obj, attr, None)
+        if isinstance(value, (np.ndarray, torch.Tensor)):
+            return _nbytes(value)
+    return 0
+
+
+def _hist_percentile(hist: np.ndarray, q: float) -> float:
+    """Get the ``q``-th percentile from a wall time histogram, accurate up
+    to the width of a bin."""
+    total = hist.sum()
+    if total == 0:
+        return 0.
+    idx = int(np.searchsorted(np.cumsum(hist), total * q / 100.))
+    return float(_HIST_EDGES[min(idx, len(_HIST_EDGES) - 1)])
+
+
+class ProfiledCompose:
+    """Run the transforms of a ``Compose`` pipeline and record the cost of
+    each transform.
+
+    统计量写在共享内存的计数表 ``table`` 中，形状为
+    (num_workers + 1, num_transforms, len(_STATS) + _HIST_BINS)。每个 worker
+    只写自己的一行（主进程为第 0 行），不需要加锁。开启 ``trace_dir`` 时，
+    每个进程把 Chrome trace 事件追加到各自的
+    ``pipeline_trace_rank{rank}_{pid}.jsonl`` 中，由
+    :class:`PipelineProfilerHook` 合并。
+
+    Args:
+        pipeline (Compose): The pipeline to profile.
+        table (torch.Tensor): The counter table in shared memory.
+        trace_dir (str, optional): The directory to write the trace events.
+            Defaults to None, which means no trace.
+        trace_interval (int): Trace one of every ``trace_interval`` samples in
+            each process. Defaults to 10.
+        trace_memory (bool): Whether to record the peak memory allocated by
+            each transform with ``tracemalloc``, which slows down the
+            pipeline. Defaults to False.
+        rank (int): The rank of the process, used in the trace file names.
+            Defaults to 0.
+    """
+
+    def __init__(self,
+                 pipeline: Compose,
+                 table: torch.Tensor,
+                 trace_dir: Optional[str] = None,
+                 trace_interval: int = 10,
+                 trace_memory: bool = False,
+                 rank: int = 0) -> None:
+        self.pipeline = pipeline
+        self.transforms = pipeline.transforms
+        self.names = [
+            f'{i}:{t.__class__.__name__}' for i, t in enumerate(self.transforms)
+        ]
+        self.table = table
+        self.trace_dir = trace_dir
+        self.trace_interval = trace_interval
+        self.trace_memory = trace_memory
+        self.rank = rank
+        self._counters = None
+        self._trace_file = None
+        self._num_samples = 0
+        self._pid = None
+
+    def _get_counters(self) -> np.ndarray:
+        # 在每个进程中创建共享内存的 numpy 视图，逐元素更新比 tensor 快。
+        # fork 出的 worker 会继承主进程的视图和文件句柄，按 pid 重新创建
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._trace_file = None
+            worker_info = get_worker_info()
+            row = 0 if worker_info is None else worker_info.id + 1
+            self._counters = self.table[row].numpy()
+            if self.trace_memory and not tracemalloc.is_tracing():
+                tracemalloc.start()
+        return self._counters
+
+    def _write_trace(self, events: List[dict]) -> None:
+        if self._trace_file is None:
+            os.makedirs(self.trace_dir, exist_ok=True)
+            pid = os.getpid()
+            self._trace_file = open(
+                osp.join(self.trace_dir,
+                         f'pipeline_trace_rank{self.rank}_{pid}.jsonl'), 'a')
+            worker_info = get_worker_info()
+            name = 'main' if worker_info is None \
+                else f'worker {worker_info.id}'
+            name = f'rank {self.rank} {name}'
+            events = [
+                dict(name='process_name', ph='M', pid=pid, args=dict(
+                    name=name))
+            ] + events
+        # 每个样本一行，写完立即 flush，hook 读到的总是完整的行
+        self._trace_file.write(json.dumps(events) + '\n')
+        self._trace_file.flush()
+
+    def __call__(self, data: dict) -> Optional[dict]:
+        counters = self._get_counters()
+        trace = self.trace_dir is not None and \
+            self._num_samples % self.trace_interval == 0
+        self._num_samples += 1
+        if trace:
+            pid = os.getpid()
+            events = []
+            sample_args = {
+                k: data[k]
+                for k in ('img_id', 'img_path') if k in data
+            }
+            sample_start = time.perf_counter()
+
+        for i, t in enumerate(self.transforms):
+            if self.trace_memory:
+                tracemalloc.reset_peak()
+                mem_before = tracemalloc.get_traced_memory()[0]
+            wall_start = time.perf_counter()
+            cpu_start = time.thread_time()
+            # 与 LazyGeometricCompose 相同，执行时间计入后面的变换
+            data = t(materialize_lazy_geometric(t, data))
+            cpu = time.thread_time() - cpu_start
+            wall = time.perf_counter() - wall_start
+            alloc = tracemalloc.get_traced_memory()[1] - mem_before \
+                if self.trace_memory else 0
+            out_bytes = _nbytes(data)
+
+            stats = counters[i]
+            stats[0] += 1
+            stats[1] += wall
+            stats[2] += cpu
+            stats[3] += alloc
+            stats[4] = max(stats[4], alloc)
+            stats[5] += out_bytes
+            stats[len(_STATS) + np.searchsorted(_HIST_EDGES, wall)] += 1
+            if trace:
+                events.append(
+                    dict(
+                        name=self.names[i],
+                        cat='transform',
+                        ph='X',
+                        ts=wall_start * 1e6,
+                        dur=wall * 1e6,
+                        pid=pid,
+                        tid=pid,
+                        args=dict(
+                            cpu_ms=cpu * 1e3,
+                            alloc_bytes=alloc,
+                            out_bytes=out_bytes)))
+            if data is None:
+                break
+
+        if trace:
+            events.insert(
+                0,
+                dict(
+                    name='sample',
+                    cat='pipeline',
+                    ph='X',
+                    ts=sample_start * 1e6,
+                    dur=(time.perf_counter() - sample_start) * 1e6,
+                    pid=pid,
+                    tid=pid,
+                    args=sample_args))
+            self._write_trace(events)
+        return data
+
+    def __getstate__(self) -> dict:
+        # numpy 视图和文件句柄在每个进程中重新创建
+        state = self.__dict__.copy()
+        state['_counters'] = None
+        state['_trace_file'] = None
+        state['_pid'] = None
+        return state
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({self.pipeline!r})'
+
+
+@HOOKS.register_module()
+class PipelineProfilerHook(Hook):
+    """Profile each transform of the training pipeline.
+
+    训练开始前把训练集的 pipeline 替换为 :class:`ProfiledCompose`，所有
+    dataloader worker 把每个 transform 的 wall time、CPU time、分配的内存
+    和输出大小累加到共享内存的计数表中。每个 epoch 结束时汇总本 rank 的所有
+    worker，在日志中输出各 transform 的耗时分位数，并由 rank 0 把所有 rank
+    的 Chrome trace 事件合并到 ``pipeline_trace_epoch_{epoch}.json``（用
+    chrome://tracing 或 Perfetto 打开）。多机训练时 ``out_dir`` 需要在共享
+    存储上，否则只合并 rank 0 所在节点的 trace。
+
+    Examples:
+        >>> custom_hooks = [dict(type='PipelineProfilerHook')]
+
+    Args:
+        percentiles (Sequence[float]): Percentiles of the wall time to
+            report. Defaults to (50, 90, 99).
+        trace (bool): Whether to write the Chrome trace. Defaults to True.
+        trace_interval (int): Trace one of every ``trace_interval`` samples in
+            each worker. Defaults to 10.
+        trace_memory (bool): Whether to record the memory allocated by each
+            transform with ``tracemalloc``. Defaults to False.
+        out_dir (str, optional): The directory to save the traces. Defaults
+            to None, which means ``{runner.log_dir}/pipeline_profile``.
+    """
+    priority = 'VERY_LOW'
+
+    def __init__(self,
+                 percentiles: Sequence[float] = (50, 90, 99),
+                 trace: bool = True,
+                 trace_interval: int = 10,
+                 trace_memory: bool = False,
+                 out_dir: Optional[str] = None) -> None:
+        self.percentiles = percentiles
+        self.trace = trace
+        self.trace_interval = trace_interval
+        self.trace_memory = trace_memory
+        self.out_dir = out_dir
+        self._pipeline: Optional[ProfiledCompose] = None
+        self._trace_offsets: dict = {}
+        # 进程名的元数据事件只写一次，每个 epoch 的 trace 中都需要
+        self._trace_meta: dict = {}
+
+    def before_train(self, runner) -> None:
+        dataloader = runner.train_dataloader
+        dataset = dataloader.dataset
+        # 跳过 RepeatDataset、ClassBalancedDataset 等包装
+        while not hasattr(dataset, 'pipeline') and hasattr(dataset, 'dataset'):
+            dataset = dataset.dataset
+        if not isinstance(getattr(dataset, 'pipeline', None), Compose):
+            runner.logger.warning(
+                'PipelineProfilerHook: the training dataset has no pipeline, '
+                'skip profiling.')
+            return
+
+        pipeline = dataset.pipeline
+        table = torch.zeros(
+            (dataloader.num_workers + 1, len(pipeline.transforms),
+             len(_STATS) + _HIST_BINS),
+            dtype=torch.float64).share_memory_()
+        if self.out_dir is None:
+            self.out_dir = osp.join(runner.log_dir, 'pipeline_profile')
+        self._pipeline = ProfiledCompose(
+            pipeline,
+            table,
+            trace_dir=self.out_dir if self.trace else None,
+            trace_interval=self.trace_interval,
+            trace_memory=self.trace_memory,
+            rank=get_rank())
+        dataset.pipeline = self._pipeline
+
+    def after_train_epoch(self, runner) -> None:
+        if self._pipeline is None:
+            return
+        table = self._pipeline.table
+        # 所有 worker 的计数求和后清零，下一个 epoch 重新统计
+        counters = table.numpy().sum(axis=0)
+        table.zero_()
+        runner.logger.info(
+            f'Pipeline profile of epoch {runner.epoch + 1}:\n' +
+            self._format_table(counters))
+        if self.trace:
+            # 等待所有 rank 写完本 epoch 的 trace
+            barrier()
+            self._merge_traces(runner.epoch + 1)
+
+    def _format_table(self, counters: np.ndarray) -> str:
+        header = ['transform', 'count', 'share'] + [
+            f'p{q:g}(ms)' for q in self.percentiles
+        ] + ['wall(ms)', 'cpu(ms)', 'alloc(MB)', 'max alloc(MB)', 'out(MB)']
+        total_wall = counters[:, 1].sum()
+        rows = [header]
+        for name, stats in zip(self._pipeline.names, counters):
+            count, wall, cpu, alloc, max_alloc, out_bytes = stats[:len(_STATS)]
+            hist = stats[len(_STATS):]
+            count = max(count, 1)
+            rows.append([
+                name, f'{int(stats[0])}', f'{wall / max(total_wall, 1e-12):.1%}'
+            ] + [
+                f'{_hist_percentile(hist, q) * 1e3:.2f}'
+                for q in self.percentiles
+            ] + [
+                f'{wall / count * 1e3:.2f}', f'{cpu / count * 1e3:.2f}',
+                f'{alloc / count / 2**20:.2f}', f'{max_alloc / 2**20:.2f}',
+                f'{out_bytes / count / 2**20:.2f}'
+            ])
+        return AsciiTable(rows).table
+
+    @master_only
+    def _merge_traces(self, epoch: int) -> None:
+        """Merge the new events of all the processes into one Chrome trace
+        file."""
+        if not osp.isdir(self.out_dir):
+            return
+        events = []
+        for filename in sorted(os.listdir(self.out_dir)):
+            if not (filename.startswith('pipeline_trace_')
+                    and filename.endswith('.jsonl')):
+                continue
+            path = osp.join(self.out_dir, filename)
+            with open(path) as f:
+                f.seek(self._trace_offsets.get(path, 0))
+                for line in iter(f.readline, ''):
+                    if not line.endswith('\n'):
+                        # worker 还没写完这一行，留到下次读取
+                        break
+                    for event in json.loads(line):
+                        if event['ph'] == 'M':
+                            self._trace_meta[event['pid']] = event
+                        else:
+                            events.append(event)
+                    self._trace_offsets[path] = f.tell()
+        events = list(self._trace_meta.values()) + events
+        with open(
+                osp.join(self.out_dir, f'pipeline_trace_epoch_{epoch}.json'),
+                'w') as f:
+            json.dump(dict(traceEvents=events, displayTimeUnit='ms'), f)
@@ -1 +1,7 @@
-from .panoptic_utils import (INSTANCE_OFFSET)
\ No newline at end of file
+from .bbox_overlaps import bbox_overlaps
+from .panoptic_utils import (INSTANCE_OFFSET)
+from .recall import eval_recalls, print_recall_summary
+
+__all__ = [
+    'INSTANCE_OFFSET', 'bbox_overlaps', 'eval_recalls', 'print_recall_summary'
+]
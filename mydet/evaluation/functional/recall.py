@@ -0,0 +1,173 @@
+from multiprocessing import Pool
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+from mmengine.logging import print_log
+from terminaltables import AsciiTable
+
+from .bbox_overlaps import bbox_overlaps
+
+
+def _best_ious(gts: Optional[np.ndarray], proposals: np.ndarray,
+               proposal_nums: np.ndarray,
+               use_legacy_coordinate: bool) -> np.ndarray:
+    """
+    计算一张图片中每个 GT 在前 n 个 proposal 中的最大 IoU。
+    IoU 只计算一次，按 proposal 维度求累积最大值后即可得到所有
+    proposal_nums 的结果。
+
+    Args:
+        gts (np.ndarray | None): GT boxes of the image, shape (G, 4).
+        proposals (np.ndarray): Proposals of the image, shape (P, 4) or
+            (P, 5) with scores.
+        proposal_nums (np.ndarray): Numbers of proposals, shape (K, ).
+        use_legacy_coordinate (bool): Whether to use the coordinate system
+            in mmdet v1.x.
+
+    Returns:
+        np.ndarray: The best IoU of every GT, shape (K, G).
+    """
+    if proposals.ndim == 2 and proposals.shape[1] == 5:
+        scores = proposals[:, 4]
+        sort_idx = np.argsort(scores)[::-1]
+        proposals = proposals[sort_idx, :]
+    prop_num = min(proposals.shape[0], proposal_nums.max())
+    num_gts = 0 if gts is None else gts.shape[0]
+    if num_gts == 0 or prop_num == 0:
+        return np.zeros((len(proposal_nums), num_gts), dtype=np.float32)
+    ious = bbox_overlaps(
+        gts,
+        proposals[:prop_num, :4],
+        use_legacy_coordinate=use_legacy_coordinate)
+    # (G, P)，第 j 列为前 j + 1 个 proposal 的最大 IoU
+    ious = np.maximum.accumulate(ious, axis=1)
+    cols = np.minimum(proposal_nums, prop_num) - 1
+    return ious[:, cols].T
+
+
+def _recalls(best_ious: np.ndarray, thrs: np.ndarray) -> np.ndarray:
+    """Compute recalls of all proposal numbers and IoU thresholds.
+
+    Args:
+        best_ious (np.ndarray): Best IoU of every GT, shape (K, G).
+        thrs (np.ndarray): IoU thresholds, shape (T, ).
+
+    Returns:
+        np.ndarray: Recalls, shape (K, T).
+    """
+    total_gt_num = best_ious.shape[1]
+    if total_gt_num == 0:
+        return np.zeros((best_ious.shape[0], thrs.size))
+    hits = best_ious[:, :, None] >= thrs[None, None, :]
+    return hits.sum(axis=1) / float(total_gt_num)
+
+
+def set_recall_param(proposal_nums, iou_thrs):
+    """Check proposal_nums and iou_thrs and set correct format."""
+    if isinstance(proposal_nums, Sequence):
+        _proposal_nums = np.array(proposal_nums)
+    elif isinstance(proposal_nums, int):
+        _proposal_nums = np.array([proposal_nums])
+    else:
+        _proposal_nums = proposal_nums
+
+    if iou_thrs is None:
+        _iou_thrs = np.array([0.5])
+    elif isinstance(iou_thrs, Sequence):
+        _iou_thrs = np.array(iou_thrs)
+    elif isinstance(iou_thrs, float):
+        _iou_thrs = np.array([iou_thrs])
+    else:
+        _iou_thrs = iou_thrs
+
+    return _proposal_nums, _iou_thrs
+
+
+def eval_recalls(gts: List[np.ndarray],
+                 proposals: List[np.ndarray],
+                 proposal_nums: Union[int, Sequence[int], None] = None,
+                 iou_thrs: Union[float, Sequence[float], None] = 0.5,
+                 logger=None,
+                 use_legacy_coordinate: bool = False,
+                 nproc: int = 0) -> np.ndarray:
+    """Calculate recalls.
+
+    A GT is recalled by the first ``n`` proposals if the highest IoU between
+    it and these proposals is not less than the IoU threshold. The IoUs of
+    every image are computed once, and the recalls of all proposal numbers
+    and IoU thresholds are derived from their cumulative maxima.
+
+    Args:
+        gts (list[ndarray]): a list of arrays of shape (n, 4)
+        proposals (list[ndarray]): a list of arrays of shape (k, 4) or (k, 5)
+        proposal_nums (int | Sequence[int]): Top N proposals to be evaluated.
+        iou_thrs (float | Sequence[float]): IoU thresholds. Default: 0.5.
+        logger (logging.Logger | str | None): The way to print the recall
+            summary. See `mmengine.logging.print_log()` for details.
+            Default: None.
+        use_legacy_coordinate (bool): Whether use coordinate system
+            in mmdet v1.x. "1" was added to both height and width
+            which means w, h should be
+            computed as 'x2 - x1 + 1` and 'y2 - y1 + 1'. Default: False.
+        nproc (int): Number of processes to compute the IoUs of images in
+            parallel. 0 means no process pool. Default: 0.
+
+    Returns:
+        ndarray: recalls of different ious and proposal nums
+    """
+
+    img_num = len(gts)
+    assert img_num == len(proposals)
+    proposal_nums, iou_thrs = set_recall_param(proposal_nums, iou_thrs)
+
+    args = [(gts[i], proposals[i], proposal_nums, use_legacy_coordinate)
+            for i in range(img_num)]
+    if nproc > 0:
+        with Pool(nproc) as pool:
+            all_ious = pool.starmap(
+                _best_ious, args, chunksize=max(1, img_num // (nproc * 4)))
+    else:
+        all_ious = [_best_ious(*arg) for arg in args]
+    if img_num > 0:
+        best_ious = np.concatenate(all_ious, axis=1)
+    else:
+        best_ious = np.zeros((len(proposal_nums), 0), dtype=np.float32)
+
+    recalls = _recalls(best_ious, iou_thrs)
+
+    print_recall_summary(recalls, proposal_nums, iou_thrs, logger=logger)
+    return recalls
+
+
+def print_recall_summary(recalls,
+                         proposal_nums,
+                         iou_thrs,
+                         row_idxs=None,
+                         col_idxs=None,
+                         logger=None):
+    """Print recalls in a table.
+
+    Args:
+        recalls (ndarray): calculated from `bbox_recalls`
+        proposal_nums (ndarray or list): top N proposals
+        iou_thrs (ndarray or list): iou thresholds
+        row_idxs (ndarray): which rows(proposal nums) to print
+        col_idxs (ndarray): which cols(iou thresholds) to print
+        logger (logging.Logger | str | None): The way to print the recall
+            summary. See `mmengine.logging.print_log()` for details.
+            Default: None.
+    """
+    proposal_nums = np.array(proposal_nums, dtype=np.int32)
+    iou_thrs = np.array(iou_thrs)
+    if row_idxs is None:
+        row_idxs = np.arange(proposal_nums.size)
+    if col_idxs is None:
+        col_idxs = np.arange(iou_thrs.size)
+    row_header = [''] + iou_thrs[col_idxs].tolist()
+    table_data = [row_header]
+    for i, num in enumerate(proposal_nums[row_idxs]):
+        row = [f'{val:.3f}' for val in recalls[row_idxs[i], col_idxs].tolist()]
+        row.insert(0, num)
+        table_data.append(row)
+    table = AsciiTable(table_data)
+    print_log('\n' + table.table, logger=logger)
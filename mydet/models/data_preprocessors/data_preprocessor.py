@@ -10,7 +10,7 @@ import torch.nn.functional as F
 from mmengine.dist import barrier, broadcast, get_dist_info
 from mmengine.logging import MessageHub
 from mmengine.model import BaseDataPreprocessor, ImgDataPreprocessor
-from mmengine.structures import PixelData
+from mmengine.structures import InstanceData, PixelData
 from mmengine.utils import is_seq_of
 from torch import Tensor
 
@@ -18,6 +18,7 @@ from mydet.models.utils import unfold_wo_center
 from mydet.models.utils.misc import samplelist_boxtype2tensor
 from mydet.registry import MODELS
 from mydet.structures import DetDataSample
+from mydet.structures.bbox import HorizontalBoxes
 from mydet.structures.mask import BitmapMasks
 from mydet.utils import ConfigType
 
@@ -119,9 +120,17 @@ class DetDataPreprocessor(ImgDataPreprocessor):
             dict: Data in the same format as the model input.
         """
         batch_pad_shape = self._get_pad_shape(data)
+        batched = isinstance(data['inputs'], torch.Tensor)
         data = super().forward(data=data, training=training)
         inputs, data_samples = data['inputs'], data['data_samples']
 
+        if batched and data_samples is not None:
+            self._fill_batch_pad(inputs, data_samples)
+
+        gt_records = data.get('gt_records', None)
+        if gt_records is not None and data_samples is not None:
+            self._unpack_gt_records(gt_records, data_samples)
+
         if data_samples is not None:
             # NOTE the batched image size information may be useful, e.g.
             # in DETR, this is needed for the construction of masks, which is
@@ -163,25 +172,67 @@ class DetDataPreprocessor(ImgDataPreprocessor):
                     np.ceil(ori_input.shape[2] /
                             self.pad_size_divisor)) * self.pad_size_divisor
                 batch_pad_shape.append((pad_h, pad_w))
-        # Process data with `default_collate`.
+        # Process data with `default_collate` or `padded_collate`.
         elif isinstance(_batch_inputs, torch.Tensor):
             assert _batch_inputs.dim() == 4, (
                 'The input of `ImgDataPreprocessor` should be a NCHW tensor '
                 'or a list of tensor, but got a tensor with shape: '
                 f'{_batch_inputs.shape}')
-            pad_h = int(
-                np.ceil(_batch_inputs.shape[1] /
-                        self.pad_size_divisor)) * self.pad_size_divisor
-            pad_w = int(
-                np.ceil(_batch_inputs.shape[2] /
-                        self.pad_size_divisor)) * self.pad_size_divisor
-            batch_pad_shape = [(pad_h, pad_w)] * _batch_inputs.shape[0]
+            data_samples = data.get('data_samples', None)
+            if data_samples is not None:
+                # padded_collate 中的图片大小不同，按每张图片的大小计算
+                img_shapes = [
+                    data_sample.img_shape[:2] for data_sample in data_samples
+                ]
+            else:
+                img_shapes = [_batch_inputs.shape[2:]] * _batch_inputs.shape[0]
+            batch_pad_shape = []
+            for h, w in img_shapes:
+                pad_h = int(np.ceil(
+                    h / self.pad_size_divisor)) * self.pad_size_divisor
+                pad_w = int(np.ceil(
+                    w / self.pad_size_divisor)) * self.pad_size_divisor
+                batch_pad_shape.append((pad_h, pad_w))
         else:
             raise TypeError('Output of `cast_data` should be a dict '
                             'or a tuple with inputs and data_samples, but got'
                             f'{type(data)}： {data}')
         return batch_pad_shape
 
+    def _fill_batch_pad(self, inputs: Tensor,
+                        batch_data_samples: Sequence[DetDataSample]) -> None:
+        """Fill the padding of a collated batch with ``pad_value``.
+
+        ``padded_collate`` pads the images before normalization, refill the
+        padding so that the batch is the same as stacking and padding the
+        normalized images one by one.
+        """
+        for img, data_sample in zip(inputs, batch_data_samples):
+            h, w = data_sample.img_shape[:2]
+            img[:, h:].fill_(self.pad_value)
+            img[:, :h, w:].fill_(self.pad_value)
+
+    def _unpack_gt_records(self, gt_records: dict,
+                           batch_data_samples: Sequence[DetDataSample]
+                           ) -> None:
+        """Split the flat records collated by ``padded_collate`` into
+        ``gt_instances`` and ``ignored_instances``.
+
+        The records of a batch are moved to the device at once, the
+        instances of every image are views of them.
+        """
+        assert isinstance(gt_records, dict), \
+            '`PackDetInputs(flat_instances=True)` requires `padded_collate`'
+        chunks = gt_records['records'].split(gt_records['split_sizes'])
+        for i, data_sample in enumerate(batch_data_samples):
+            valid, ignored = chunks[2 * i], chunks[2 * i + 1]
+            data_sample.gt_instances = InstanceData(
+                bboxes=HorizontalBoxes(valid[:, :4]),
+                labels=valid[:, 4].long())
+            data_sample.ignored_instances = InstanceData(
+                bboxes=HorizontalBoxes(ignored[:, :4]),
+                labels=ignored[:, 4].long())
+
     def pad_gt_masks(self,
                      batch_data_samples: Sequence[DetDataSample]) -> None:
         """Pad gt_masks to shape of batch_input_shape."""
@@ -658,6 +709,241 @@ class BatchResize(nn.Module):
         return padded_tensor
 
 
+@MODELS.register_module()
+class BatchPhotoMetricAugment(nn.Module):
+    """Batch-level photometric augmentation on the collated inputs.
+
+    与 ``PhotoMetricDistortion`` 等逐张图片在 dataloader worker 中用 numpy
+    执行的颜色变换不同，这里在 ``DetDataPreprocessor`` 拼好 batch 之后，
+    用 torch 对整个 batch 一次性完成，每张图片的参数独立采样。变换只作用于
+    每张图片 ``img_shape`` 内的区域，padding 部分保持不变。
+
+    依次执行以下变换，每个变换对每张图片以 ``prob`` 的概率生效：
+
+    - brightness: ``img * factor``
+    - contrast: 与灰度图均值混合
+    - saturation: 与灰度图混合
+    - hue: 在 YIQ 空间中旋转色相
+    - posterize: 保留高 ``bits`` 位
+    - equalize: 逐通道直方图均衡，与 ``mmcv.imequalize`` 一致
+
+    Args:
+        mean (Sequence[Number], optional): The pixel mean used by the data
+            preprocessor, the inputs are de-normalized before augmentation
+            and normalized again after it. None means the inputs are not
+            normalized. Defaults to None.
+        std (Sequence[Number], optional): The pixel standard deviation used
+            by the data preprocessor. Defaults to None.
+        rgb (bool): Whether the channels of the inputs are in RGB order,
+            i.e. ``bgr_to_rgb=True`` in the data preprocessor. Defaults to
+            True.
+        prob (float): The probability of applying each transform to each
+            image. Defaults to 0.5.
+        brightness (tuple[float], optional): Range of the brightness factor.
+            None means no brightness transform. Defaults to (0.6, 1.4).
+        contrast (tuple[float], optional): Range of the contrast factor.
+            Defaults to (0.6, 1.4).
+        saturation (tuple[float], optional): Range of the saturation factor.
+            Defaults to (0.6, 1.4).
+        hue (tuple[float], optional): Range of the hue rotation in degrees.
+            Defaults to (-18, 18).
+        posterize (tuple[int], optional): Range of the number of bits to
+            keep, both ends included. Defaults to None.
+        equalize (bool): Whether to apply histogram equalization.
+            Defaults to False.
+    """
+
+    def __init__(self,
+                 mean: Optional[Sequence[Number]] = None,
+                 std: Optional[Sequence[Number]] = None,
+                 rgb: bool = True,
+                 prob: float = 0.5,
+                 brightness: Optional[Tuple[float, float]] = (0.6, 1.4),
+                 contrast: Optional[Tuple[float, float]] = (0.6, 1.4),
+                 saturation: Optional[Tuple[float, float]] = (0.6, 1.4),
+                 hue: Optional[Tuple[float, float]] = (-18, 18),
+                 posterize: Optional[Tuple[int, int]] = None,
+                 equalize: bool = False) -> None:
+        super().__init__()
+        assert 0 <= prob <= 1
+        assert (mean is None) == (std is None), (
+            'mean and std should be both None or tuple')
+        if posterize is not None:
+            assert 0 <= posterize[0] <= posterize[1] <= 8
+        self.prob = prob
+        self.brightness = brightness
+        self.contrast = contrast
+        self.saturation = saturation
+        self.hue = hue
+        self.posterize = posterize
+        self.equalize = equalize
+        self.rgb = rgb
+        if mean is not None:
+            self.register_buffer('mean',
+                                 torch.tensor(mean).view(1, -1, 1, 1), False)
+            self.register_buffer('std',
+                                 torch.tensor(std).view(1, -1, 1, 1), False)
+        else:
+            self.mean = None
+            self.std = None
+
+        gray_weights = torch.tensor([0.299, 0.587, 0.114])
+        rgb2yiq = torch.tensor([[0.299, 0.587, 0.114],
+                                [0.596, -0.274, -0.322],
+                                [0.211, -0.523, 0.312]])
+        if not rgb:
+            gray_weights = gray_weights.flip(0)
+            rgb2yiq = rgb2yiq.flip(1)
+        self.register_buffer('gray_weights', gray_weights.view(1, 3, 1, 1),
+                             False)
+        self.register_buffer('rgb2yiq', rgb2yiq, False)
+        self.register_buffer('yiq2rgb', torch.linalg.inv(rgb2yiq), False)
+
+    def forward(
+        self,
+        inputs: Tensor,
+        data_samples: Optional[List[DetDataSample]] = None
+    ) -> Tuple[Tensor, Optional[List[DetDataSample]]]:
+        """Augment a batch of images, ``data_samples`` are unchanged."""
+        num_imgs = inputs.size(0)
+        img = inputs.float()
+        if self.mean is not None:
+            img = img * self.std + self.mean
+        valid = self._get_valid_mask(img, data_samples)
+
+        out = img
+        if self.brightness is not None:
+            factor = self._rand_factor(self.brightness, num_imgs, img.device)
+            out = (out * factor).clamp(0, 255)
+        if self.contrast is not None:
+            factor = self._rand_factor(self.contrast, num_imgs, img.device)
+            gray = self._gray(out)
+            if valid is None:
+                gray_mean = gray.mean(dim=(2, 3), keepdim=True)
+            else:
+                gray_mean = (gray * valid).sum(
+                    dim=(2, 3), keepdim=True) / valid.sum(
+                        dim=(2, 3), keepdim=True).clamp(min=1)
+            out = (out * factor + gray_mean * (1 - factor)).clamp(0, 255)
+        if self.saturation is not None:
+            factor = self._rand_factor(self.saturation, num_imgs, img.device)
+            out = (out * factor + self._gray(out) * (1 - factor)).clamp(
+                0, 255)
+        if self.hue is not None:
+            out = self._rotate_hue(out)
+        if self.posterize is not None:
+            out = self._posterize(out)
+        if self.equalize:
+            out = self._equalize(out, valid)
+
+        if valid is not None:
+            out = torch.where(valid, out, img)
+        if self.mean is not None:
+            out = (out - self.mean) / self.std
+        return out.to(inputs.dtype), data_samples
+
+    def _get_valid_mask(
+            self, img: Tensor,
+            data_samples: Optional[List[DetDataSample]]) -> Optional[Tensor]:
+        """Get the (N, 1, H, W) mask of the pixels inside ``img_shape``, None
+        if all pixels are valid."""
+        if data_samples is None:
+            return None
+        h, w = img.shape[-2:]
+        img_shapes = torch.tensor(
+            [data_sample.img_shape[:2] for data_sample in data_samples],
+            device=img.device)
+        if bool((img_shapes[:, 0] >= h).all() and
+                (img_shapes[:, 1] >= w).all()):
+            return None
+        valid_y = torch.arange(h, device=img.device) < img_shapes[:, :1]
+        valid_x = torch.arange(w, device=img.device) < img_shapes[:, 1:]
+        return (valid_y[:, :, None] & valid_x[:, None, :])[:, None]
+
+    def _rand_apply(self, num_imgs: int, device: torch.device) -> Tensor:
+        """Sample whether to apply a transform to each image."""
+        return torch.rand(num_imgs, device=device) < self.prob
+
+    def _rand_factor(self, factor_range: Tuple[float, float], num_imgs: int,
+                     device: torch.device) -> Tensor:
+        """Sample a (N, 1, 1, 1) factor, images which are not augmented get
+        the identity factor 1."""
+        low, high = factor_range
+        factor = torch.rand(num_imgs, device=device) * (high - low) + low
+        factor = torch.where(
+            self._rand_apply(num_imgs, device), factor,
+            torch.ones_like(factor))
+        return factor.view(-1, 1, 1, 1)
+
+    def _gray(self, img: Tensor) -> Tensor:
+        """Convert (N, 3, H, W) images to (N, 1, H, W) gray images."""
+        assert img.size(1) == 3, \
+            'color transforms only support 3-channel images'
+        return (img * self.gray_weights).sum(dim=1, keepdim=True)
+
+    def _rotate_hue(self, img: Tensor) -> Tensor:
+        """Rotate the hue of each image with a per-image 3x3 matrix."""
+        assert img.size(1) == 3, \
+            'color transforms only support 3-channel images'
+        num_imgs = img.size(0)
+        low, high = self.hue
+        theta = torch.rand(num_imgs, device=img.device) * (high - low) + low
+        theta = torch.where(
+            self._rand_apply(num_imgs, img.device), theta,
+            torch.zeros_like(theta)) * (np.pi / 180)
+        cos, sin = theta.cos(), theta.sin()
+        rotation = torch.zeros((num_imgs, 3, 3), device=img.device)
+        rotation[:, 0, 0] = 1
+        rotation[:, 1, 1] = cos
+        rotation[:, 1, 2] = -sin
+        rotation[:, 2, 1] = sin
+        rotation[:, 2, 2] = cos
+        matrix = self.yiq2rgb @ rotation @ self.rgb2yiq
+        return torch.einsum('nij,njhw->nihw', matrix, img).clamp(0, 255)
+
+    def _posterize(self, img: Tensor) -> Tensor:
+        """Keep the highest ``bits`` bits of every pixel."""
+        num_imgs = img.size(0)
+        low, high = self.posterize
+        bits = torch.randint(
+            low, high + 1, (num_imgs, ), device=img.device)
+        bits = torch.where(
+            self._rand_apply(num_imgs, img.device), bits,
+            torch.full_like(bits, 8))
+        step = (2**(8 - bits)).view(-1, 1, 1, 1).to(img.dtype)
+        posterized = torch.div(img.round(), step, rounding_mode='floor') * step
+        return torch.where(step > 1, posterized, img)
+
+    def _equalize(self, img: Tensor, valid: Optional[Tensor]) -> Tensor:
+        """Equalize the histogram of every channel of every image, the
+        histograms are computed with a single ``bincount``."""
+        num_imgs, num_channels, h, w = img.shape
+        pixels = img.round().clamp(0, 255).long().flatten(2)
+        if valid is not None:
+            # padding 部分计入第 257 个 bin，不参与统计
+            pixels = pixels.masked_fill(~valid.flatten(2), 256)
+        num_rows = num_imgs * num_channels
+        offsets = torch.arange(
+            num_rows, device=img.device).view(num_imgs, num_channels, 1) * 257
+        hist = torch.bincount(
+            (pixels + offsets).flatten(), minlength=num_rows * 257)
+        hist = hist.view(num_imgs, num_channels, 257)[..., :256]
+
+        levels = torch.arange(256, device=img.device).expand_as(hist)
+        last_idx = torch.where(hist > 0, levels,
+                               torch.zeros_like(levels)).max(dim=-1).values
+        last_count = hist.gather(-1, last_idx[..., None])[..., 0]
+        step = (hist.sum(dim=-1) - last_count) // 255
+        lut = (hist.cumsum(dim=-1) +
+               (step // 2)[..., None]) // step.clamp(min=1)[..., None]
+        lut = F.pad(lut[..., :-1], (1, 0)).clamp(max=255)
+        lut = torch.where(step[..., None] > 0, lut, levels)
+
+        equalized = lut.gather(-1, pixels.clamp(max=255)).view_as(img)
+        apply = self._rand_apply(num_imgs, img.device).view(-1, 1, 1, 1)
+        return torch.where(apply, equalized.to(img.dtype), img)
+
+
 @MODELS.register_module()
 class BoxInstDataPreprocessor(DetDataPreprocessor):
     """Pseudo mask pre-processor for BoxInst.
@@ -12,12 +12,13 @@ from mmengine.structures import InstanceData
 from torch import Tensor
 
 from mydet.structures import SampleList
-from mydet.structures.bbox import (cat_boxes, get_box_tensor, get_box_wh,
-                                   scale_boxes)
+from mydet.structures.bbox import (BaseBoxes, cat_boxes, get_box_tensor,
+                                   get_box_wh, scale_boxes)
 from mydet.utils import InstanceList, OptMultiConfig
+from ..layers import multi_img_nms
 from ..test_time_augs import merge_aug_results
-from ..utils import (filter_scores_and_topk, select_single_mlvl,
-                     unpack_gt_instances)
+from ..utils import (filter_scores_and_segment_topk, filter_scores_and_topk,
+                     select_single_mlvl, unpack_gt_instances)
 
 
 class BaseDenseHead(BaseModule, metaclass=ABCMeta):
@@ -226,8 +227,10 @@ class BaseDenseHead(BaseModule, metaclass=ABCMeta):
             batch_img_metas (list[dict], Optional): Batch image meta info.
                 Defaults to None.
             cfg (ConfigDict, optional): Test / postprocessing
-                configuration, if None, test_cfg would be used.
-                Defaults to None.
+                configuration, if None, test_cfg would be used. The whole
+                batch is post-processed at once by
+                :meth:`_predict_by_feat_fused` if ``fused_post_process=True``
+                in it. Defaults to None.
             rescale (bool): If True, return boxes in original image space.
                 Defaults to False.
             with_nms (bool): If True, do nms before return boxes.
@@ -262,6 +265,20 @@ class BaseDenseHead(BaseModule, metaclass=ABCMeta):
             dtype=cls_scores[0].dtype,
             device=cls_scores[0].device)
 
+        # 整个 batch 只拷贝一次 cfg
+        cfg = self.test_cfg if cfg is None else cfg
+        cfg = copy.deepcopy(cfg)
+        if with_nms and cfg.get('fused_post_process', False) and \
+                self._support_fused_post_process():
+            return self._predict_by_feat_fused(
+                cls_scores=cls_scores,
+                bbox_preds=bbox_preds,
+                score_factors=score_factors,
+                mlvl_priors=mlvl_priors,
+                batch_img_metas=batch_img_metas,
+                cfg=cfg,
+                rescale=rescale)
+
         result_list = []
 
         for img_id in range(len(batch_img_metas)):
@@ -344,7 +361,6 @@ class BaseDenseHead(BaseModule, metaclass=ABCMeta):
             with_score_factors = True
 
         cfg = self.test_cfg if cfg is None else cfg
-        cfg = copy.deepcopy(cfg)
         img_shape = img_meta['img_shape']
         nms_pre = cfg.get('nms_pre', -1)
 
@@ -421,6 +437,158 @@ class BaseDenseHead(BaseModule, metaclass=ABCMeta):
             with_nms=with_nms,
             img_meta=img_meta)
 
+    def _support_fused_post_process(self) -> bool:
+        """Whether :meth:`_predict_by_feat_fused` gives the same results as
+        :meth:`_predict_by_feat_single`.
+
+        重写了 ``_predict_by_feat_single`` 的 head 需要同时重写
+        :meth:`_decode_fused`，重写了 ``_bbox_post_process`` 的 head 不支持。
+        """
+        cls = type(self)
+        if cls._bbox_post_process is not BaseDenseHead._bbox_post_process:
+            return False
+        return cls._predict_by_feat_single is \
+            BaseDenseHead._predict_by_feat_single or \
+            cls._decode_fused is not BaseDenseHead._decode_fused
+
+    def _decode_fused(self, priors: Tensor, bbox_pred: Tensor,
+                      level_inds: Tensor) -> Tensor:
+        """Decode the bboxes of all levels and all images at once.
+
+        Args:
+            priors (Tensor): The priors of the candidates, shape (n, 4) or
+                (n, 2).
+            bbox_pred (Tensor): The raw predictions of the candidates, shape
+                (n, C), C is the number of channels of a prior.
+            level_inds (Tensor): The level of each candidate, shape (n, ).
+
+        Returns:
+            Tensor: The decoded bboxes without clipping, shape (n, 4).
+        """
+        return self.bbox_coder.decode(priors, bbox_pred)
+
+    def _predict_by_feat_fused(self, cls_scores: List[Tensor],
+                               bbox_preds: List[Tensor],
+                               score_factors: Optional[List[Tensor]],
+                               mlvl_priors: List[Tensor],
+                               batch_img_metas: List[dict], cfg: ConfigDict,
+                               rescale: bool) -> InstanceList:
+        """Post-process all levels and all images of a batch at once.
+
+        与逐张图片、逐层调用 :meth:`_predict_by_feat_single` 的结果相同：
+
+        1. 所有层、所有图片展平成一个连续的 (B, N, C) 张量，只做一次
+           sigmoid；
+        2. 用 :func:`filter_scores_and_segment_topk` 对每张图片的每一层
+           做阈值过滤和 ``nms_pre`` top-k；
+        3. 一次 :meth:`_decode_fused` 解码所有候选框，再按每张图片的
+           ``img_shape`` 裁剪；
+        4. 一次 :func:`multi_img_nms` 完成所有图片的 NMS。
+
+        Args:
+            cls_scores (list[Tensor]): Classification scores for all
+                scale levels, each has shape
+                (batch_size, num_priors * num_classes, H, W).
+            bbox_preds (list[Tensor]): Box energies / deltas for all
+                scale levels, each has shape (batch_size, num_priors * C, H,
+                W).
+            score_factors (list[Tensor], optional): Score factor for
+                all scale level, each has shape (batch_size, num_priors * 1,
+                H, W).
+            mlvl_priors (list[Tensor]): The priors of each level.
+            batch_img_metas (list[dict]): Batch image meta info.
+            cfg (ConfigDict): Test / postprocessing configuration.
+            rescale (bool): If True, return boxes in original image space.
+
+        Returns:
+            list[:obj:`InstanceData`]: Object detection results of each
+            image, see :meth:`predict_by_feat`.
+        """
+        num_imgs = len(batch_img_metas)
+        num_levels = len(cls_scores)
+        level_sizes = [priors.size(0) for priors in mlvl_priors]
+        device = cls_scores[0].device
+
+        cls_score = torch.cat([
+            cls_score.detach().permute(0, 2, 3, 1).reshape(
+                num_imgs, -1, self.cls_out_channels)
+            for cls_score in cls_scores
+        ], dim=1)
+        bbox_pred = torch.cat([
+            bbox_pred.detach().permute(0, 2, 3, 1).reshape(
+                num_imgs, num_priors, -1)
+            for bbox_pred, num_priors in zip(bbox_preds, level_sizes)
+        ], dim=1)
+        if self.use_sigmoid_cls:
+            scores = cls_score.sigmoid()
+        else:
+            scores = cls_score.softmax(-1)[..., :-1]
+        level_inds = torch.repeat_interleave(
+            torch.arange(num_levels, device=device),
+            torch.tensor(level_sizes, device=device))
+
+        scores, labels, img_inds, prior_inds = \
+            filter_scores_and_segment_topk(scores, cfg.get('score_thr', 0),
+                                           cfg.get('nms_pre', -1),
+                                           level_inds)
+
+        priors = cat_boxes(mlvl_priors)[prior_inds]
+        bboxes = self._decode_fused(priors, bbox_pred[img_inds, prior_inds],
+                                    level_inds[prior_inds])
+        bbox_tensor = get_box_tensor(bboxes)
+        if getattr(self.bbox_coder, 'clip_border', True):
+            # 每个候选框按所在图片的 img_shape 裁剪
+            max_shape = bbox_tensor.new_tensor(
+                [meta['img_shape'][:2] for meta in batch_img_metas])
+            max_xy = max_shape[img_inds].flip(-1).repeat(1, 2)
+            bbox_tensor.clamp_(min=0)
+            torch.min(bbox_tensor, max_xy, out=bbox_tensor)
+
+        if score_factors is not None:
+            score_factor = torch.cat([
+                score_factor.detach().permute(0, 2, 3, 1).reshape(
+                    num_imgs, -1) for score_factor in score_factors
+            ], dim=1).sigmoid()
+            scores = scores * score_factor[img_inds, prior_inds]
+
+        if rescale:
+            # 与 _bbox_post_process 相同，先缩放到原图再过滤小框和 NMS
+            assert all(
+                meta.get('scale_factor') is not None
+                for meta in batch_img_metas)
+            scale_factor = bbox_tensor.new_tensor(
+                [[1 / s for s in meta['scale_factor']]
+                 for meta in batch_img_metas])
+            bbox_tensor = bbox_tensor * scale_factor[img_inds].repeat(1, 2)
+            bboxes = type(bboxes)(bbox_tensor) if isinstance(
+                bboxes, BaseBoxes) else bbox_tensor
+
+        # filter small size bboxes
+        if cfg.get('min_bbox_size', -1) >= 0:
+            w, h = get_box_wh(bboxes)
+            valid_mask = (w > cfg.min_bbox_size) & (h > cfg.min_bbox_size)
+            if not valid_mask.all():
+                bboxes, bbox_tensor = bboxes[valid_mask], \
+                    bbox_tensor[valid_mask]
+                scores, labels = scores[valid_mask], labels[valid_mask]
+                img_inds = img_inds[valid_mask]
+
+        dets, keep, counts = multi_img_nms(bbox_tensor, scores, labels,
+                                           img_inds, num_imgs, cfg.nms,
+                                           cfg.max_per_img)
+
+        result_list = []
+        for img_bboxes, img_scores, img_labels in zip(
+                bboxes[keep].split(counts), dets[:, -1].split(counts),
+                labels[keep].split(counts)):
+            results = InstanceData()
+            results.bboxes = img_bboxes
+            # some nms would reweight the score, such as softnms
+            results.scores = img_scores
+            results.labels = img_labels
+            result_list.append(results)
+        return result_list
+
     def _bbox_post_process(self,
                            results: InstanceData,
                            cfg: ConfigDict,
@@ -393,6 +393,15 @@ class GFLHead(AnchorHead):
         return dict(
             loss_cls=losses_cls, loss_bbox=losses_bbox, loss_dfl=losses_dfl)
 
+    def _decode_fused(self, priors: Tensor, bbox_pred: Tensor,
+                      level_inds: Tensor) -> Tensor:
+        """Decode the integral distributions of all levels at once, used by
+        the fused post-processing."""
+        strides = bbox_pred.new_tensor(
+            [stride[0] for stride in self.prior_generator.strides])
+        bbox_pred = self.integral(bbox_pred) * strides[level_inds, None]
+        return self.bbox_coder.decode(self.anchor_center(priors), bbox_pred)
+
     def _predict_by_feat_single(self,
                                 cls_score_list: List[Tensor],
                                 bbox_pred_list: List[Tensor],
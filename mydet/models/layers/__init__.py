@@ -1,6 +1,7 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 from .activations import SiLU
-from .bbox_nms import fast_nms, multiclass_nms
+from .bbox_nms import (batched_multiclass_nms, fast_nms, multi_img_nms,
+                       multiclass_nms)
 from .brick_wrappers import AdaptiveAvgPool2d, adaptive_avg_pool2d
 from .conv_upsample import ConvUpsample
 from .csp_layer import CSPLayer
@@ -40,7 +41,8 @@ from .transformer import (MLP, AdaptivePadding, CdnQueryGenerator,
 # yapf: enable
 
 __all__ = [
-    'fast_nms', 'multiclass_nms', 'mask_matrix_nms', 'DropBlock',
+    'fast_nms', 'multiclass_nms', 'batched_multiclass_nms', 'multi_img_nms',
+    'mask_matrix_nms', 'DropBlock',
     'PixelDecoder', 'TransformerEncoderPixelDecoder',
     'MSDeformAttnPixelDecoder', 'ResLayer', 'PatchMerging',
     'SinePositionalEncoding', 'LearnedPositionalEncoding', 'DynamicConv',
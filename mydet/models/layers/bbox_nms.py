@@ -1,5 +1,5 @@
 # Copyright (c) OpenMMLab. All rights reserved.
-from typing import Optional, Tuple, Union
+from typing import List, Optional, Tuple, Union
 
 import torch
 from mmcv.ops.nms import batched_nms
@@ -105,6 +105,150 @@ def multiclass_nms(
         return dets, labels[keep]
 
 
+def batched_multiclass_nms(
+    multi_bboxes: Tensor,
+    multi_scores: Tensor,
+    score_thr: float,
+    nms_cfg: ConfigType,
+    max_num: int = -1,
+    score_factors: Optional[Tensor] = None,
+    nms_pre: int = -1,
+    return_inds: bool = False,
+    box_dim: int = 4
+) -> List[Union[Tuple[Tensor, Tensor, Tensor], Tuple[Tensor, Tensor]]]:
+    """NMS for multi-class bboxes of a batch of images.
+
+    整个 batch 的分数阈值、top-k 和框的 gather 只做一次，NMS 由
+    :func:`multi_img_nms` 按图片分段完成。``nms_pre=-1`` 时与逐张图片调用
+    :func:`multiclass_nms`（分数最后一列为背景）的结果相同。
+
+    Args:
+        multi_bboxes (Tensor): shape (B, n, #class*4) or (B, n, 4).
+        multi_scores (Tensor): shape (B, n, #class), the scores of the
+            foreground classes only.
+        score_thr (float): bbox threshold, bboxes with scores lower than it
+            will not be considered.
+        nms_cfg (Union[:obj:`ConfigDict`, dict]): a dict that contains
+            the arguments of nms operations.
+        max_num (int, optional): if there are more than max_num bboxes after
+            NMS in an image, only top max_num will be kept. Default to -1.
+        score_factors (Tensor, optional): shape (B, n). The factors
+            multiplied to scores before applying NMS. Default to None.
+        nms_pre (int, optional): Only the top ``nms_pre`` (bbox, class)
+            pairs of each image above ``score_thr`` are kept before NMS.
+            Default to -1, which means no limit.
+        return_inds (bool, optional): Whether return the indices of kept
+            bboxes in the flattened (n * #class) scores of each image.
+            Default to False.
+        box_dim (int): The dimension of boxes. Defaults to 4.
+
+    Returns:
+        list[tuple]: (dets, labels, indices (optional)) of each image,
+        tensors of shape (k, 5), (k), and (k). Dets are boxes with scores.
+        Labels are 0-based.
+    """
+    num_imgs, num_bboxes, num_classes = multi_scores.shape
+    device = multi_scores.device
+    scores = multi_scores.reshape(num_imgs, -1)
+
+    # 1. 整个 batch 一起做阈值过滤和 top-k
+    valid_mask = scores > score_thr
+    if 0 < nms_pre < scores.size(1):
+        topk_scores, topk_inds = scores.masked_fill(
+            ~valid_mask, -float('inf')).topk(nms_pre, dim=1)
+        keep = topk_scores > score_thr
+        img_inds = torch.arange(
+            num_imgs, device=device)[:, None].expand_as(topk_inds)[keep]
+        inds = topk_inds[keep]
+    else:
+        img_inds, inds = valid_mask.nonzero(as_tuple=True)
+
+    bbox_inds = torch.div(inds, num_classes, rounding_mode='floor')
+    labels = inds % num_classes
+    if multi_bboxes.size(-1) > box_dim:
+        bboxes = multi_bboxes.view(num_imgs, num_bboxes, num_classes,
+                                   box_dim)[img_inds, bbox_inds, labels]
+    else:
+        bboxes = multi_bboxes[img_inds, bbox_inds]
+    scores = scores[img_inds, inds]
+    # multiply score_factor after threshold to preserve more bboxes, improve
+    # mAP by 1% for YOLOv3
+    if score_factors is not None:
+        scores = scores * score_factors[img_inds, bbox_inds]
+
+    # 2. 按图片做 NMS
+    dets, keep, counts = multi_img_nms(bboxes, scores, labels, img_inds,
+                                       num_imgs, nms_cfg, max_num)
+
+    results = []
+    for img_dets, img_labels, img_inds in zip(
+            dets.split(counts), labels[keep].split(counts),
+            inds[keep].split(counts)):
+        if return_inds:
+            results.append((img_dets, img_labels, img_inds))
+        else:
+            results.append((img_dets, img_labels))
+    return results
+
+
+def multi_img_nms(bboxes: Tensor,
+                  scores: Tensor,
+                  labels: Tensor,
+                  img_inds: Tensor,
+                  num_imgs: int,
+                  nms_cfg: ConfigType,
+                  max_num: int = -1) -> Tuple[Tensor, Tensor, List[int]]:
+    """Apply ``batched_nms`` to the bboxes of a batch of images.
+
+    框按图片稳定排序后，每张图片单独调用一次 ``batched_nms``，与逐张图片
+    调用 :func:`multiclass_nms` 的 NMS 完全相同。不把所有图片合成一次调用：
+    ``batched_nms`` 给每个 idx 加上 ``idx * (max_coordinate + 1)`` 的偏移，
+    图片和类别合在一起的 idx 很大时 fp32 坐标会损失精度，框的数量超过
+    ``split_thr`` 时还会在 Python 中逐个 idx 循环。
+
+    Args:
+        bboxes (Tensor): shape (n, 4).
+        scores (Tensor): shape (n, ).
+        labels (Tensor): shape (n, ), 0-based.
+        img_inds (Tensor): The image index of each bbox, shape (n, ).
+        num_imgs (int): The number of images.
+        nms_cfg (Union[:obj:`ConfigDict`, dict]): a dict that contains
+            the arguments of nms operations.
+        max_num (int, optional): if there are more than max_num bboxes after
+            NMS in an image, only top max_num will be kept. Default to -1.
+
+    Returns:
+        tuple: (dets, keep, counts). ``dets`` of shape (k, 5) are the kept
+        boxes with scores grouped by image, ``keep`` of shape (k, ) are
+        their indices in the inputs and ``counts`` are the numbers of the
+        kept boxes of every image.
+    """
+    # 稳定排序，每张图片内框的顺序与输入相同
+    order = torch.argsort(img_inds, stable=True)
+    counts = torch.bincount(img_inds, minlength=num_imgs).tolist()
+    dets_list, keep_list, kept_counts = [], [], []
+    for img_order in order.split(counts):
+        if img_order.numel() == 0:
+            kept_counts.append(0)
+            continue
+        dets, keep = batched_nms(bboxes[img_order], scores[img_order],
+                                 labels[img_order], nms_cfg)
+        if max_num > 0:
+            dets = dets[:max_num]
+            keep = keep[:max_num]
+        dets_list.append(dets)
+        keep_list.append(img_order[keep])
+        kept_counts.append(keep.numel())
+
+    if dets_list:
+        dets = torch.cat(dets_list)
+        keep = torch.cat(keep_list)
+    else:
+        dets = torch.cat([bboxes, scores[:, None]], -1)
+        keep = labels.new_zeros((0, ))
+    return dets, keep, kept_counts
+
+
 def fast_nms(
     multi_bboxes: Tensor,
     multi_scores: Tensor,
@@ -6,6 +6,11 @@ from mmengine.structures import InstanceData
 from torch import Tensor
 
 from mydet.registry import TASK_UTILS
+from mydet.structures.bbox import get_box_tensor
+from mydet.structures.bbox.bbox_overlaps import (DEFAULT_TILE_ELEMS,
+                                                 bbox_overlaps_max,
+                                                 iter_bbox_overlaps_tiles,
+                                                 sparse_bbox_overlaps)
 from .assign_result import AssignResult
 from .base_assigner import BaseAssigner
 
@@ -45,6 +50,16 @@ class MaxIoUAssigner(BaseAssigner):
             assign. When the number of gt is above this threshold, will assign
             on CPU device. Negative values mean not assign on CPU.
         iou_calculator (dict): Config of overlaps Calculator.
+        overlaps_budget (int): The maximum number of elements of the overlaps
+            matrix in memory at once. If num_gts x num_priors is larger, the
+            overlaps are computed in tiles and reduced on the fly, the full
+            matrix is never materialized. Negative values mean no limit.
+            Defaults to -1.
+        sparse (bool): Whether to compute the overlaps of the intersecting
+            pairs of gts and priors only, which are found with a uniform grid
+            index of the priors bucketed by size. The assign result is the
+            same as the dense one, and the assignment is never moved to CPU.
+            Defaults to False.
     """
 
     def __init__(self,
@@ -56,7 +71,9 @@ class MaxIoUAssigner(BaseAssigner):
                  ignore_wrt_candidates: bool = True,
                  match_low_quality: bool = True,
                  gpu_assign_thr: float = -1,
-                 iou_calculator: dict = dict(type='BboxOverlaps2D')):
+                 iou_calculator: dict = dict(type='BboxOverlaps2D'),
+                 overlaps_budget: int = -1,
+                 sparse: bool = False):
         self.pos_iou_thr = pos_iou_thr
         self.neg_iou_thr = neg_iou_thr
         self.min_pos_iou = min_pos_iou
@@ -66,6 +83,8 @@ class MaxIoUAssigner(BaseAssigner):
         self.gpu_assign_thr = gpu_assign_thr
         self.match_low_quality = match_low_quality
         self.iou_calculator = TASK_UTILS.build(iou_calculator)
+        self.overlaps_budget = overlaps_budget
+        self.sparse = sparse
 
     def assign(self,
                pred_instances: InstanceData,
@@ -126,8 +145,10 @@ class MaxIoUAssigner(BaseAssigner):
         else:
             gt_bboxes_ignore = None
 
+        # 稀疏模式下显存与 GT 数量近似线性，不需要放到 CPU 上
         assign_on_cpu = True if (self.gpu_assign_thr > 0) and (
-            gt_bboxes.shape[0] > self.gpu_assign_thr) else False
+            gt_bboxes.shape[0] > self.gpu_assign_thr) and (
+                not self.sparse) else False
         # compute overlap and assign gt on CPU when number of GT is large
         if assign_on_cpu:
             device = priors.device
@@ -137,11 +158,32 @@ class MaxIoUAssigner(BaseAssigner):
             if gt_bboxes_ignore is not None:
                 gt_bboxes_ignore = gt_bboxes_ignore.cpu()
 
-        overlaps = self.iou_calculator(gt_bboxes, priors)
+        tiled = 0 < self.overlaps_budget < \
+            gt_bboxes.shape[0] * priors.shape[0]
+        dense = not tiled and not self.sparse
+        if dense:
+            overlaps = self.iou_calculator(gt_bboxes, priors)
 
+        ignore_mask = None
         if (self.ignore_iof_thr > 0 and gt_bboxes_ignore is not None
                 and gt_bboxes_ignore.numel() > 0 and priors.numel() > 0):
-            if self.ignore_wrt_candidates:
+            if tiled and self.ignore_wrt_candidates:
+                ignore_max_overlaps, _ = bbox_overlaps_max(
+                    priors,
+                    gt_bboxes_ignore,
+                    mode='iof',
+                    dims=1,
+                    max_elems=self.overlaps_budget,
+                    overlaps_fn=self.iou_calculator)
+            elif tiled:
+                ignore_max_overlaps, _ = bbox_overlaps_max(
+                    gt_bboxes_ignore,
+                    priors,
+                    mode='iof',
+                    dims=0,
+                    max_elems=self.overlaps_budget,
+                    overlaps_fn=self.iou_calculator)
+            elif self.ignore_wrt_candidates:
                 ignore_overlaps = self.iou_calculator(
                     priors, gt_bboxes_ignore, mode='iof')
                 ignore_max_overlaps, _ = ignore_overlaps.max(dim=1)
@@ -149,9 +191,18 @@ class MaxIoUAssigner(BaseAssigner):
                 ignore_overlaps = self.iou_calculator(
                     gt_bboxes_ignore, priors, mode='iof')
                 ignore_max_overlaps, _ = ignore_overlaps.max(dim=0)
-            overlaps[:, ignore_max_overlaps > self.ignore_iof_thr] = -1
+            ignore_mask = ignore_max_overlaps > self.ignore_iof_thr
+            if dense:
+                overlaps[:, ignore_mask] = -1
 
-        assign_result = self.assign_wrt_overlaps(overlaps, gt_labels)
+        if self.sparse:
+            assign_result = self.assign_wrt_boxes_sparse(
+                gt_bboxes, priors, gt_labels, ignore_mask)
+        elif tiled:
+            assign_result = self.assign_wrt_boxes_tiled(
+                gt_bboxes, priors, gt_labels, ignore_mask)
+        else:
+            assign_result = self.assign_wrt_overlaps(overlaps, gt_labels)
         if assign_on_cpu:
             assign_result.gt_inds = assign_result.gt_inds.to(device)
             assign_result.max_overlaps = assign_result.max_overlaps.to(device)
@@ -243,3 +294,239 @@ class MaxIoUAssigner(BaseAssigner):
             gt_inds=assigned_gt_inds,
             max_overlaps=max_overlaps,
             labels=assigned_labels)
+
+    def assign_wrt_boxes_tiled(
+            self,
+            gt_bboxes: Tensor,
+            priors: Tensor,
+            gt_labels: Tensor,
+            ignore_mask: Optional[Tensor] = None) -> AssignResult:
+        """Assign w.r.t. the overlaps computed in tiles.
+
+        结果与 :meth:`assign_wrt_overlaps` 相同。第一遍分块计算 overlaps，
+        同时归约出每个 prior 和每个 GT 的最大值；``gt_max_assign_all`` 时再
+        分块计算一遍，找出与 GT 的最大 IoU 相等的 prior。内存中最多只有
+        ``overlaps_budget`` 个元素的 overlaps，没有限制时（sparse 模式的
+        回退）每块最多 ``DEFAULT_TILE_ELEMS`` 个元素。
+
+        Args:
+            gt_bboxes (Tensor): Boxes of k gts, shape (k, 4).
+            priors (Tensor): Boxes of n priors, shape (n, 4).
+            gt_labels (Tensor): Labels of k gt_bboxes, shape (k, ).
+            ignore_mask (Tensor, optional): Priors ignored, whose overlaps
+                with all gts are set to -1, shape (n, ).
+
+        Returns:
+            :obj:`AssignResult`: The assign result.
+        """
+        num_gts, num_bboxes = gt_bboxes.size(0), priors.size(0)
+        if num_gts == 0 or num_bboxes == 0:
+            return self.assign_wrt_overlaps(
+                priors.new_zeros((num_gts, num_bboxes)), gt_labels)
+
+        max_elems = self.overlaps_budget if self.overlaps_budget > 0 \
+            else DEFAULT_TILE_ELEMS
+
+        def iter_tiles():
+            for rows, cols, tile in iter_bbox_overlaps_tiles(
+                    gt_bboxes,
+                    priors,
+                    max_elems=max_elems,
+                    overlaps_fn=self.iou_calculator):
+                if ignore_mask is not None:
+                    tile[:, ignore_mask[cols]] = -1
+                yield rows, cols, tile
+
+        max_overlaps = priors.new_full((num_bboxes, ), -float('inf'))
+        argmax_overlaps = priors.new_zeros((num_bboxes, ), dtype=torch.long)
+        gt_max_overlaps = priors.new_full((num_gts, ), -float('inf'))
+        gt_argmax_overlaps = priors.new_zeros((num_gts, ), dtype=torch.long)
+        for rows, cols, tile in iter_tiles():
+            tile = tile.to(max_overlaps.dtype)
+            values, inds = tile.max(dim=0)
+            larger = values > max_overlaps[cols]
+            max_overlaps[cols] = torch.where(larger, values,
+                                             max_overlaps[cols])
+            argmax_overlaps[cols] = torch.where(larger, inds + rows.start,
+                                                argmax_overlaps[cols])
+            values, inds = tile.max(dim=1)
+            larger = values > gt_max_overlaps[rows]
+            gt_max_overlaps[rows] = torch.where(larger, values,
+                                                gt_max_overlaps[rows])
+            gt_argmax_overlaps[rows] = torch.where(larger, inds + cols.start,
+                                                   gt_argmax_overlaps[rows])
+
+        # low-quality matching, the later gt overwrites the earlier one
+        # as in the loop of `assign_wrt_overlaps`
+        low_quality_inds = None
+        if self.match_low_quality:
+            valid_gts = gt_max_overlaps >= self.min_pos_iou
+            low_quality_inds = argmax_overlaps.new_zeros((num_bboxes, ))
+            if self.gt_max_assign_all:
+                for rows, cols, tile in iter_tiles():
+                    gt_max = gt_max_overlaps[rows, None]
+                    is_max = (tile.to(gt_max.dtype) == gt_max) & \
+                        valid_gts[rows, None]
+                    gt_inds = torch.arange(
+                        rows.start + 1, rows.stop + 1,
+                        device=priors.device)[:, None]
+                    tile_inds, _ = (is_max.long() * gt_inds).max(dim=0)
+                    low_quality_inds[cols] = torch.maximum(
+                        low_quality_inds[cols], tile_inds)
+            else:
+                gt_inds = torch.arange(
+                    1, num_gts + 1, device=priors.device)[valid_gts]
+                low_quality_inds.scatter_reduce_(
+                    0, gt_argmax_overlaps[valid_gts], gt_inds, reduce='amax')
+
+        return self._assign_wrt_max_overlaps(max_overlaps, argmax_overlaps,
+                                             low_quality_inds, gt_labels,
+                                             num_gts)
+
+    def assign_wrt_boxes_sparse(
+            self,
+            gt_bboxes: Tensor,
+            priors: Tensor,
+            gt_labels: Tensor,
+            ignore_mask: Optional[Tensor] = None) -> AssignResult:
+        """Assign w.r.t. the overlaps of the intersecting pairs of gts and
+        priors.
+
+        结果与 :meth:`assign_wrt_overlaps` 相同。priors 按尺寸分桶后建立
+        均匀网格索引，每个 GT 只与覆盖到的格子中的 priors 计算 IoU（见
+        :func:`sparse_bbox_overlaps`），未计算的元素 IoU 为 0。每个 prior 和
+        每个 GT 的最大值都由框对 scatter 归约得到，并列时取最小的下标。
+
+        有 GT 与所有 priors 都不相交时，稠密计算的低质量匹配会把 IoU 为 0 的
+        priors 都分配给它，这种情况退回到分块计算，不会生成完整的 overlaps。
+
+        Args:
+            gt_bboxes (Tensor): Boxes of k gts, shape (k, 4).
+            priors (Tensor): Boxes of n priors, shape (n, 4).
+            gt_labels (Tensor): Labels of k gt_bboxes, shape (k, ).
+            ignore_mask (Tensor, optional): Priors ignored, whose overlaps
+                with all gts are set to -1, shape (n, ).
+
+        Returns:
+            :obj:`AssignResult`: The assign result.
+        """
+        num_gts, num_bboxes = gt_bboxes.size(0), priors.size(0)
+        if num_gts == 0 or num_bboxes == 0:
+            return self.assign_wrt_overlaps(
+                priors.new_zeros((num_gts, num_bboxes)), gt_labels)
+
+        gt_inds, prior_inds, overlaps = sparse_bbox_overlaps(
+            get_box_tensor(gt_bboxes),
+            get_box_tensor(priors),
+            overlaps_fn=self.iou_calculator)
+        if ignore_mask is not None:
+            overlaps[ignore_mask[prior_inds]] = -1
+
+        # 没有计算的元素为 0（忽略的 prior 为 -1，但只有所有 prior 都被忽略时
+        # 才会影响 GT 的最大值，此时 GT 的最大值 <= 0，退回分块计算）
+        gt_max_overlaps = overlaps.new_zeros((num_gts, )).scatter_reduce(
+            0, gt_inds, overlaps, reduce='amax')
+        if self.match_low_quality and (
+            (gt_max_overlaps <= 0) &
+            (gt_max_overlaps >= self.min_pos_iou)).any():
+            return self.assign_wrt_boxes_tiled(gt_bboxes, priors, gt_labels,
+                                               ignore_mask)
+
+        # for each prior, the max iou of all gts and the first gt reaching it
+        max_overlaps = overlaps.new_zeros((num_bboxes, )).scatter_reduce(
+            0, prior_inds, overlaps, reduce='amax')
+        if ignore_mask is not None:
+            max_overlaps[ignore_mask] = -1
+        is_max = overlaps == max_overlaps[prior_inds]
+        argmax_overlaps = prior_inds.new_full((num_bboxes, ), num_gts)
+        argmax_overlaps.scatter_reduce_(
+            0, prior_inds[is_max], gt_inds[is_max], reduce='amin')
+        argmax_overlaps[argmax_overlaps == num_gts] = 0
+
+        # low-quality matching, the later gt overwrites the earlier one
+        # as in the loop of `assign_wrt_overlaps`
+        low_quality_inds = None
+        if self.match_low_quality:
+            valid_gts = gt_max_overlaps >= self.min_pos_iou
+            is_gt_max = (overlaps == gt_max_overlaps[gt_inds]) & \
+                valid_gts[gt_inds]
+            low_quality_inds = prior_inds.new_zeros((num_bboxes, ))
+            if self.gt_max_assign_all:
+                low_quality_inds.scatter_reduce_(
+                    0, prior_inds[is_gt_max], gt_inds[is_gt_max] + 1,
+                    reduce='amax')
+            else:
+                # for each gt, the first prior reaching its max iou
+                gt_argmax_overlaps = gt_inds.new_full((num_gts, ),
+                                                      num_bboxes)
+                gt_argmax_overlaps.scatter_reduce_(
+                    0, gt_inds[is_gt_max], prior_inds[is_gt_max],
+                    reduce='amin')
+                valid_gts &= gt_argmax_overlaps < num_bboxes
+                gt_inds = torch.arange(
+                    1, num_gts + 1, device=priors.device)[valid_gts]
+                low_quality_inds.scatter_reduce_(
+                    0, gt_argmax_overlaps[valid_gts], gt_inds, reduce='amax')
+
+        return self._assign_wrt_max_overlaps(max_overlaps, argmax_overlaps,
+                                             low_quality_inds, gt_labels,
+                                             num_gts)
+
+    def _assign_wrt_max_overlaps(
+            self, max_overlaps: Tensor, argmax_overlaps: Tensor,
+            low_quality_inds: Optional[Tensor], gt_labels: Tensor,
+            num_gts: int) -> AssignResult:
+        """Assign w.r.t. the max overlaps of every prior reduced by
+        :meth:`assign_wrt_boxes_tiled` or :meth:`assign_wrt_boxes_sparse`.
+
+        Args:
+            max_overlaps (Tensor): The max overlaps of every prior with all
+                gts, shape (n, ).
+            argmax_overlaps (Tensor): The gt reaching ``max_overlaps``,
+                shape (n, ).
+            low_quality_inds (Tensor, optional): The 1-based gt assigned to
+                every prior by low-quality matching, 0 means none, shape
+                (n, ). None if ``match_low_quality`` is False.
+            gt_labels (Tensor): Labels of k gt_bboxes, shape (k, ).
+            num_gts (int): The number of gts.
+
+        Returns:
+            :obj:`AssignResult`: The assign result.
+        """
+        num_bboxes = max_overlaps.size(0)
+
+        # 1. assign -1 by default
+        assigned_gt_inds = max_overlaps.new_full((num_bboxes, ),
+                                                 -1,
+                                                 dtype=torch.long)
+
+        # 2. assign negative: below
+        if isinstance(self.neg_iou_thr, float):
+            assigned_gt_inds[(max_overlaps >= 0)
+                             & (max_overlaps < self.neg_iou_thr)] = 0
+        elif isinstance(self.neg_iou_thr, tuple):
+            assert len(self.neg_iou_thr) == 2
+            assigned_gt_inds[(max_overlaps >= self.neg_iou_thr[0])
+                             & (max_overlaps < self.neg_iou_thr[1])] = 0
+
+        # 3. assign positive: above positive IoU threshold
+        pos_inds = max_overlaps >= self.pos_iou_thr
+        assigned_gt_inds[pos_inds] = argmax_overlaps[pos_inds] + 1
+
+        # 4. low-quality matching overwrites the assignment of step 3
+        if low_quality_inds is not None:
+            assigned_gt_inds = torch.where(low_quality_inds > 0,
+                                           low_quality_inds, assigned_gt_inds)
+
+        assigned_labels = assigned_gt_inds.new_full((num_bboxes, ), -1)
+        pos_inds = torch.nonzero(
+            assigned_gt_inds > 0, as_tuple=False).squeeze()
+        if pos_inds.numel() > 0:
+            assigned_labels[pos_inds] = gt_labels[assigned_gt_inds[pos_inds] -
+                                                  1]
+
+        return AssignResult(
+            num_gts=num_gts,
+            gt_inds=assigned_gt_inds,
+            max_overlaps=max_overlaps,
+            labels=assigned_labels)
@@ -10,6 +10,7 @@ from torch.nn.modules.utils import _pair
 
 from mydet.registry import TASK_UTILS
 from mydet.structures.bbox import HorizontalBoxes
+from .utils import PriorCache, featmap_sizes_key
 
 DeviceType = Union[str, torch.device]
 
@@ -45,6 +46,9 @@ class AnchorGenerator:
             width and height. By default it is 0 in V2.0.
         use_box_type (bool): Whether to warp anchors with the box type data
             structure. Defaults to False.
+        cache_size (int): The maximum number of the multi-level anchors and
+            valid flags cached by :class:`PriorCache`, keyed by the feature
+            map sizes. 0 disables the cache. Defaults to 8.
 
     Examples:
         >>> from mydet.models.task_modules.
@@ -76,7 +80,8 @@ class AnchorGenerator:
                  scales_per_octave: Optional[int] = None,
                  centers: Optional[List[Tuple[float, float]]] = None,
                  center_offset: float = 0.,
-                 use_box_type: bool = False) -> None:
+                 use_box_type: bool = False,
+                 cache_size: int = 8) -> None:
         # check center and center_offset
         if center_offset != 0:
             assert centers is None, 'center cannot be set when center_offset' \
@@ -121,6 +126,7 @@ class AnchorGenerator:
         self.center_offset = center_offset
         self.base_anchors = self.gen_base_anchors()
         self.use_box_type = use_box_type
+        self.prior_cache = PriorCache(cache_size)
 
     @property
     def num_base_anchors(self) -> List[int]:
@@ -249,12 +255,17 @@ class AnchorGenerator:
                 num_base_anchors is the number of anchors for that level.
         """
         assert self.num_levels == len(featmap_sizes)
-        multi_level_anchors = []
-        for i in range(self.num_levels):
-            anchors = self.single_level_grid_priors(
-                featmap_sizes[i], level_idx=i, dtype=dtype, device=device)
-            multi_level_anchors.append(anchors)
-        return multi_level_anchors
+
+        def generate():
+            multi_level_anchors = []
+            for i in range(self.num_levels):
+                anchors = self.single_level_grid_priors(
+                    featmap_sizes[i], level_idx=i, dtype=dtype, device=device)
+                multi_level_anchors.append(anchors)
+            return multi_level_anchors
+
+        key = ('priors', featmap_sizes_key(featmap_sizes), dtype, str(device))
+        return self.prior_cache.get(key, generate)
 
     def single_level_grid_priors(self,
                                  featmap_size: Tuple[int, int],
@@ -429,19 +440,25 @@ class AnchorGenerator:
             list(torch.Tensor): Valid flags of anchors in multiple levels.
         """
         assert self.num_levels == len(featmap_sizes)
-        multi_level_flags = []
-        for i in range(self.num_levels):
-            anchor_stride = self.strides[i]
-            feat_h, feat_w = featmap_sizes[i]
-            h, w = pad_shape[:2]
-            valid_feat_h = min(int(np.ceil(h / anchor_stride[1])), feat_h)
-            valid_feat_w = min(int(np.ceil(w / anchor_stride[0])), feat_w)
-            flags = self.single_level_valid_flags((feat_h, feat_w),
-                                                  (valid_feat_h, valid_feat_w),
-                                                  self.num_base_anchors[i],
-                                                  device=device)
-            multi_level_flags.append(flags)
-        return multi_level_flags
+
+        def generate():
+            multi_level_flags = []
+            for i in range(self.num_levels):
+                anchor_stride = self.strides[i]
+                feat_h, feat_w = featmap_sizes[i]
+                h, w = pad_shape[:2]
+                valid_feat_h = min(int(np.ceil(h / anchor_stride[1])), feat_h)
+                valid_feat_w = min(int(np.ceil(w / anchor_stride[0])), feat_w)
+                flags = self.single_level_valid_flags(
+                    (feat_h, feat_w), (valid_feat_h, valid_feat_w),
+                    self.num_base_anchors[i],
+                    device=device)
+                multi_level_flags.append(flags)
+            return multi_level_flags
+
+        key = ('valid_flags', featmap_sizes_key(featmap_sizes),
+               tuple(pad_shape[:2]), str(device))
+        return self.prior_cache.get(key, generate)
 
     def single_level_valid_flags(self,
                                  featmap_size: Tuple[int, int],
@@ -516,6 +533,8 @@ class SSDAnchorGenerator(AnchorGenerator):
             same scales. It is always set to be False in SSD.
         use_box_type (bool): Whether to warp anchors with the box type data
             structure. Defaults to False.
+        cache_size (int): The maximum number of the cached multi-level
+            anchors and valid flags. Defaults to 8.
     """
 
     def __init__(self,
@@ -526,7 +545,8 @@ class SSDAnchorGenerator(AnchorGenerator):
                  basesize_ratio_range: Tuple[float] = (0.15, 0.9),
                  input_size: int = 300,
                  scale_major: bool = True,
-                 use_box_type: bool = False) -> None:
+                 use_box_type: bool = False,
+                 cache_size: int = 8) -> None:
         assert len(strides) == len(ratios)
         assert not (min_sizes is None) ^ (max_sizes is None)
         self.strides = [_pair(stride) for stride in strides]
@@ -598,6 +618,7 @@ class SSDAnchorGenerator(AnchorGenerator):
         self.center_offset = 0
         self.base_anchors = self.gen_base_anchors()
         self.use_box_type = use_box_type
+        self.prior_cache = PriorCache(cache_size)
 
     def gen_base_anchors(self) -> List[Tensor]:
         """Generate base anchors.
@@ -754,14 +775,16 @@ class LegacySSDAnchorGenerator(SSDAnchorGenerator, LegacyAnchorGenerator):
                  basesize_ratio_range: Tuple[float],
                  input_size: int = 300,
                  scale_major: bool = True,
-                 use_box_type: bool = False) -> None:
+                 use_box_type: bool = False,
+                 cache_size: int = 8) -> None:
         super(LegacySSDAnchorGenerator, self).__init__(
             strides=strides,
             ratios=ratios,
             basesize_ratio_range=basesize_ratio_range,
             input_size=input_size,
             scale_major=scale_major,
-            use_box_type=use_box_type)
+            use_box_type=use_box_type,
+            cache_size=cache_size)
         self.centers = [((stride - 1) / 2., (stride - 1) / 2.)
                         for stride in strides]
         self.base_anchors = self.gen_base_anchors()
@@ -776,12 +799,15 @@ class YOLOAnchorGenerator(AnchorGenerator):
             in multiple feature levels.
         base_sizes (list[list[tuple[int, int]]]): The basic sizes
             of anchors in multiple levels.
+        cache_size (int): The maximum number of the cached multi-level
+            anchors and valid flags. Defaults to 8.
     """
 
     def __init__(self,
                  strides: Union[List[int], List[Tuple[int, int]]],
                  base_sizes: List[List[Tuple[int, int]]],
-                 use_box_type: bool = False) -> None:
+                 use_box_type: bool = False,
+                 cache_size: int = 8) -> None:
         self.strides = [_pair(stride) for stride in strides]
         self.centers = [(stride[0] / 2., stride[1] / 2.)
                         for stride in self.strides]
@@ -793,6 +819,7 @@ class YOLOAnchorGenerator(AnchorGenerator):
                 [_pair(base_size) for base_size in base_sizes_per_level])
         self.base_anchors = self.gen_base_anchors()
         self.use_box_type = use_box_type
+        self.prior_cache = PriorCache(cache_size)
 
     @property
     def num_levels(self) -> int:
@@ -7,6 +7,7 @@ from torch import Tensor
 from torch.nn.modules.utils import _pair
 
 from mydet.registry import TASK_UTILS
+from .utils import PriorCache, featmap_sizes_key
 
 DeviceType = Union[str, torch.device]
 
@@ -98,13 +99,18 @@ class MlvlPointGenerator:
             in multiple feature levels in order (w, h).
         offset (float): The offset of points, the value is normalized with
             corresponding stride. Defaults to 0.5.
+        cache_size (int): The maximum number of the multi-level points and
+            valid flags cached by :class:`PriorCache`, keyed by the feature
+            map sizes. 0 disables the cache. Defaults to 8.
     """
 
     def __init__(self,
                  strides: Union[List[int], List[Tuple[int, int]]],
-                 offset: float = 0.5) -> None:
+                 offset: float = 0.5,
+                 cache_size: int = 8) -> None:
         self.strides = [_pair(stride) for stride in strides]
         self.offset = offset
+        self.prior_cache = PriorCache(cache_size)
 
     @property
     def num_levels(self) -> int:
@@ -159,16 +165,22 @@ class MlvlPointGenerator:
         """
 
         assert self.num_levels == len(featmap_sizes)
-        multi_level_priors = []
-        for i in range(self.num_levels):
-            priors = self.single_level_grid_priors(
-                featmap_sizes[i],
-                level_idx=i,
-                dtype=dtype,
-                device=device,
-                with_stride=with_stride)
-            multi_level_priors.append(priors)
-        return multi_level_priors
+
+        def generate():
+            multi_level_priors = []
+            for i in range(self.num_levels):
+                priors = self.single_level_grid_priors(
+                    featmap_sizes[i],
+                    level_idx=i,
+                    dtype=dtype,
+                    device=device,
+                    with_stride=with_stride)
+                multi_level_priors.append(priors)
+            return multi_level_priors
+
+        key = ('priors', featmap_sizes_key(featmap_sizes), dtype, str(device),
+               with_stride)
+        return self.prior_cache.get(key, generate)
 
     def single_level_grid_priors(self,
                                  featmap_size: Tuple[int],
@@ -247,18 +259,24 @@ class MlvlPointGenerator:
             list(torch.Tensor): Valid flags of points of multiple levels.
         """
         assert self.num_levels == len(featmap_sizes)
-        multi_level_flags = []
-        for i in range(self.num_levels):
-            point_stride = self.strides[i]
-            feat_h, feat_w = featmap_sizes[i]
-            h, w = pad_shape[:2]
-            valid_feat_h = min(int(np.ceil(h / point_stride[1])), feat_h)
-            valid_feat_w = min(int(np.ceil(w / point_stride[0])), feat_w)
-            flags = self.single_level_valid_flags((feat_h, feat_w),
-                                                  (valid_feat_h, valid_feat_w),
-                                                  device=device)
-            multi_level_flags.append(flags)
-        return multi_level_flags
+
+        def generate():
+            multi_level_flags = []
+            for i in range(self.num_levels):
+                point_stride = self.strides[i]
+                feat_h, feat_w = featmap_sizes[i]
+                h, w = pad_shape[:2]
+                valid_feat_h = min(int(np.ceil(h / point_stride[1])), feat_h)
+                valid_feat_w = min(int(np.ceil(w / point_stride[0])), feat_w)
+                flags = self.single_level_valid_flags(
+                    (feat_h, feat_w), (valid_feat_h, valid_feat_w),
+                    device=device)
+                multi_level_flags.append(flags)
+            return multi_level_flags
+
+        key = ('valid_flags', featmap_sizes_key(featmap_sizes),
+               tuple(pad_shape[:2]), str(device))
+        return self.prior_cache.get(key, generate)
 
     def single_level_valid_flags(self,
                                  featmap_size: Tuple[int, int],
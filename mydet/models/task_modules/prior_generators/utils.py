@@ -1,5 +1,6 @@
 # Copyright (c) OpenMMLab. All rights reserved.
-from typing import Optional, Tuple
+from collections import OrderedDict
+from typing import Callable, Hashable, List, Optional, Sequence, Tuple
 
 import torch
 from torch import Tensor
@@ -68,3 +69,58 @@ def calc_region(bbox: Tensor,
         x2 = x2.clamp(min=0, max=featmap_size[1])
         y2 = y2.clamp(min=0, max=featmap_size[0])
     return (x1, y1, x2, y2)
+
+
+def featmap_sizes_key(featmap_sizes: Sequence) -> tuple:
+    """Convert the feature map sizes (tuples, ``torch.Size`` or tensors) to a
+    hashable key of :class:`PriorCache`."""
+    return tuple(tuple(int(s) for s in size) for size in featmap_sizes)
+
+
+class PriorCache:
+    """A bounded LRU cache of the multi-level priors or valid flags.
+
+    推理时输入尺寸通常只有少数几种，同样的特征图尺寸每次 forward 都重新
+    生成一遍 priors 没有必要。缓存以 (特征图尺寸, dtype, device, ...) 为
+    key，最多保存 ``max_size`` 项，超出时丢弃最久未使用的一项。导出 ONNX
+    或 trace 时不使用缓存。
+
+    缓存的张量被所有调用者共享，调用者不能原地修改返回的 priors。
+
+    Args:
+        max_size (int): The maximum number of the cached items. 0 disables
+            the cache. Defaults to 8.
+    """
+
+    def __init__(self, max_size: int = 8) -> None:
+        self.max_size = max_size
+        self._cache = OrderedDict()
+
+    def get(self, key: Hashable, generate: Callable[[], List]) -> List:
+        """Get the cached list of ``key``, or generate and cache it.
+
+        Args:
+            key (Hashable): The key of the priors.
+            generate (Callable): Generate the priors when ``key`` is not
+                cached.
+
+        Returns:
+            list: A new list of the cached tensors.
+        """
+        if self.max_size <= 0 or torch.onnx.is_in_onnx_export() or \
+                torch.jit.is_tracing():
+            return generate()
+        if key in self._cache:
+            self._cache.move_to_end(key)
+        else:
+            self._cache[key] = generate()
+            if len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        return list(self._cache[key])
+
+    def clear(self) -> None:
+        """Clear the cache."""
+        self._cache.clear()
+
+    def __len__(self) -> int:
+        return len(self._cache)
@@ -5,7 +5,8 @@ from .gaussian_target import (gather_feat, gaussian_radius,
 from .image import imrenormalize
 from .make_divisible import make_divisible
 from .misc import (aligned_bilinear, center_of_mass, empty_instances,
-                   filter_gt_instances, filter_scores_and_topk, flip_tensor,
+                   filter_gt_instances, filter_scores_and_segment_topk,
+                   filter_scores_and_topk, flip_tensor,
                    generate_coordinate, images_to_levels, interpolate_as,
                    levels_to_images, mask2ndarray, multi_apply,
                    relative_coordinate_maps, rename_loss_dict,
@@ -23,7 +24,8 @@ __all__ = [
     'interpolate_as', 'sigmoid_geometric_mean', 'gather_feat',
     'preprocess_panoptic_gt', 'get_uncertain_point_coords_with_randomness',
     'get_uncertainty', 'unpack_gt_instances', 'empty_instances',
-    'center_of_mass', 'filter_scores_and_topk', 'flip_tensor',
+    'center_of_mass', 'filter_scores_and_topk',
+    'filter_scores_and_segment_topk', 'flip_tensor',
     'generate_coordinate', 'levels_to_images', 'mask2ndarray', 'multi_apply',
     'select_single_mlvl', 'unmap', 'images_to_levels',
     'samplelist_boxtype2tensor', 'filter_gt_instances', 'rename_loss_dict',
@@ -354,6 +354,61 @@ def filter_scores_and_topk(scores, score_thr, topk, results=None):
     return scores, labels, keep_idxs, filtered_results
 
 
+def filter_scores_and_segment_topk(scores, score_thr, topk, segment_ids):
+    """Filter the scores of a batch using score threshold and topk
+    candidates of every segment.
+
+    与对每张图片的每个 segment（通常是 FPN 的一层）分别调用
+    :func:`filter_scores_and_topk` 的结果相同，但只做一次阈值过滤和两次
+    排序：先按分数降序排序，再按 segment 稳定排序，每个 segment 内的名次
+    小于 ``topk`` 的候选被保留。
+
+    Args:
+        scores (Tensor): The scores, shape (num_imgs, num_bboxes, K).
+        score_thr (float): The score filter threshold.
+        topk (int): The number of topk candidates of every segment of every
+            image. -1 means no limit.
+        segment_ids (Tensor): The segment (level) of each bbox, shape
+            (num_bboxes, ).
+
+    Returns:
+        tuple: Filtered results
+
+            - scores (Tensor): The scores after being filtered, \
+                shape (num_bboxes_filtered, ).
+            - labels (Tensor): The class labels, shape \
+                (num_bboxes_filtered, ).
+            - img_idxs (Tensor): The image indexes, shape \
+                (num_bboxes_filtered, ).
+            - anchor_idxs (Tensor): The anchor indexes, shape \
+                (num_bboxes_filtered, ).
+    """
+    valid_mask = scores > score_thr
+    scores = scores[valid_mask]
+    img_idxs, anchor_idxs, labels = valid_mask.nonzero(as_tuple=True)
+
+    if topk > 0:
+        num_segments = int(segment_ids.max()) + 1
+        scores, order = scores.sort(descending=True)
+        segments = img_idxs[order] * num_segments + \
+            segment_ids[anchor_idxs[order]]
+        # 稳定排序，每个 segment 内依然按分数降序
+        segments, segment_order = segments.sort(stable=True)
+        order = order[segment_order]
+        scores = scores[segment_order]
+        counts = torch.bincount(segments)
+        starts = torch.cumsum(counts, 0) - counts
+        rank = torch.arange(
+            segments.size(0), device=segments.device) - starts[segments]
+        keep = rank < topk
+        scores = scores[keep]
+        order = order[keep]
+        img_idxs = img_idxs[order]
+        anchor_idxs = anchor_idxs[order]
+        labels = labels[order]
+    return scores, labels, img_idxs, anchor_idxs
+
+
 def center_of_mass(mask, esp=1e-6):
     """Calculate the centroid coordinates of the mask.
 
@@ -1,5 +1,8 @@
 from .base_boxes import BaseBoxes
-from .bbox_overlaps import bbox_overlaps
+from .bbox_overlaps import (bbox_overlaps, bbox_overlaps_max,
+                            dequantize_overlaps, grid_candidate_pairs,
+                            iter_bbox_overlaps_tiles, sparse_bbox_overlaps,
+                            tiled_bbox_overlaps)
 from .box_type import (autocast_box_type, convert_box_type, get_box_type,
                        register_box, register_box_converter)
 from .horizontal_boxes import HorizontalBoxes
@@ -20,5 +23,7 @@ __all__ = [
     'BaseBoxes', 'convert_box_type', 'get_box_type', 'register_box',
     'register_box_converter', 'HorizontalBoxes', 'autocast_box_type',
     'cat_boxes', 'stack_boxes', 'scale_boxes', 'get_box_wh', 'get_box_tensor',
-    'empty_box_as', 'bbox_xyxy_to_cxcyah', 'bbox_cxcyah_to_xyxy'
+    'empty_box_as', 'bbox_xyxy_to_cxcyah', 'bbox_cxcyah_to_xyxy',
+    'tiled_bbox_overlaps', 'bbox_overlaps_max', 'iter_bbox_overlaps_tiles',
+    'dequantize_overlaps', 'grid_candidate_pairs', 'sparse_bbox_overlaps'
 ]
\ No newline at end of file
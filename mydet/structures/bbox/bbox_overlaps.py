@@ -0,0 +1,549 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import torch
+from torch import Tensor
+
+# 分块计算时，一块 overlaps 最多包含的元素个数，float32 时为 64MB
+DEFAULT_TILE_ELEMS = 1 << 24
+
+# 量化输出的缩放系数，iou/iof 在 [0, 1] 内，giou 在 [-1, 1] 内
+_QUANT_DTYPES = {
+    'iou': (torch.uint8, 255.),
+    'iof': (torch.uint8, 255.),
+    'giou': (torch.int8, 127.),
+}
+
+
+def fp16_clamp(x, min=None, max=None):
+    if not x.is_cuda and x.dtype == torch.float16:
+        # clamp for cpu float16, tensor fp16 has no clamp implementation
+        return x.float().clamp(min, max).half()
+
+    return x.clamp(min, max)
+
+
+def bbox_overlaps(bboxes1, bboxes2, mode='iou', is_aligned=False, eps=1e-6):
+    """Calculate overlap between two set of bboxes.
+
+    FP16 Contributed by https://github.com/open-mmlab/mmdetection/pull/4889
+    Note:
+        Assume bboxes1 is M x 4, bboxes2 is N x 4, when mode is 'iou',
+        there are some new generated variable when calculating IOU
+        using bbox_overlaps function:
+
+        1) is_aligned is False
+            area1: M x 1
+            area2: N x 1
+            lt: M x N x 2
+            rb: M x N x 2
+            wh: M x N x 2
+            overlap: M x N x 1
+            union: M x N x 1
+            ious: M x N x 1
+
+            Total memory:
+                S = (9 x N x M + N + M) * 4 Byte,
+
+            When using FP16, we can reduce:
+                R = (9 x N x M + N + M) * 4 / 2 Byte
+                R large than (N + M) * 4 * 2 is always true when N and M >= 1.
+                Obviously, N + M <= N * M < 3 * N * M, when N >=2 and M >=2,
+                           N + 1 < 3 * N, when N or M is 1.
+
+            Given M = 40 (ground truth), N = 400000 (three anchor boxes
+            in per grid, FPN, R-CNNs),
+                R = 275 MB (one times)
+
+            A special case (dense detection), M = 512 (ground truth),
+                R = 3516 MB = 3.43 GB
+
+            When the batch size is B, reduce:
+                B x R
+
+            Therefore, CUDA memory runs out frequently.
+
+            Experiments on GeForce RTX 2080Ti (11019 MiB):
+
+            |   dtype   |   M   |   N   |   Use    |   Real   |   Ideal   |
+            |:----:|:----:|:----:|:----:|:----:|:----:|
+            |   FP32   |   512 | 400000 | 8020 MiB |   --   |   --   |
+            |   FP16   |   512 | 400000 |   4504 MiB | 3516 MiB | 3516 MiB |
+            |   FP32   |   40 | 400000 |   1540 MiB |   --   |   --   |
+            |   FP16   |   40 | 400000 |   1264 MiB |   276MiB   | 275 MiB |
+
+        2) is_aligned is True
+            area1: N x 1
+            area2: N x 1
+            lt: N x 2
+            rb: N x 2
+            wh: N x 2
+            overlap: N x 1
+            union: N x 1
+            ious: N x 1
+
+            Total memory:
+                S = 11 x N * 4 Byte
+
+            When using FP16, we can reduce:
+                R = 11 x N * 4 / 2 Byte
+
+        So do the 'giou' (large than 'iou').
+
+        Time-wise, FP16 is generally faster than FP32.
+
+        When gpu_assign_thr is not -1, it takes more time on cpu
+        but not reduce memory.
+        There, we can reduce half the memory and keep the speed.
+
+        当 M x N 很大时（例如密集场景中 500 个 GT 和 20 万个 anchor），使用
+        :func:`tiled_bbox_overlaps` 或 :func:`bbox_overlaps_max` 分块计算。
+
+    If ``is_aligned`` is ``False``, then calculate the overlaps between each
+    bbox of bboxes1 and bboxes2, otherwise the overlaps between each aligned
+    pair of bboxes1 and bboxes2.
+
+    Args:
+        bboxes1 (Tensor): shape (B, m, 4) in <x1, y1, x2, y2> format or empty.
+        bboxes2 (Tensor): shape (B, n, 4) in <x1, y1, x2, y2> format or empty.
+            B indicates the batch dim, in shape (B1, B2, ..., Bn).
+            If ``is_aligned`` is ``True``, then m and n must be equal.
+        mode (str): "iou" (intersection over union), "iof" (intersection over
+            foreground) or "giou" (generalized intersection over union).
+            Default "iou".
+        is_aligned (bool, optional): If True, then m and n must be equal.
+            Default False.
+        eps (float, optional): A value added to the denominator for numerical
+            stability. Default 1e-6.
+
+    Returns:
+        Tensor: shape (m, n) if ``is_aligned`` is False else shape (m,)
+
+    Example:
+        >>> bboxes1 = torch.FloatTensor([
+        >>>     [0, 0, 10, 10],
+        >>>     [10, 10, 20, 20],
+        >>>     [32, 32, 38, 42],
+        >>> ])
+        >>> bboxes2 = torch.FloatTensor([
+        >>>     [0, 0, 10, 20],
+        >>>     [0, 10, 10, 19],
+        >>>     [10, 10, 20, 20],
+        >>> ])
+        >>> overlaps = bbox_overlaps(bboxes1, bboxes2)
+        >>> assert overlaps.shape == (3, 3)
+        >>> overlaps = bbox_overlaps(bboxes1, bboxes2, is_aligned=True)
+        >>> assert overlaps.shape == (3, )
+
+    Example:
+        >>> empty = torch.empty(0, 4)
+        >>> nonempty = torch.FloatTensor([[0, 0, 10, 9]])
+        >>> assert tuple(bbox_overlaps(empty, nonempty).shape) == (0, 1)
+        >>> assert tuple(bbox_overlaps(nonempty, empty).shape) == (1, 0)
+        >>> assert tuple(bbox_overlaps(empty, empty).shape) == (0, 0)
+    """
+
+    assert mode in ['iou', 'iof', 'giou'], f'Unsupported mode {mode}'
+    # Either the boxes are empty or the length of boxes' last dimension is 4
+    assert (bboxes1.size(-1) == 4 or bboxes1.size(0) == 0)
+    assert (bboxes2.size(-1) == 4 or bboxes2.size(0) == 0)
+
+    # Batch dim must be the same
+    # Batch dim: (B1, B2, ... Bn)
+    assert bboxes1.shape[:-2] == bboxes2.shape[:-2]
+    batch_shape = bboxes1.shape[:-2]
+
+    rows = bboxes1.size(-2)
+    cols = bboxes2.size(-2)
+    if is_aligned:
+        assert rows == cols
+
+    if rows * cols == 0:
+        if is_aligned:
+            return bboxes1.new(batch_shape + (rows, ))
+        else:
+            return bboxes1.new(batch_shape + (rows, cols))
+
+    area1 = (bboxes1[..., 2] - bboxes1[..., 0]) * (
+        bboxes1[..., 3] - bboxes1[..., 1])
+    area2 = (bboxes2[..., 2] - bboxes2[..., 0]) * (
+        bboxes2[..., 3] - bboxes2[..., 1])
+
+    if is_aligned:
+        lt = torch.max(bboxes1[..., :2], bboxes2[..., :2])  # [B, rows, 2]
+        rb = torch.min(bboxes1[..., 2:], bboxes2[..., 2:])  # [B, rows, 2]
+
+        wh = fp16_clamp(rb - lt, min=0)
+        overlap = wh[..., 0] * wh[..., 1]
+
+        if mode in ['iou', 'giou']:
+            union = area1 + area2 - overlap
+        else:
+            union = area1
+        if mode == 'giou':
+            enclosed_lt = torch.min(bboxes1[..., :2], bboxes2[..., :2])
+            enclosed_rb = torch.max(bboxes1[..., 2:], bboxes2[..., 2:])
+    else:
+        lt = torch.max(bboxes1[..., :, None, :2],
+                       bboxes2[..., None, :, :2])  # [B, rows, cols, 2]
+        rb = torch.min(bboxes1[..., :, None, 2:],
+                       bboxes2[..., None, :, 2:])  # [B, rows, cols, 2]
+
+        wh = fp16_clamp(rb - lt, min=0)
+        overlap = wh[..., 0] * wh[..., 1]
+
+        if mode in ['iou', 'giou']:
+            union = area1[..., None] + area2[..., None, :] - overlap
+        else:
+            union = area1[..., None]
+        if mode == 'giou':
+            enclosed_lt = torch.min(bboxes1[..., :, None, :2],
+                                    bboxes2[..., None, :, :2])
+            enclosed_rb = torch.max(bboxes1[..., :, None, 2:],
+                                    bboxes2[..., None, :, 2:])
+
+    eps = union.new_tensor([eps])
+    union = torch.max(union, eps)
+    ious = overlap / union
+    if mode in ['iou', 'iof']:
+        return ious
+    # calculate gious
+    enclose_wh = fp16_clamp(enclosed_rb - enclosed_lt, min=0)
+    enclose_area = enclose_wh[..., 0] * enclose_wh[..., 1]
+    enclose_area = torch.max(enclose_area, eps)
+    gious = ious - (enclose_area - union) / enclose_area
+    return gious
+
+
+def _tile_shape(rows: int, cols: int, max_elems: int) -> Tuple[int, int]:
+    """Get the (rows, cols) of a tile with at most ``max_elems`` elements.
+
+    优先整行分块，每块只有一个列区间，按行的归约不需要跨块合并。
+    """
+    tile_cols = max(1, min(cols, max_elems))
+    tile_rows = max(1, min(rows, max_elems // tile_cols))
+    return tile_rows, tile_cols
+
+
+def iter_bbox_overlaps_tiles(
+    bboxes1: Tensor,
+    bboxes2: Tensor,
+    mode: str = 'iou',
+    eps: float = 1e-6,
+    max_elems: int = DEFAULT_TILE_ELEMS,
+    overlaps_fn: Optional[Callable] = None
+) -> Iterator[Tuple[slice, slice, Tensor]]:
+    """Compute the overlaps between two sets of bboxes tile by tile.
+
+    Args:
+        bboxes1 (Tensor): shape (m, 4) in <x1, y1, x2, y2> format.
+        bboxes2 (Tensor): shape (n, 4) in <x1, y1, x2, y2> format.
+        mode (str): "iou", "iof" or "giou". Default "iou".
+        eps (float): A value added to the denominator for numerical
+            stability. Default 1e-6.
+        max_elems (int): The maximum number of elements of a tile.
+        overlaps_fn (Callable, optional): Called as
+            ``overlaps_fn(bboxes1, bboxes2, mode=mode)`` to compute a tile,
+            e.g. a ``BboxOverlaps2D``. Default :func:`bbox_overlaps`.
+
+    Yields:
+        tuple[slice, slice, Tensor]: The rows and columns of the tile in the
+        full (m, n) matrix, and the overlaps of the tile.
+    """
+    assert bboxes1.dim() == 2 and bboxes2.dim() == 2, \
+        'only 2D bboxes can be computed in tiles'
+    rows, cols = bboxes1.size(0), bboxes2.size(0)
+    tile_rows, tile_cols = _tile_shape(rows, cols, max_elems)
+    for r in range(0, rows, tile_rows):
+        row_slice = slice(r, min(r + tile_rows, rows))
+        for c in range(0, cols, tile_cols):
+            col_slice = slice(c, min(c + tile_cols, cols))
+            if overlaps_fn is None:
+                tile = bbox_overlaps(
+                    bboxes1[row_slice], bboxes2[col_slice], mode, eps=eps)
+            else:
+                tile = overlaps_fn(
+                    bboxes1[row_slice], bboxes2[col_slice], mode=mode)
+            yield row_slice, col_slice, tile
+
+
+def tiled_bbox_overlaps(bboxes1: Tensor,
+                        bboxes2: Tensor,
+                        mode: str = 'iou',
+                        is_aligned: bool = False,
+                        eps: float = 1e-6,
+                        max_elems: int = DEFAULT_TILE_ELEMS,
+                        out_dtype: Optional[str] = None,
+                        overlaps_fn: Optional[Callable] = None) -> Tensor:
+    """Calculate the same overlaps as :func:`bbox_overlaps` in tiles.
+
+    The intermediate tensors of :func:`bbox_overlaps` (about 9 times the size
+    of the result) are bounded by ``max_elems``, only the result and one tile
+    are in memory at the same time. The result can be further stored in
+    ``float16`` or quantized to 8-bit integers.
+
+    Args:
+        bboxes1 (Tensor): shape (m, 4) in <x1, y1, x2, y2> format.
+        bboxes2 (Tensor): shape (n, 4) in <x1, y1, x2, y2> format.
+        mode (str): "iou", "iof" or "giou". Default "iou".
+        is_aligned (bool): If True, then m and n must be equal.
+            Default False.
+        eps (float): A value added to the denominator for numerical
+            stability. Default 1e-6.
+        max_elems (int): The maximum number of elements of a tile. Default
+            ``DEFAULT_TILE_ELEMS``.
+        out_dtype (str, optional): ``'fp16'`` stores the result in float16,
+            ``'int8'`` quantizes iou / iof to uint8 (scale 255) and giou to
+            int8 (scale 127), see :func:`dequantize_overlaps`. Default None,
+            the dtype of the boxes.
+        overlaps_fn (Callable, optional): See
+            :func:`iter_bbox_overlaps_tiles`.
+
+    Returns:
+        Tensor: shape (m, n) if ``is_aligned`` is False else shape (m,)
+    """
+    assert out_dtype in (None, 'fp16', 'int8'), \
+        f'Unsupported out_dtype {out_dtype}'
+    if is_aligned:
+        assert bboxes1.size(0) == bboxes2.size(0)
+        rows = bboxes1.size(0)
+        # 对齐时中间变量的大小与行数成正比，按行分块
+        chunks = [
+            bbox_overlaps(
+                bboxes1[r:r + max_elems],
+                bboxes2[r:r + max_elems],
+                mode,
+                is_aligned=True,
+                eps=eps) for r in range(0, rows, max_elems)
+        ]
+        overlaps = torch.cat(chunks) if chunks else bboxes1.new_zeros((0, ))
+        return _cast_overlaps(overlaps, mode, out_dtype)
+
+    if out_dtype is None:
+        dtype = bboxes1.dtype
+    elif out_dtype == 'fp16':
+        dtype = torch.float16
+    else:
+        dtype = _QUANT_DTYPES[mode][0]
+    overlaps = bboxes1.new_empty((bboxes1.size(0), bboxes2.size(0)),
+                                 dtype=dtype)
+    for row_slice, col_slice, tile in iter_bbox_overlaps_tiles(
+            bboxes1, bboxes2, mode, eps, max_elems, overlaps_fn):
+        overlaps[row_slice, col_slice] = _cast_overlaps(tile, mode, out_dtype)
+    return overlaps
+
+
+def _cast_overlaps(overlaps: Tensor, mode: str,
+                   out_dtype: Optional[str]) -> Tensor:
+    if out_dtype is None:
+        return overlaps
+    if out_dtype == 'fp16':
+        return overlaps.half()
+    dtype, scale = _QUANT_DTYPES[mode]
+    return (overlaps.float() * scale).round_().to(dtype)
+
+
+def dequantize_overlaps(overlaps: Tensor, mode: str = 'iou') -> Tensor:
+    """Convert the overlaps quantized by ``out_dtype='int8'`` back to
+    float32."""
+    dtype, scale = _QUANT_DTYPES[mode]
+    assert overlaps.dtype == dtype
+    return overlaps.float() / scale
+
+
+def _update_max(cur_values: Tensor, cur_inds: Tensor, values: Tensor,
+                inds: Tensor) -> None:
+    """Update the running maximum in-place. Only strictly larger values
+    replace the current ones, so ties keep the smallest index like
+    ``Tensor.max``."""
+    larger = values > cur_values
+    cur_values[larger] = values[larger]
+    cur_inds[larger] = inds[larger]
+
+
+def bbox_overlaps_max(
+    bboxes1: Tensor,
+    bboxes2: Tensor,
+    mode: str = 'iou',
+    dims: Union[int, Sequence[int]] = (0, 1),
+    eps: float = 1e-6,
+    max_elems: int = DEFAULT_TILE_ELEMS,
+    overlaps_fn: Optional[Callable] = None
+) -> Union[Tuple[Tensor, Tensor], List[Tuple[Tensor, Tensor]]]:
+    """Max and argmax of the overlaps along one or both dims, computed in
+    tiles without materializing the (m, n) matrix.
+
+    Args:
+        bboxes1 (Tensor): shape (m, 4) in <x1, y1, x2, y2> format.
+        bboxes2 (Tensor): shape (n, 4) in <x1, y1, x2, y2> format.
+        mode (str): "iou", "iof" or "giou". Default "iou".
+        dims (int | Sequence[int]): The dims to reduce, 0 reduces over
+            ``bboxes1`` (the result has n elements), 1 reduces over
+            ``bboxes2``. Default (0, 1).
+        eps (float): A value added to the denominator for numerical
+            stability. Default 1e-6.
+        max_elems (int): The maximum number of elements of a tile.
+        overlaps_fn (Callable, optional): See
+            :func:`iter_bbox_overlaps_tiles`.
+
+    Returns:
+        tuple[Tensor, Tensor] | list[tuple[Tensor, Tensor]]: The max values
+        and indices, the same as ``bbox_overlaps(...).max(dim)``, for each
+        dim in ``dims``. If the reduced dim is empty, the values are 0 and
+        the indices are -1.
+
+    Example:
+        >>> bboxes1 = torch.FloatTensor([[0, 0, 10, 10], [10, 10, 20, 20]])
+        >>> bboxes2 = torch.FloatTensor([[0, 0, 10, 20], [10, 10, 20, 20]])
+        >>> (v0, i0), (v1, i1) = bbox_overlaps_max(bboxes1, bboxes2,
+        >>>                                        max_elems=1)
+        >>> assert i0.tolist() == [0, 1] and i1.tolist() == [0, 1]
+    """
+    single = isinstance(dims, int)
+    dims = [dims] if single else list(dims)
+    assert all(dim in (0, 1) for dim in dims)
+    sizes = (bboxes2.size(0), bboxes1.size(0))
+    results = [[
+        bboxes1.new_full((sizes[dim], ), -float('inf')),
+        bboxes1.new_full((sizes[dim], ), -1, dtype=torch.long)
+    ] for dim in dims]
+
+    for row_slice, col_slice, tile in iter_bbox_overlaps_tiles(
+            bboxes1, bboxes2, mode, eps, max_elems, overlaps_fn):
+        for dim, (values, inds) in zip(dims, results):
+            tile_values, tile_inds = tile.max(dim=dim)
+            if dim == 0:
+                _update_max(values[col_slice], inds[col_slice],
+                            tile_values.to(values.dtype),
+                            tile_inds + row_slice.start)
+            else:
+                _update_max(values[row_slice], inds[row_slice],
+                            tile_values.to(values.dtype),
+                            tile_inds + col_slice.start)
+
+    for values, inds in results:
+        # 被归约的维度为空时没有任何 tile
+        values[inds < 0] = 0
+    results = [tuple(result) for result in results]
+    return results[0] if single else results
+
+
+def _arange_segments(counts: Tensor) -> Tuple[Tensor, Tensor]:
+    """Segment index and index within the segment of every element when
+    ``counts[i]`` elements are enumerated for each segment ``i``."""
+    segments = torch.repeat_interleave(
+        torch.arange(counts.size(0), device=counts.device), counts)
+    starts = torch.cumsum(counts, 0) - counts
+    local = torch.arange(
+        segments.size(0), device=counts.device) - starts[segments]
+    return segments, local
+
+
+def grid_candidate_pairs(bboxes1: Tensor,
+                         bboxes2: Tensor) -> Tuple[Tensor, Tensor]:
+    """Enumerate the pairs of bboxes that may intersect with a uniform grid
+    index.
+
+    ``bboxes2`` 按尺寸分桶（通常对应 FPN 的不同层），桶 ``b`` 中的框边长不
+    超过 ``s = 2**b``，按左上角落在边长为 ``s`` 的网格中的哪个格子建立索引。
+    这样的框只会覆盖所在格子和右、下相邻的格子，与 ``bboxes1`` 中的一个框
+    相交时，格子的列号一定在 ``[floor(x1 / s) - 1, floor(x2 / s)]`` 内，行号
+    同理。每个 ``bboxes1`` 的框只需要与这些格子中的框计算 overlaps。
+    格子边长是 2 的幂，坐标除以 ``s`` 没有舍入误差。
+
+    没有列出的框对交集面积一定为 0，列出的框对不一定相交。
+
+    Args:
+        bboxes1 (Tensor): shape (m, 4) in <x1, y1, x2, y2> format.
+        bboxes2 (Tensor): shape (n, 4) in <x1, y1, x2, y2> format.
+
+    Returns:
+        tuple[Tensor, Tensor]: The indices in ``bboxes1`` and ``bboxes2`` of
+        the candidate pairs, each has shape (k, ).
+    """
+    device = bboxes1.device
+    inds1, inds2 = [], []
+    if bboxes1.size(0) == 0 or bboxes2.size(0) == 0:
+        empty = torch.zeros((0, ), dtype=torch.long, device=device)
+        return empty, empty.clone()
+
+    bboxes1 = bboxes1[:, :4].float()
+    bboxes2 = bboxes2[:, :4].float()
+    sizes = torch.maximum(bboxes2[:, 2] - bboxes2[:, 0],
+                          bboxes2[:, 3] - bboxes2[:, 1]).clamp(min=1)
+    buckets = torch.log2(sizes).ceil().long()
+    for bucket in buckets.unique().tolist():
+        bucket_inds = torch.nonzero(buckets == bucket, as_tuple=True)[0]
+        cell_size = float(2**bucket)
+        boxes = bboxes2[bucket_inds]
+        origin = boxes[:, :2].min(dim=0).values
+
+        # 1. 按左上角所在的格子排序，得到每个格子中的框
+        cells_xy = ((boxes[:, :2] - origin) / cell_size).floor().long()
+        num_x, num_y = (cells_xy.max(dim=0).values + 1).tolist()
+        cells = cells_xy[:, 1] * num_x + cells_xy[:, 0]
+        cells, order = cells.sort()
+        bucket_inds = bucket_inds[order]
+        cell_counts = torch.bincount(cells, minlength=num_x * num_y)
+        cell_starts = torch.cumsum(cell_counts, 0) - cell_counts
+
+        # 2. bboxes1 的每个框覆盖的格子范围
+        lo = ((bboxes1[:, :2] - origin) / cell_size).floor().long() - 1
+        hi = ((bboxes1[:, 2:] - origin) / cell_size).floor().long()
+        lo[:, 0].clamp_(min=0)
+        lo[:, 1].clamp_(min=0)
+        hi[:, 0].clamp_(max=num_x - 1)
+        hi[:, 1].clamp_(max=num_y - 1)
+        spans = (hi - lo + 1).clamp(min=0)
+        box_inds, local = _arange_segments(spans[:, 0] * spans[:, 1])
+        span_x = spans[box_inds, 0]
+        cell_x = lo[box_inds, 0] + local % span_x
+        cell_y = lo[box_inds, 1] + torch.div(
+            local, span_x, rounding_mode='floor')
+        cells = cell_y * num_x + cell_x
+
+        # 3. 展开成 (bboxes1, bboxes2) 的框对
+        pair_cells, local = _arange_segments(cell_counts[cells])
+        inds1.append(box_inds[pair_cells])
+        inds2.append(bucket_inds[cell_starts[cells[pair_cells]] + local])
+    return torch.cat(inds1), torch.cat(inds2)
+
+
+def sparse_bbox_overlaps(
+        bboxes1: Tensor,
+        bboxes2: Tensor,
+        mode: str = 'iou',
+        eps: float = 1e-6,
+        overlaps_fn: Optional[Callable] = None
+) -> Tuple[Tensor, Tensor, Tensor]:
+    """Compute the overlaps of the intersecting pairs of bboxes only.
+
+    框对由 :func:`grid_candidate_pairs` 给出，只返回 overlaps 大于 0 的
+    框对，其余元素的 iou/iof 都为 0。不支持 giou。
+
+    Args:
+        bboxes1 (Tensor): shape (m, 4) in <x1, y1, x2, y2> format.
+        bboxes2 (Tensor): shape (n, 4) in <x1, y1, x2, y2> format.
+        mode (str): "iou" or "iof". Default "iou".
+        eps (float): A value added to the denominator for numerical
+            stability. Default 1e-6.
+        overlaps_fn (Callable, optional): Called as
+            ``overlaps_fn(bboxes1, bboxes2, mode=mode, is_aligned=True)``,
+            e.g. a ``BboxOverlaps2D``. Default :func:`bbox_overlaps`.
+
+    Returns:
+        tuple[Tensor, Tensor, Tensor]: The indices in ``bboxes1`` and
+        ``bboxes2`` and the overlaps of the pairs with positive overlaps,
+        each has shape (k, ).
+    """
+    assert mode in ['iou', 'iof'], \
+        f'sparse overlaps only support iou and iof, but got {mode}'
+    inds1, inds2 = grid_candidate_pairs(bboxes1, bboxes2)
+    if overlaps_fn is None:
+        overlaps = bbox_overlaps(
+            bboxes1[inds1], bboxes2[inds2], mode, is_aligned=True, eps=eps)
+    else:
+        overlaps = overlaps_fn(
+            bboxes1[inds1], bboxes2[inds2], mode=mode, is_aligned=True)
+    valid = overlaps > 0
+    return inds1[valid], inds2[valid], overlaps[valid]
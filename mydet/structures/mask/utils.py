@@ -1191,3 +1191,400 @@ def bitmap_to_polygon(bitmap):
     with_hole = (hierarchy.reshape(-1, 4)[:, 3] >= 0).any()
     contours = [c.reshape(-1, 2) for c in contours]
     return contours, with_hole
+
+
+class RLEMasks(BaseInstanceMasks):
+    """This class represents masks in the form of compressed COCO RLE.
+
+    The RLEs are never modified, axis-aligned geometric transforms (resize,
+    flip, pad, crop, translate and expand) are composed into a 3x3 matrix
+    from the RLE frame to the current canvas instead. Only the pixels inside
+    ``region`` of the canvas can be foreground, which is how crops are kept
+    when the canvas is padded again later. The masks are decoded only by
+    :meth:`to_ndarray` or, for mask targets, directly at the RoI size by
+    :meth:`crop_and_resize`, so a sample carries a few bytes per instance
+    instead of one H x W bitmap.
+
+    Args:
+        masks (list[dict]): Compressed RLEs of the same size, see
+            ``pycocotools.mask``.
+        height (int): height of masks
+        width (int): width of masks
+        matrix (ndarray, optional): The 3x3 matrix from the RLE frame to the
+            masks, in pixel-edge coordinates. Defaults to the identity.
+        region (ndarray, optional): The region (x1, y1, x2, y2) of the masks
+            which may be foreground. Defaults to the whole RLE frame
+            projected to the masks.
+
+    Example:
+        >>> import pycocotools.mask as maskUtils
+        >>> bitmaps = np.zeros((2, 32, 32), dtype=np.uint8)
+        >>> bitmaps[0, 4:10, 4:20] = 1
+        >>> rles = maskUtils.encode(np.asfortranarray(bitmaps.transpose(1, 2, 0)))
+        >>> self = RLEMasks(rles, 32, 32)
+        >>> new = self.resize((64, 64)).flip().crop(np.array([0, 0, 48, 48]))
+        >>> assert new.to_ndarray().shape == (2, 48, 48)
+    """  # noqa: E501
+
+    def __init__(self, masks, height, width, matrix=None, region=None):
+        assert isinstance(masks, list)
+        self.masks = masks
+        self.height = height
+        self.width = width
+        if len(masks) > 0:
+            self.src_shape = tuple(int(s) for s in masks[0]['size'])
+            assert all(
+                tuple(rle['size']) == self.src_shape for rle in masks), \
+                'all RLEs should have the same size'
+        else:
+            self.src_shape = (height, width)
+        self.matrix = np.eye(3) if matrix is None else np.asarray(
+            matrix, dtype=np.float64)
+        if region is None:
+            region = self._project_region(
+                self.matrix,
+                np.array([0, 0, self.src_shape[1], self.src_shape[0]],
+                         dtype=np.float64), (height, width))
+        self.region = np.asarray(region, dtype=np.float64)
+
+    @staticmethod
+    def _project_region(matrix, region, out_shape):
+        """Project a region with an axis-aligned matrix and clip it to the
+        canvas."""
+        x1, y1, x2, y2 = region
+        corners = matrix @ np.array([[x1, x2], [y1, y2], [1, 1]])
+        region = np.concatenate(
+            [corners[:2].min(axis=1), corners[:2].max(axis=1)])
+        region[:2] = np.maximum(region[:2], 0)
+        region[2:] = np.minimum(region[2:], [out_shape[1], out_shape[0]])
+        region[2:] = np.maximum(region[2:], region[:2])
+        return region
+
+    def project(self, matrix, out_shape, region=None):
+        """Compose an axis-aligned transform into the masks.
+
+        Args:
+            matrix (ndarray): The 3x3 matrix of the transform, in pixel-edge
+                coordinates.
+            out_shape (tuple[int]): Target (h, w) of the masks.
+            region (ndarray, optional): The region of the canvas which may be
+                foreground. Defaults to the current region projected to the
+                new canvas.
+
+        Returns:
+            RLEMasks: The transformed masks, sharing the RLEs with ``self``.
+        """
+        matrix = np.asarray(matrix, dtype=np.float64)
+        assert matrix[0, 1] == 0 and matrix[1, 0] == 0, \
+            'only axis-aligned transforms are supported by RLEMasks'
+        if region is None:
+            region = self._project_region(matrix, self.region, out_shape)
+        return RLEMasks(self.masks, out_shape[0], out_shape[1],
+                        matrix @ self.matrix, region)
+
+    def __getitem__(self, index):
+        """Index the RLE masks.
+
+        Args:
+            index (int | ndarray | list | slice): The indices.
+
+        Returns:
+            :obj:`RLEMasks`: The indexed RLE masks.
+        """
+        if isinstance(index, np.ndarray):
+            if index.dtype == bool:
+                index = np.where(index)[0]
+            index = index.tolist()
+        if isinstance(index, list):
+            masks = [self.masks[i] for i in index]
+        elif isinstance(index, slice):
+            masks = self.masks[index]
+        else:
+            masks = [self.masks[index]]
+        return RLEMasks(masks, self.height, self.width, self.matrix,
+                        self.region)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i].to_ndarray()[0]
+
+    def __repr__(self):
+        s = self.__class__.__name__ + '('
+        s += f'num_masks={len(self.masks)}, '
+        s += f'height={self.height}, '
+        s += f'width={self.width})'
+        return s
+
+    def __len__(self):
+        """Number of masks."""
+        return len(self.masks)
+
+    def rescale(self, scale, interpolation='nearest'):
+        """See :func:`BaseInstanceMasks.rescale`."""
+        new_w, new_h = mmcv.rescale_size((self.width, self.height), scale)
+        return self.resize((new_h, new_w))
+
+    def resize(self, out_shape, interpolation='nearest'):
+        """See :func:`BaseInstanceMasks.resize`."""
+        matrix = np.diag(
+            [out_shape[1] / self.width, out_shape[0] / self.height, 1.])
+        return self.project(matrix, out_shape)
+
+    def flip(self, flip_direction='horizontal'):
+        """See :func:`BaseInstanceMasks.flip`."""
+        assert flip_direction in ('horizontal', 'vertical', 'diagonal')
+        matrix = np.eye(3)
+        if flip_direction in ('horizontal', 'diagonal'):
+            matrix[0, 0], matrix[0, 2] = -1, self.width
+        if flip_direction in ('vertical', 'diagonal'):
+            matrix[1, 1], matrix[1, 2] = -1, self.height
+        return self.project(matrix, (self.height, self.width))
+
+    def pad(self, out_shape, pad_val=0):
+        """See :func:`BaseInstanceMasks.pad`."""
+        assert pad_val == 0, 'RLEMasks can only be padded with 0'
+        return self.project(np.eye(3), out_shape)
+
+    def crop(self, bbox):
+        """See :func:`BaseInstanceMasks.crop`."""
+        assert isinstance(bbox, np.ndarray)
+        assert bbox.ndim == 1
+
+        # clip the boundary
+        bbox = bbox.copy()
+        bbox[0::2] = np.clip(bbox[0::2], 0, self.width)
+        bbox[1::2] = np.clip(bbox[1::2], 0, self.height)
+        x1, y1, x2, y2 = bbox
+        w = np.maximum(x2 - x1, 1)
+        h = np.maximum(y2 - y1, 1)
+        matrix = np.array([[1, 0, -x1], [0, 1, -y1], [0, 0, 1]])
+        return self.project(matrix, (h, w))
+
+    def crop_and_resize(self,
+                        bboxes,
+                        out_shape,
+                        inds,
+                        device='cpu',
+                        interpolation='bilinear',
+                        binarize=True):
+        """See :func:`BaseInstanceMasks.crop_and_resize`.
+
+        The boxes are projected back to the RLE frame and ``roi_align`` runs
+        on the decoded RLEs, so only the assigned instances are decoded and
+        the transformed full-size bitmaps are never built.
+        """
+        if len(self.masks) == 0 or len(bboxes) == 0:
+            empty_masks = np.empty((0, *out_shape), dtype=np.uint8)
+            return BitmapMasks(empty_masks, *out_shape)
+
+        if isinstance(bboxes, torch.Tensor):
+            bboxes = bboxes.cpu().numpy()
+        if isinstance(inds, torch.Tensor):
+            inds = inds.cpu().numpy()
+        bboxes = np.asarray(bboxes, dtype=np.float64)
+        inds = np.asarray(inds, dtype=np.int64)
+
+        # decode the assigned instances in the RLE frame, pixels outside the
+        # region are background
+        uniq_inds, inv_inds = np.unique(inds, return_inverse=True)
+        src_masks = maskUtils.decode([self.masks[i] for i in uniq_inds])
+        src_masks = np.ascontiguousarray(src_masks.transpose(2, 0, 1))
+        inv_matrix = np.linalg.inv(self.matrix)
+        rx1, ry1, rx2, ry2 = np.round(
+            self._project_region(
+                inv_matrix, self.region,
+                self.src_shape)).astype(np.int64)
+        src_masks[:, :ry1] = 0
+        src_masks[:, ry2:] = 0
+        src_masks[:, :, :rx1] = 0
+        src_masks[:, :, rx2:] = 0
+
+        # the boxes in the RLE frame
+        xs = (bboxes[:, [0, 2]] - self.matrix[0, 2]) / self.matrix[0, 0]
+        ys = (bboxes[:, [1, 3]] - self.matrix[1, 2]) / self.matrix[1, 1]
+        src_bboxes = np.stack(
+            [xs.min(1), ys.min(1), xs.max(1), ys.max(1)], axis=1)
+
+        rois = torch.from_numpy(
+            np.concatenate([inv_inds[:, None], src_bboxes],
+                           axis=1)).float().to(device)
+        gt_masks_th = torch.from_numpy(src_masks).to(device).float()
+        targets = roi_align(gt_masks_th[:, None, :, :], rois, out_shape, 1.0,
+                            0, 'avg', True).squeeze(1)
+        # the RLE frame is flipped with respect to the masks
+        flip_dims = [
+            dim for dim, scale in ((2, self.matrix[0, 0]),
+                                   (1, self.matrix[1, 1])) if scale < 0
+        ]
+        if flip_dims:
+            targets = targets.flip(flip_dims)
+        if binarize:
+            resized_masks = (targets >= 0.5).cpu().numpy()
+        else:
+            resized_masks = targets.cpu().numpy()
+        return BitmapMasks(resized_masks, *out_shape)
+
+    def expand(self, expanded_h, expanded_w, top, left):
+        """See :func:`BaseInstanceMasks.expand`."""
+        matrix = np.array([[1, 0, left], [0, 1, top], [0, 0, 1]])
+        return self.project(matrix, (expanded_h, expanded_w))
+
+    def translate(self,
+                  out_shape,
+                  offset,
+                  direction='horizontal',
+                  border_value=0,
+                  interpolation='bilinear'):
+        """See :func:`BaseInstanceMasks.translate`."""
+        assert border_value is None or border_value == 0, \
+            'Here border_value is not '\
+            f'used, and defaultly should be None or 0. got {border_value}.'
+        matrix = np.eye(3)
+        if direction == 'horizontal':
+            matrix[0, 2] = offset
+        elif direction == 'vertical':
+            matrix[1, 2] = offset
+        return self.project(matrix, out_shape)
+
+    def shear(self,
+              out_shape,
+              magnitude,
+              direction='horizontal',
+              border_value=0,
+              interpolation='bilinear'):
+        """See :func:`BaseInstanceMasks.shear`.
+
+        Shear is not axis-aligned, the masks are decoded to
+        :obj:`BitmapMasks` first.
+        """
+        return self.to_bitmap().shear(out_shape, magnitude, direction,
+                                      border_value, interpolation)
+
+    def rotate(self,
+               out_shape,
+               angle,
+               center=None,
+               scale=1.0,
+               border_value=0,
+               interpolation='bilinear'):
+        """See :func:`BaseInstanceMasks.rotate`.
+
+        Rotation is not axis-aligned, the masks are decoded to
+        :obj:`BitmapMasks` first.
+        """
+        return self.to_bitmap().rotate(out_shape, angle, center, scale,
+                                       border_value, interpolation)
+
+    @property
+    def areas(self):
+        """See :py:attr:`BaseInstanceMasks.areas`.
+
+        The areas are counted in the RLE frame and scaled by the transform.
+        """
+        if len(self.masks) == 0:
+            return np.zeros(0, dtype=np.float64)
+        scale = abs(self.matrix[0, 0] * self.matrix[1, 1])
+        src_region = self._project_region(
+            np.linalg.inv(self.matrix), self.region, self.src_shape)
+        src_h, src_w = self.src_shape
+        if np.allclose(src_region, [0, 0, src_w, src_h], atol=0.5):
+            return maskUtils.area(self.masks).astype(np.float64) * scale
+        # 有裁剪时需要解码，逐个解码以免占用过多内存
+        x1, y1, x2, y2 = np.round(src_region).astype(np.int64)
+        return np.array([
+            maskUtils.decode(rle)[y1:y2, x1:x2].sum() for rle in self.masks
+        ], dtype=np.float64) * scale
+
+    def get_bboxes(self, dst_type='hbb'):
+        """See :func:`BaseInstanceMasks.get_bboxes`.
+
+        The boxes are computed from the RLEs without decoding them.
+        """
+        from ..bbox import get_box_type
+        _, box_type_cls = get_box_type(dst_type)
+        if len(self.masks) == 0:
+            return box_type_cls(np.zeros((0, 4), dtype=np.float32))
+        x, y, w, h = maskUtils.toBbox(self.masks).T
+        corners = self.matrix @ np.stack(
+            [np.stack([x, x + w]),
+             np.stack([y, y + h]),
+             np.ones((2, len(x)))])
+        boxes = np.concatenate(
+            [corners[:2].min(axis=1), corners[:2].max(axis=1)]).T
+        boxes[:, 0::2] = boxes[:, 0::2].clip(self.region[0], self.region[2])
+        boxes[:, 1::2] = boxes[:, 1::2].clip(self.region[1], self.region[3])
+        # empty masks get empty boxes
+        boxes[(w == 0) | (h == 0)] = 0
+        return box_type_cls(boxes.astype(np.float32))
+
+    def to_ndarray(self):
+        """See :func:`BaseInstanceMasks.to_ndarray`.
+
+        The RLEs are decoded in their own frame and warped into the region
+        with one nearest ``cv2.warpAffine`` per 128 masks.
+        """
+        out = np.zeros((len(self.masks), self.height, self.width),
+                       dtype=np.uint8)
+        x1, y1, x2, y2 = np.round(self.region).astype(np.int64)
+        if len(self.masks) == 0 or x2 <= x1 or y2 <= y1:
+            return out
+        # cv2 uses pixel-center coordinates
+        to_edge = np.array([[1, 0, 0.5], [0, 1, 0.5], [0, 0, 1]])
+        to_center = np.array([[1, 0, -0.5 - x1], [0, 1, -0.5 - y1],
+                              [0, 0, 1]])
+        affine = (to_center @ self.matrix @ to_edge)[:2]
+        # cv2 supports at most 128 channels (CV_CN_MAX of OpenCV 5)
+        for start in range(0, len(self.masks), 128):
+            src = maskUtils.decode(self.masks[start:start + 128])
+            warped = cv2.warpAffine(
+                np.ascontiguousarray(src),
+                affine, (int(x2 - x1), int(y2 - y1)),
+                flags=cv2.INTER_NEAREST)
+            warped = warped.reshape(int(y2 - y1), int(x2 - x1), -1)
+            out[start:start + 128, y1:y2, x1:x2] = warped.transpose(2, 0, 1)
+        return out
+
+    def to_tensor(self, dtype, device):
+        """See :func:`BaseInstanceMasks.to_tensor`."""
+        return torch.tensor(self.to_ndarray(), dtype=dtype, device=device)
+
+    def to_bitmap(self):
+        """convert RLE masks to bitmap masks."""
+        return BitmapMasks(self.to_ndarray(), self.height, self.width)
+
+    @classmethod
+    def cat(cls: Type[T], masks: Sequence[T]) -> T:
+        """Concatenate a sequence of masks into one single mask instance.
+
+        Masks with different RLE frames or transforms are re-encoded in the
+        frame of the output masks.
+
+        Args:
+            masks (Sequence[RLEMasks]): A sequence of mask instances.
+
+        Returns:
+            RLEMasks: Concatenated mask instance.
+        """
+        assert isinstance(masks, Sequence)
+        if len(masks) == 0:
+            raise ValueError('masks should not be an empty list.')
+        assert all(isinstance(m, cls) for m in masks)
+        first = masks[0]
+        assert all((m.height, m.width) == (first.height, first.width)
+                   for m in masks)
+
+        same_frame = all(
+            m.src_shape == first.src_shape
+            and np.allclose(m.matrix, first.matrix)
+            and np.allclose(m.region, first.region) for m in masks)
+        if same_frame:
+            mask_list = list(itertools.chain(*[m.masks for m in masks]))
+            return cls(mask_list, first.height, first.width, first.matrix,
+                       first.region)
+        mask_list = []
+        for m in masks:
+            if len(m) > 0:
+                mask_list.extend(
+                    maskUtils.encode(
+                        np.asfortranarray(m.to_ndarray().transpose(1, 2, 0))))
+        return cls(mask_list, first.height, first.width)
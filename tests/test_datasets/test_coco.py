@@ -0,0 +1,217 @@
+import json
+import os
+import os.path as osp
+import pickle
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from mydet.datasets import CocoDataset
+from mydet.datasets.ann_cache import (ColumnarAnnotations,
+                                      ColumnarDataList, SerializedDataList)
+
+
+def _write_coco_json(path):
+    """Three images: a cat, a dog and a wide image with only a crowd cat."""
+    images = [
+        dict(id=1, file_name='a.jpg', width=100, height=80),
+        dict(id=2, file_name='b.jpg', width=60, height=60),
+        dict(id=3, file_name='c.jpg', width=400, height=50),
+    ]
+    annotations = [
+        dict(id=1, image_id=1, category_id=1, bbox=[0, 0, 20, 20], area=400,
+             iscrowd=0),
+        dict(id=2, image_id=2, category_id=2, bbox=[5, 5, 10, 10], area=100,
+             iscrowd=0),
+        dict(id=3, image_id=3, category_id=1, bbox=[0, 0, 30, 30], area=900,
+             iscrowd=1),
+    ]
+    categories = [dict(id=1, name='cat'), dict(id=2, name='dog')]
+    with open(path, 'w') as f:
+        json.dump(
+            dict(
+                images=images,
+                annotations=annotations,
+                categories=categories), f)
+
+
+class TestCocoDataset(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.ann_file = osp.join(self.tmp_dir.name, 'ann.json')
+        _write_coco_json(self.ann_file)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _build(self, **kwargs):
+        kwargs.setdefault('pipeline', [])
+        return CocoDataset(
+            ann_file=self.ann_file,
+            metainfo=dict(classes=('cat', 'dog')),
+            data_prefix=dict(img=''),
+            **kwargs)
+
+    def _img_ids(self, dataset):
+        return [
+            dataset.get_data_info(i)['img_id'] for i in range(len(dataset))
+        ]
+
+    def test_filter_without_columns(self):
+        dataset = self._build(filter_cfg=dict(min_instances=1))
+        self.assertIsNone(dataset.ann_columns)
+        self.assertEqual(self._img_ids(dataset), [1, 2])
+
+    def test_refilter(self):
+        for kwargs in (dict(columnar_ann=True),
+                       dict(ann_cache_dir=osp.join(self.tmp_dir.name,
+                                                   'cache'))):
+            dataset = self._build(
+                filter_cfg=dict(filter_empty_gt=True), **kwargs)
+            self.assertEqual(self._img_ids(dataset), [1, 2, 3])
+
+            dataset.refilter(dict(classes=('dog', )))
+            self.assertEqual(self._img_ids(dataset), [2])
+            np.testing.assert_array_equal(dataset.ann_rows, [1])
+            np.testing.assert_array_equal(
+                dataset.get_img_column('widths'), [60])
+
+            dataset.refilter(dict(max_aspect_ratio=2))
+            self.assertEqual(self._img_ids(dataset), [1, 2])
+
+            # rows index the unfiltered columns, not the current samples
+            dataset.apply_rows(np.array([2, 0]))
+            self.assertEqual(self._img_ids(dataset), [3, 1])
+            self.assertEqual(
+                dataset.get_data_info(0)['instances'][0]['ignore_flag'], 1)
+
+    def test_unfiltered_data_list_is_serialized(self):
+        dataset = self._build(
+            filter_cfg=dict(filter_empty_gt=True), columnar_ann=True)
+        dataset.full_init()
+        unfiltered = dataset._unfiltered_data_list
+        self.assertIsInstance(unfiltered, SerializedDataList)
+        # only byte arrays are kept, no data information dicts
+        for value in vars(unfiltered).values():
+            self.assertIsInstance(value, np.ndarray)
+        self.assertEqual(len(unfiltered), 3)
+        self.assertEqual(unfiltered[2]['img_id'], 3)
+
+    def test_list_and_columnar_filters_agree(self):
+        for filter_cfg in (dict(filter_empty_gt=True, min_size=55),
+                           dict(max_aspect_ratio=2),
+                           dict(min_instances=1), dict(classes=('cat', ))):
+            plain = self._build(filter_cfg=filter_cfg)
+            columnar = self._build(filter_cfg=filter_cfg, columnar_ann=True)
+            self.assertEqual(
+                self._img_ids(plain), self._img_ids(columnar), filter_cfg)
+
+    def test_ann_cache(self):
+        cache_dir = osp.join(self.tmp_dir.name, 'cache')
+        plain = self._build(filter_cfg=dict(filter_empty_gt=True))
+        dataset = self._build(
+            filter_cfg=dict(filter_empty_gt=True), ann_cache_dir=cache_dir)
+        self.assertIsInstance(dataset._unfiltered_data_list, ColumnarDataList)
+        self.assertEqual(len(os.listdir(cache_dir)), 1)
+        for i in range(len(plain)):
+            self.assertEqual(dataset.get_data_info(i), plain.get_data_info(i))
+        # the dumped columns are reopened as memmaps
+        self.assertIsInstance(dataset.ann_columns.bboxes, np.memmap)
+
+        # the same settings hit the cache
+        cached = self._build(
+            filter_cfg=dict(filter_empty_gt=True), ann_cache_dir=cache_dir)
+        self.assertEqual(os.listdir(cache_dir),
+                         [osp.basename(cached.ann_columns.cache_dir)])
+        self.assertEqual(self._img_ids(cached), self._img_ids(dataset))
+        # other filter settings or annotations miss the cache
+        self._build(filter_cfg=dict(min_size=55), ann_cache_dir=cache_dir)
+        self.assertEqual(len(os.listdir(cache_dir)), 2)
+        with open(self.ann_file) as f:
+            coco = json.load(f)
+        coco['images'][0]['width'] = 120
+        with open(self.ann_file, 'w') as f:
+            json.dump(coco, f)
+        changed = self._build(
+            filter_cfg=dict(filter_empty_gt=True), ann_cache_dir=cache_dir)
+        self.assertEqual(len(os.listdir(cache_dir)), 3)
+        self.assertEqual(changed.get_data_info(0)['width'], 120)
+
+    def test_ann_cache_pickle(self):
+        dataset = self._build(
+            ann_cache_dir=osp.join(self.tmp_dir.name, 'cache'))
+        annotations = dataset.ann_columns
+        # only the cache directory is pickled, not the memmapped columns
+        self.assertEqual(annotations.__getstate__(),
+                         dict(cache_dir=annotations.cache_dir))
+        restored = pickle.loads(pickle.dumps(annotations))
+        self.assertIsInstance(restored, ColumnarAnnotations)
+        for name in ColumnarAnnotations.COLUMNS:
+            self.assertIsInstance(getattr(restored, name), np.memmap)
+            np.testing.assert_array_equal(
+                getattr(restored, name), getattr(annotations, name))
+
+        restored = pickle.loads(pickle.dumps(dataset))
+        self.assertEqual(self._img_ids(restored), self._img_ids(dataset))
+
+    def test_ann_cache_with_mask(self):
+        with self.assertRaisesRegex(AssertionError, 'with_mask'):
+            self._build(
+                ann_cache_dir=osp.join(self.tmp_dir.name, 'cache'),
+                pipeline=[
+                    dict(type='LoadImageFromFile'),
+                    dict(type='LoadAnnotations', with_bbox=True,
+                         with_mask=True)
+                ])
+
+    def test_shm_dir(self):
+        shm_dir = osp.join(self.tmp_dir.name, 'shm')
+        os.makedirs(shm_dir)
+        plain = self._build()
+        dataset = self._build(shm_dir=shm_dir)
+        # data_bytes 和 data_address 以只读 memmap 打开 shm_dir 中的文件
+        self.assertIsInstance(dataset.data_bytes, np.memmap)
+        self.assertIsInstance(dataset.data_address, np.memmap)
+        self.assertEqual(len(os.listdir(shm_dir)), 1)
+        self.assertEqual(dataset.data_list, [])
+        self.assertEqual(len(dataset), len(plain))
+        for i in range(len(plain)):
+            self.assertEqual(dataset.get_data_info(i), plain.get_data_info(i))
+
+    def test_parse_data_infos(self):
+        # 覆盖 parse_data_info 中所有的过滤条件
+        annotations = [
+            dict(id=1, image_id=1, category_id=1, bbox=[10, 5, 20.5, 30],
+                 area=600, iscrowd=0, segmentation=[[10, 5, 30, 5, 30, 35]]),
+            dict(id=2, image_id=1, category_id=2, bbox=[90, 70, 30, 30],
+                 area=900, iscrowd=1),
+            dict(id=3, image_id=1, category_id=1, bbox=[0, 0, 5, 5],
+                 area=25, iscrowd=0, ignore=True),
+            # outside of the image
+            dict(id=4, image_id=1, category_id=1, bbox=[100, 0, 5, 5],
+                 area=25, iscrowd=0),
+            dict(id=5, image_id=1, category_id=1, bbox=[0, 0, 5, 5],
+                 area=0, iscrowd=0),
+            dict(id=6, image_id=1, category_id=1, bbox=[0, 0, 0.5, 5],
+                 area=2.5, iscrowd=0),
+            # a category not in the classes
+            dict(id=7, image_id=2, category_id=3, bbox=[0, 0, 5, 5],
+                 area=25, iscrowd=0),
+            dict(id=8, image_id=2, category_id=2, bbox=[-3, -3, 10, 10],
+                 area=100, iscrowd=0, segmentation=[]),
+        ]
+        with open(self.ann_file) as f:
+            coco = json.load(f)
+        coco['annotations'] = annotations
+        coco['categories'].append(dict(id=3, name='bird'))
+        with open(self.ann_file, 'w') as f:
+            json.dump(coco, f)
+
+        dataset = self._build(lazy_init=True)
+        raw_data_infos = dataset._load_raw_data_infos(self.ann_file)
+        expected = [dataset.parse_data_info(info) for info in raw_data_infos]
+        self.assertEqual(dataset.parse_data_infos(raw_data_infos), expected)
+        self.assertEqual([len(info['instances']) for info in expected],
+                         [2, 1, 0])
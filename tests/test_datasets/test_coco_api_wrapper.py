@@ -0,0 +1,54 @@
+import json
+import os.path as osp
+import tempfile
+from unittest import TestCase
+
+from mydet.datasets.api_wrappers import COCO, StreamingCOCO
+
+
+def _write_coco_json(path):
+    images = [
+        dict(id=3, file_name='a.jpg', width=100, height=80),
+        dict(id=1, file_name='b.jpg', width=60, height=60),
+    ]
+    annotations = [
+        dict(id=7, image_id=1, category_id=2, bbox=[0, 0, 5, 5], area=25,
+             iscrowd=0),
+        dict(id=2, image_id=3, category_id=1, bbox=[0, 0, 20, 20], area=400,
+             iscrowd=0),
+        dict(id=5, image_id=3, category_id=2, bbox=[1, 1, 9, 9], area=81,
+             iscrowd=1),
+    ]
+    categories = [dict(id=1, name='cat'), dict(id=2, name='dog')]
+    with open(path, 'w') as f:
+        json.dump(
+            dict(
+                images=images,
+                annotations=annotations,
+                categories=categories), f)
+
+
+class TestStreamingCOCO(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.ann_file = osp.join(self.tmp_dir.name, 'ann.json')
+        _write_coco_json(self.ann_file)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_anns(self):
+        coco = COCO(self.ann_file)
+        streaming = StreamingCOCO(self.ann_file)
+        # the view is built once, not on every access
+        self.assertIs(streaming.anns, streaming.anns)
+        self.assertEqual(len(streaming.anns), len(coco.anns))
+        self.assertEqual(sorted(streaming.anns), sorted(coco.anns))
+        for ann_id, ann in coco.anns.items():
+            self.assertIn(ann_id, streaming.anns)
+            self.assertEqual(streaming.anns[ann_id], ann)
+        self.assertNotIn(4, streaming.anns)
+        with self.assertRaises(KeyError):
+            streaming.anns[4]
+        self.assertEqual(dict(streaming.anns), coco.anns)
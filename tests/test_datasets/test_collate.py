@@ -0,0 +1,49 @@
+from unittest import TestCase
+
+import torch
+
+from mydet.datasets import padded_collate
+from mydet.datasets.collate import _collate_gt_records
+
+
+class TestPaddedCollate(TestCase):
+
+    def test_padded_collate(self):
+        imgs = [
+            torch.randint(0, 255, (3, 10, 13), dtype=torch.uint8),
+            torch.randint(0, 255, (3, 17, 6), dtype=torch.uint8)
+        ]
+        data = padded_collate([dict(inputs=img, data_samples=i)
+                               for i, img in enumerate(imgs)],
+                              pad_size_divisor=8,
+                              pad_value=3)
+        self.assertEqual(data['inputs'].shape, (2, 3, 24, 16))
+        self.assertEqual(data['data_samples'], [0, 1])
+        for img, batch_img in zip(imgs, data['inputs']):
+            h, w = img.shape[1:]
+            self.assertTrue(torch.equal(batch_img[:, :h, :w], img))
+            self.assertTrue((batch_img[:, h:] == 3).all())
+            self.assertTrue((batch_img[:, :, w:] == 3).all())
+
+    def test_collate_gt_records(self):
+        # 每行为 (x1, y1, x2, y2, label, ignore_flag)
+        gt_records = [
+            torch.tensor([[0, 0, 5, 5, 1, 0], [1, 1, 4, 4, 2, 1],
+                          [2, 2, 6, 6, 0, 0]],
+                         dtype=torch.float32),
+            # an image without any instance
+            torch.zeros((0, 6)),
+            # an image with only ignored instances
+            torch.tensor([[3, 3, 7, 7, 1, 1], [0, 1, 2, 3, 0, 1]],
+                         dtype=torch.float32),
+        ]
+        collated = _collate_gt_records(gt_records)
+        self.assertEqual(collated['split_sizes'], [2, 1, 0, 0, 0, 2])
+        chunks = collated['records'].split(collated['split_sizes'])
+        # the order inside each part is kept
+        self.assertTrue(torch.equal(chunks[0], gt_records[0][[0, 2]]))
+        self.assertTrue(torch.equal(chunks[1], gt_records[0][[1]]))
+        self.assertEqual(chunks[2].shape, (0, 6))
+        self.assertEqual(chunks[3].shape, (0, 6))
+        self.assertEqual(chunks[4].shape, (0, 6))
+        self.assertTrue(torch.equal(chunks[5], gt_records[2]))
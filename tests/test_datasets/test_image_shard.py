@@ -0,0 +1,71 @@
+import os.path as osp
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+from PIL import Image
+
+from mydet.datasets.image_shard import (ImageShardReader, ImageShardWriter,
+                                        encode_image)
+from mydet.datasets.transforms import LoadImageFromShard
+
+
+def _write_exif_rotated_jpeg(path):
+    """A 40x100 JPEG whose EXIF orientation rotates it to 100x40."""
+    img = Image.fromarray(np.random.randint(0, 255, (40, 100, 3), np.uint8))
+    exif = Image.Exif()
+    # Orientation: rotate 90 CW
+    exif[0x0112] = 6
+    img.save(path, exif=exif)
+
+
+class TestImageShard(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.img_path = osp.join(self.tmp_dir.name, 'rotated.jpg')
+        _write_exif_rotated_jpeg(self.img_path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _pack(self, mode, scale=None):
+        shard_dir = osp.join(self.tmp_dir.name, f'shards_{mode}')
+        with ImageShardWriter(shard_dir, mode=mode) as writer:
+            payload, ori_shape, shape = encode_image(
+                self.img_path, mode=mode, scale=scale)
+            writer.write(self.img_path, payload, ori_shape, shape)
+        return shard_dir
+
+    def test_encode_exif_rotated(self):
+        _, ori_shape, _ = encode_image(self.img_path, mode='encoded')
+        self.assertEqual(tuple(ori_shape), (100, 40))
+        _, ori_shape, shape = encode_image(self.img_path, mode='decoded')
+        self.assertEqual(tuple(ori_shape), (100, 40))
+        self.assertEqual(tuple(shape[:2]), (100, 40))
+        _, ori_shape, _ = encode_image(
+            self.img_path, mode='encoded', color_type='unchanged')
+        self.assertEqual(tuple(ori_shape), (40, 100))
+
+    def test_load_encoded_exif_rotated(self):
+        shard_dir = self._pack('encoded')
+        self.assertEqual(
+            ImageShardReader(shard_dir).get(self.img_path)[1], (100, 40))
+        results = LoadImageFromShard(shard_dir)(
+            dict(img_path=self.img_path))
+        self.assertEqual(results['img'].shape[:2], (100, 40))
+        self.assertEqual(results['img_shape'], (100, 40))
+        self.assertEqual(results['ori_shape'], (100, 40))
+        self.assertNotIn('load_scale_factor', results)
+        self.assertNotIn('homography_matrix', results)
+
+    def test_load_decoded_exif_rotated(self):
+        shard_dir = self._pack('decoded', scale=(50, 50))
+        results = LoadImageFromShard(shard_dir)(
+            dict(img_path=self.img_path))
+        self.assertEqual(results['img_shape'], (50, 20))
+        self.assertEqual(results['ori_shape'], (100, 40))
+        # 宽高按同样的比例缩放
+        w_scale, h_scale = results['load_scale_factor']
+        self.assertAlmostEqual(w_scale, 0.5)
+        self.assertAlmostEqual(h_scale, 0.5)
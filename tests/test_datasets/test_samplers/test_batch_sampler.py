@@ -0,0 +1,108 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+import numpy as np
+from mmengine.dataset import DefaultSampler
+from torch.utils.data import Dataset
+
+from mydet.datasets.samplers import MultiBucketAspectRatioBatchSampler
+
+
+class DummyDataset(Dataset):
+
+    def __init__(self, length):
+        self.length = length
+        self.shapes = np.random.randint(100, 1000, (length, 2))
+
+    def __len__(self):
+        return self.length
+
+    def get_data_info(self, idx):
+        return dict(width=self.shapes[idx][0], height=self.shapes[idx][1])
+
+
+class ColumnarDummyDataset(DummyDataset):
+
+    def get_data_info(self, idx):
+        raise AssertionError('the shapes should be read from the columns')
+
+    def get_img_column(self, name):
+        return dict(widths=self.shapes[:, 0], heights=self.shapes[:, 1])[name]
+
+
+class TestMultiBucketAspectRatioBatchSampler(TestCase):
+
+    @patch('mmengine.dist.get_dist_info', return_value=(0, 1))
+    def setUp(self, mock):
+        self.length = 100
+        self.dataset = DummyDataset(self.length)
+        self.sampler = DefaultSampler(self.dataset, shuffle=True)
+
+    def _ratios(self, batch):
+        shapes = self.dataset.shapes[batch]
+        return shapes[:, 0] / shapes[:, 1]
+
+    def test_invalid_inputs(self):
+        with self.assertRaises(ValueError):
+            MultiBucketAspectRatioBatchSampler(self.sampler, batch_size=-1)
+        with self.assertRaises(ValueError):
+            MultiBucketAspectRatioBatchSampler(
+                self.sampler, batch_size=2, pool_batches=0)
+        with self.assertRaises(TypeError):
+            MultiBucketAspectRatioBatchSampler(self.dataset, batch_size=2)
+
+    def test_divisible_batch(self):
+        batch_size = 5
+        batch_sampler = MultiBucketAspectRatioBatchSampler(
+            self.sampler, batch_size=batch_size, drop_last=True)
+        batches = list(batch_sampler)
+        self.assertEqual(len(batches), len(batch_sampler))
+        self.assertEqual(len(batch_sampler), self.length // batch_size)
+        for batch in batches:
+            self.assertEqual(len(batch), batch_size)
+        # all but the leftover batches are from the same bucket
+        for batch in batches[:-2]:
+            ratios = self._ratios(batch)
+            self.assertTrue((ratios >= 1).all() or (ratios < 1).all())
+
+    def test_indivisible_batch(self):
+        batch_size = 7
+        batch_sampler = MultiBucketAspectRatioBatchSampler(
+            self.sampler, batch_size=batch_size, drop_last=False)
+        batches = list(batch_sampler)
+        self.assertEqual(len(batches), len(batch_sampler))
+        self.assertEqual(
+            sorted(idx for batch in batches for idx in batch),
+            list(range(self.length)))
+
+    def test_buckets_and_pool(self):
+        batch_size = 4
+        ratio_boundaries = (0.8, 1.25)
+        area_boundaries = (300000, )
+        batch_sampler = MultiBucketAspectRatioBatchSampler(
+            self.sampler,
+            batch_size=batch_size,
+            ratio_boundaries=ratio_boundaries,
+            area_boundaries=area_boundaries,
+            pool_batches=3)
+        self.assertEqual(batch_sampler.num_buckets, 6)
+        batches = list(batch_sampler)
+        self.assertEqual(
+            sorted(idx for batch in batches for idx in batch),
+            list(range(self.length)))
+        bucket_ids = batch_sampler.bucket_ids
+        # a pool of batches is sorted by aspect ratio before splitting
+        for batch in batches:
+            if len(set(bucket_ids[batch].tolist())) == 1:
+                ratios = self._ratios(batch)
+                self.assertTrue((np.diff(ratios) >= 0).all())
+
+    @patch('mmengine.dist.get_dist_info', return_value=(0, 1))
+    def test_columnar_shapes(self, mock):
+        dataset = ColumnarDummyDataset(self.length)
+        sampler = DefaultSampler(dataset, shuffle=False)
+        batch_sampler = MultiBucketAspectRatioBatchSampler(
+            sampler, batch_size=4)
+        np.testing.assert_allclose(batch_sampler.areas,
+                                   dataset.shapes[:, 0] * dataset.shapes[:, 1])
+        self.assertEqual(len(list(batch_sampler)), len(batch_sampler))
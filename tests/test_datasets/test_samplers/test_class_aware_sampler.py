@@ -0,0 +1,139 @@
+import math
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import patch
+
+import numpy as np
+
+from mydet.datasets.samplers import ClassAwareSampler, FastClassAwareSampler
+
+
+class DummyDataset:
+    """Every image has a single label, label 3 has no image."""
+
+    def __init__(self):
+        self.metainfo = dict(classes=('a', 'b', 'c', 'd', 'e'))
+        self.labels = np.array([0] * 12 + [1] * 5 + [2] * 2 + [4])
+        np.random.RandomState(0).shuffle(self.labels)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def get_cat_ids(self, idx):
+        return [int(self.labels[idx])]
+
+
+class ColumnarDummyDataset(DummyDataset):
+    """The same labels stored as annotation columns, with two instances per
+    image and an unused row."""
+
+    def __init__(self):
+        super().__init__()
+        labels = np.repeat(self.labels, 2)
+        self.ann_columns = SimpleNamespace(
+            inst_offsets=np.arange(0, len(labels) + 3, 2),
+            labels=np.concatenate([labels, [3, 3]]))
+        self.ann_rows = np.arange(len(self.labels))
+
+    def get_cat_ids(self, idx):
+        raise AssertionError('the labels should be read from the columns')
+
+
+class TestFastClassAwareSampler(TestCase):
+
+    @patch('mydet.datasets.samplers.class_aware_sampler.get_dist_info',
+           return_value=(0, 1))
+    def setUp(self, mock):
+        self.dataset = DummyDataset()
+        self.sampler = FastClassAwareSampler(self.dataset, seed=0)
+
+    def test_cat2imgs(self):
+        for i in range(5):
+            np.testing.assert_array_equal(
+                self.sampler.cat_dict[i], np.flatnonzero(
+                    self.dataset.labels == i))
+        self.assertEqual(self.sampler.valid_cat_inds, [0, 1, 2, 4])
+
+        with patch(
+                'mydet.datasets.samplers.class_aware_sampler.get_dist_info',
+                return_value=(0, 1)):
+            sampler = FastClassAwareSampler(ColumnarDummyDataset(), seed=0)
+        for i in range(5):
+            np.testing.assert_array_equal(sampler.cat_dict[i],
+                                          self.sampler.cat_dict[i])
+
+    def test_class_aware(self):
+        labels = self.dataset.labels
+        indices = list(self.sampler)
+        self.assertEqual(len(indices), len(self.sampler))
+        self.assertEqual(len(indices), len(self.dataset))
+        # every bin is a permutation of the valid labels
+        bins = labels[indices].reshape(-1, 4)
+        for bin_labels in bins:
+            self.assertEqual(sorted(bin_labels), [0, 1, 2, 4])
+        # the images of a label are drawn from a cycle of permutations
+        for label in (0, 1, 2, 4):
+            seq = [idx for idx in indices if labels[idx] == label]
+            imgs = np.flatnonzero(labels == label)
+            for start in range(0, len(seq), len(imgs)):
+                chunk = seq[start:start + len(imgs)]
+                self.assertEqual(len(set(chunk)), len(chunk))
+                self.assertTrue(set(chunk) <= set(imgs.tolist()))
+
+        # the same epoch gives the same indices, another epoch does not
+        self.assertEqual(list(self.sampler), indices)
+        self.sampler.set_epoch(1)
+        self.assertNotEqual(list(self.sampler), indices)
+
+    @patch('mydet.datasets.samplers.class_aware_sampler.get_dist_info',
+           return_value=(0, 1))
+    def test_same_distribution(self, mock):
+        labels = self.dataset.labels
+        for num_sample_class in (1, 2):
+            sampler = FastClassAwareSampler(
+                self.dataset, seed=0, num_sample_class=num_sample_class)
+            ref_sampler = ClassAwareSampler(
+                self.dataset, seed=0, num_sample_class=num_sample_class)
+            for epoch in range(3):
+                sampler.set_epoch(epoch)
+                ref_sampler.set_epoch(epoch)
+                indices = list(sampler)
+                ref_indices = list(ref_sampler)
+                self.assertEqual(len(indices), len(ref_indices))
+                # the labels of the full bins are the same
+                bin_size = 4 * num_sample_class
+                num_full = len(indices) // bin_size * bin_size
+                self.assertEqual(
+                    np.bincount(labels[indices[:num_full]],
+                                minlength=5).tolist(),
+                    np.bincount(labels[ref_indices[:num_full]],
+                                minlength=5).tolist())
+            # num_sample_class images of the same label are drawn in a row
+            pairs = labels[indices][:16].reshape(-1, num_sample_class)
+            self.assertTrue((pairs == pairs[:, :1]).all())
+
+    @patch('mydet.datasets.samplers.class_aware_sampler.get_dist_info',
+           return_value=(0, 1))
+    def test_repeat_factor(self, mock):
+        sampler = FastClassAwareSampler(
+            self.dataset, seed=0, sample_mode='repeat_factor', repeat_thr=0.3)
+        cat_repeat = {
+            0: 1.0,
+            1: math.sqrt(0.3 / 0.25),
+            2: math.sqrt(0.3 / 0.1),
+            4: math.sqrt(0.3 / 0.05)
+        }
+        expected = [cat_repeat[label] for label in self.dataset.labels]
+        np.testing.assert_allclose(sampler.repeat_factors, expected)
+        self.assertEqual(len(sampler), math.ceil(sum(expected)))
+
+        indices = list(sampler)
+        self.assertEqual(len(indices), len(sampler))
+        # the repeat factors are stochastically rounded every epoch
+        num_repeats = [0] * len(self.dataset)
+        for epoch in range(200):
+            for idx in sampler._repeat_factor_indices(
+                    np.random.default_rng(epoch)):
+                num_repeats[idx] += 1
+        np.testing.assert_allclose(
+            np.array(num_repeats) / 200, expected, atol=0.15)
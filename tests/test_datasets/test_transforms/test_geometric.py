@@ -0,0 +1,72 @@
+import unittest
+
+import numpy as np
+from mmengine.dataset import Compose
+
+from mydet.datasets.transforms.geometric import (LazyGeometricCompose,
+                                                 add_lazy_geometric)
+
+
+class _LazyFlip:
+    supports_lazy_geometric = True
+
+    def __call__(self, results):
+        h, w = results['img_shape']
+        matrix = np.array([[-1, 0, w], [0, 1, 0], [0, 0, 1]])
+        return add_lazy_geometric(results, matrix, (h, w))
+
+
+class _RecordImage:
+
+    def __init__(self):
+        self.seen = None
+
+    def __call__(self, results):
+        self.seen = results['img'].copy()
+        return results
+
+
+class _LazyResize(_LazyFlip):
+
+    def __init__(self, lazy):
+        self.lazy = lazy
+
+
+class _RandomChoice:
+
+    def __init__(self, transforms):
+        self.transforms = [Compose(t) for t in transforms]
+
+
+class TestLazyGeometricCompose(unittest.TestCase):
+
+    def setUp(self):
+        img = np.arange(12, dtype=np.uint8).reshape(3, 4, 1)
+        self.results = dict(img=img, img_shape=img.shape[:2])
+
+    def test_materialize_before_unaware_transform(self):
+        record = _RecordImage()
+        pipeline = LazyGeometricCompose([_LazyFlip(), record])
+        results = pipeline(self.results.copy())
+        self.assertNotIn('lazy_geom', results)
+        expected = self.results['img'][:, ::-1]
+        np.testing.assert_array_equal(record.seen.reshape(3, 4),
+                                      expected.reshape(3, 4))
+
+    def test_keep_pending_between_lazy_transforms(self):
+        pipeline = LazyGeometricCompose([_LazyFlip(), _LazyFlip()])
+        results = pipeline(self.results.copy())
+        self.assertIn('lazy_geom', results)
+        np.testing.assert_array_equal(results['lazy_geom']['matrix'],
+                                      np.eye(3))
+        self.assertIs(results['img'], self.results['img'])
+
+    def test_nested_lazy_transform(self):
+        LazyGeometricCompose(
+            [_LazyResize(lazy=True),
+             _RandomChoice([[_LazyResize(lazy=False)]])])
+        with self.assertRaisesRegex(ValueError, 'nested in _RandomChoice'):
+            LazyGeometricCompose(
+                [_RandomChoice([[_RecordImage()],
+                                [_RecordImage(),
+                                 _LazyResize(lazy=True)]])])
@@ -0,0 +1,52 @@
+import os.path as osp
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+from PIL import Image
+
+from mydet.datasets.transforms import LoadReducedImageFromFile
+
+
+def _write_jpeg(path, h, w, orientation=1):
+    img = Image.fromarray(np.random.randint(0, 255, (h, w, 3), np.uint8))
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    img.save(path, exif=exif)
+
+
+class TestLoadReducedImageFromFile(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _load(self, orientation, **kwargs):
+        img_path = osp.join(self.tmp_dir.name, f'{orientation}.jpg')
+        _write_jpeg(img_path, 400, 1000, orientation)
+        transform = LoadReducedImageFromFile(**kwargs)
+        return transform(dict(img_path=img_path))
+
+    def test_reduce(self):
+        results = self._load(1, scale=(300, 100))
+        self.assertEqual(results['img_shape'], (100, 250))
+        self.assertEqual(results['ori_shape'], (400, 1000))
+        self.assertEqual(results['load_scale_factor'], (0.25, 0.25))
+
+        results = self._load(1, scale=(500, 100), keep_ratio=False)
+        self.assertEqual(results['img_shape'], (200, 500))
+
+    def test_reduce_exif_rotated(self):
+        # 旋转 90° 后为 1000x400，降采样倍数按旋转后的大小选择
+        results = self._load(6, scale=(200, 500), keep_ratio=False)
+        self.assertEqual(results['img'].shape, (500, 200, 3))
+        self.assertEqual(results['ori_shape'], (1000, 400))
+        self.assertEqual(results['load_scale_factor'], (0.5, 0.5))
+
+        # 按旋转前的大小会选择 4 倍，解码后宽度小于 Resize 的目标宽度
+        results = self._load(6, scale=(250, 100), keep_ratio=False)
+        self.assertEqual(results['img'].shape, (1000, 400, 3))
+        self.assertEqual(results['ori_shape'], (1000, 400))
+        self.assertNotIn('load_scale_factor', results)
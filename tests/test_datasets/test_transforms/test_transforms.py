@@ -0,0 +1,136 @@
+import copy
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from mydet.datasets.transforms import CachedMixUp, CachedMosaic, MixUp, Mosaic
+from mydet.datasets.transforms.geometric import add_lazy_geometric
+from mydet.datasets.transforms.transforms import _ResultsCache
+from mydet.structures.bbox import HorizontalBoxes
+
+
+def _make_results(h=20, w=30, label=0, seed=0):
+    rng = np.random.RandomState(seed)
+    img = rng.randint(0, 255, (h, w, 3)).astype(np.uint8)
+    return dict(
+        img=img,
+        img_shape=(h, w),
+        gt_bboxes=HorizontalBoxes(
+            np.array([[2, 3, 12, 15], [10, 1, w, h]], dtype=np.float32)),
+        gt_bboxes_labels=np.array([label, label + 1], dtype=np.int64),
+        gt_ignore_flags=np.array([0, 1], dtype=bool))
+
+
+def _assert_boxes_inside(testcase, results):
+    h, w = results['img'].shape[:2]
+    bboxes = results['gt_bboxes'].numpy()
+    testcase.assertTrue((bboxes[:, 0::2] >= 0).all())
+    testcase.assertTrue((bboxes[:, 0::2] <= w).all())
+    testcase.assertTrue((bboxes[:, 1::2] >= 0).all())
+    testcase.assertTrue((bboxes[:, 1::2] <= h).all())
+    testcase.assertEqual(
+        len(bboxes), len(results['gt_bboxes_labels']))
+    testcase.assertEqual(len(bboxes), len(results['gt_ignore_flags']))
+
+
+class TestMosaic(unittest.TestCase):
+
+    def test_transform(self):
+        np.random.seed(0)
+        transform = Mosaic(img_scale=(10, 12))
+        results = _make_results()
+        results['mix_results'] = [
+            _make_results(16, 8, label=2 * i, seed=i) for i in range(1, 4)
+        ]
+        results = transform(results)
+        self.assertEqual(results['img'].shape, (24, 20, 3))
+        self.assertEqual(results['img_shape'], (24, 20))
+        _assert_boxes_inside(self, results)
+
+    def test_cached(self):
+        np.random.seed(0)
+        transform = CachedMosaic(img_scale=(10, 12), max_cached_images=4)
+        # the first samples only fill the cache
+        for i in range(4):
+            results = transform(_make_results(seed=i))
+            self.assertEqual(results['img'].shape, (20, 30, 3))
+        results = transform(_make_results(seed=4))
+        self.assertEqual(results['img'].shape, (24, 20, 3))
+        self.assertEqual(len(transform.results_cache), 4)
+        _assert_boxes_inside(self, results)
+
+
+class TestMixUp(unittest.TestCase):
+
+    def test_transform(self):
+        np.random.seed(0)
+        transform = MixUp(img_scale=(10, 12), ratio_range=(1.5, 2.0))
+        results = _make_results()
+        results['mix_results'] = [_make_results(16, 8, seed=1)]
+        results = transform(results)
+        self.assertEqual(results['img'].shape, (20, 30, 3))
+        self.assertEqual(results['img'].dtype, np.uint8)
+        _assert_boxes_inside(self, results)
+
+    def test_lazy_geometric_applied_before_mixing(self):
+        transform = CachedMixUp(img_scale=(30, 20), max_cached_images=2)
+        results = _make_results()
+        img = results['img'].copy()
+        h, w = img.shape[:2]
+        add_lazy_geometric(results,
+                           np.array([[-1, 0, w], [0, 1, 0], [0, 0, 1]]),
+                           (h, w))
+        results = transform(results)
+        self.assertNotIn('lazy_geom', results)
+        np.testing.assert_array_equal(results['img'], img[:, ::-1])
+        np.testing.assert_array_equal(transform.results_cache[0]['img'],
+                                      img[:, ::-1])
+        np.testing.assert_allclose(
+            results['gt_bboxes'].numpy()[0], [w - 12, 3, w - 2, 15])
+
+
+class TestResultsCache(unittest.TestCase):
+
+    def test_put(self):
+        cache = _ResultsCache((15, 10), max_cached_images=2, random_pop=False)
+        results = _make_results()
+        entry = cache.put(results)
+        # images are resized to img_scale and copied
+        self.assertEqual(entry['img'].shape, (10, 15, 3))
+        np.testing.assert_allclose(entry['gt_bboxes'].numpy()[0],
+                                   [1, 1.5, 6, 7.5])
+        entry['gt_bboxes_labels'][0] = 9
+        self.assertEqual(results['gt_bboxes_labels'][0], 0)
+
+    def test_fifo_pop(self):
+        cache = _ResultsCache((30, 20), max_cached_images=2, random_pop=False)
+        for label in (0, 10, 20):
+            cache.put(_make_results(label=label))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(
+            [entry['gt_bboxes_labels'][0] for entry in cache.entries],
+            [10, 20])
+
+    def test_random_pop(self):
+        cache = _ResultsCache((30, 20), max_cached_images=2, random_pop=True)
+        for label in (0, 10):
+            cache.put(_make_results(label=label))
+        with mock.patch('numpy.random.randint', return_value=1) as randint:
+            cache.put(_make_results(label=20))
+        randint.assert_called_once_with(0, 3)
+        self.assertEqual(
+            [entry['gt_bboxes_labels'][0] for entry in cache.entries],
+            [0, 20])
+
+    def test_cached_entries_are_not_modified(self):
+        np.random.seed(0)
+        transform = CachedMixUp(img_scale=(30, 20), max_cached_images=2)
+        transform(_make_results(label=0))
+        cached = copy.deepcopy(transform.results_cache.entries)
+        transform(_make_results(label=10))
+        np.testing.assert_array_equal(transform.results_cache[0]['img'],
+                                      cached[0]['img'])
+        np.testing.assert_array_equal(
+            transform.results_cache[0]['gt_bboxes'].numpy(),
+            cached[0]['gt_bboxes'].numpy())
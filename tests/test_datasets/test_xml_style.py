@@ -0,0 +1,61 @@
+import os
+import os.path as osp
+import pickle
+import tempfile
+from unittest import TestCase
+
+from mydet.datasets import XMLDataset
+
+_XML = """<annotation>
+    <size><width>{w}</width><height>{h}</height><depth>3</depth></size>
+    <object>
+        <name>{name}</name>
+        <difficult>0</difficult>
+        <bndbox><xmin>1</xmin><ymin>2</ymin><xmax>30</xmax><ymax>40</ymax>
+        </bndbox>
+    </object>
+</annotation>
+"""
+
+
+class TestXMLDataset(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        root = self.tmp_dir.name
+        os.makedirs(osp.join(root, 'Annotations'))
+        names = ['cat', 'dog', 'cat', 'bird']
+        for i, name in enumerate(names):
+            with open(osp.join(root, 'Annotations', f'{i}.xml'), 'w') as f:
+                f.write(_XML.format(w=100 + i, h=80, name=name))
+        with open(osp.join(root, 'trainval.txt'), 'w') as f:
+            f.write('\n'.join(str(i) for i in range(len(names))))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _build(self, **kwargs):
+        return XMLDataset(
+            data_root=self.tmp_dir.name,
+            ann_file='trainval.txt',
+            metainfo=dict(classes=('cat', 'dog')),
+            data_prefix=dict(sub_data_root=self.tmp_dir.name),
+            pipeline=[],
+            **kwargs)
+
+    def test_parse_in_process_pool(self):
+        sequential = self._build()
+        parallel = self._build(num_workers=2, worker_type='process')
+        self.assertEqual(len(sequential), 4)
+        for i in range(len(sequential)):
+            self.assertEqual(
+                sequential.get_data_info(i), parallel.get_data_info(i))
+        self.assertEqual(parallel.get_data_info(3)['instances'], [])
+        self.assertEqual(parallel.get_data_info(1)['instances'][0],
+                         dict(ignore_flag=0, bbox=[0, 1, 29, 39],
+                              bbox_label=1))
+
+    def test_parse_func_does_not_pickle_dataset(self):
+        dataset = self._build()
+        parse_func = dataset._get_parse_func()
+        self.assertNotIn(b'XMLDataset', pickle.dumps(parse_func))
@@ -0,0 +1,87 @@
+import json
+import os.path as osp
+import tempfile
+from unittest import TestCase
+from unittest.mock import Mock
+
+import torch
+import torch.nn as nn
+from mmengine.optim import OptimWrapper
+from mmengine.structures import InstanceData
+
+from mydet.engine.hooks import MemoryProfilerHook
+from mydet.structures import DetDataSample
+
+
+def _make_data_batch(shapes, num_gts):
+    data_samples = []
+    for i, ((h, w), num_gt) in enumerate(zip(shapes, num_gts)):
+        data_sample = DetDataSample(
+            metainfo=dict(img_shape=(h, w), img_path=f'{i}.jpg'))
+        data_sample.gt_instances = InstanceData(
+            labels=torch.zeros(num_gt, dtype=torch.long))
+        data_samples.append(data_sample)
+    return dict(
+        inputs=[torch.zeros(3, h, w) for h, w in shapes],
+        data_samples=data_samples)
+
+
+class TestMemoryProfilerHook(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.model = nn.Linear(4, 2)
+        self.runner = Mock()
+        self.runner.log_dir = self.tmp_dir.name
+        self.runner.epoch = 0
+        self.runner.optim_wrapper = OptimWrapper(
+            torch.optim.SGD(self.model.parameters(), lr=0.1))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _train_iter(self, hook, it, data_batch):
+        self.runner.iter = it
+        hook.before_train_iter(self.runner, it, data_batch)
+        loss = self.model(torch.rand(2, 4)).sum()
+        self.runner.optim_wrapper.update_params(loss)
+        hook.after_train_iter(self.runner, it, data_batch)
+
+    def test_memory_profiler(self):
+        hook = MemoryProfilerHook(interval=2, topk=1)
+        hook.before_train(self.runner)
+        self._train_iter(hook, 0, _make_data_batch([(8, 10), (12, 6)],
+                                                   [3, 0]))
+        self._train_iter(hook, 1, _make_data_batch([(20, 20)], [5]))
+        # 每 interval 个 iter 输出一次
+        self.assertEqual(self.runner.logger.info.call_count, 1)
+
+        hook.after_train_epoch(self.runner)
+        log = self.runner.logger.info.call_args[0][0]
+        self.assertIn('Iterations with the highest memory of epoch 1', log)
+        hook.after_train(self.runner)
+
+        with open(osp.join(self.tmp_dir.name, 'memory_profile.jsonl')) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([record['iter'] for record in records], [1, 2])
+        # optim_wrapper 的 backward 和 step 被包装后记录每个阶段
+        for record in records:
+            self.assertEqual(
+                set(record['rss']),
+                {'data', 'forward', 'backward', 'step', 'workers'})
+        batch = records[0]['batch']
+        self.assertEqual(batch['num_imgs'], 2)
+        self.assertEqual(batch['max_shape'], [12, 10])
+        self.assertEqual(batch['pixels'], 8 * 10 + 12 * 6)
+        self.assertEqual(batch['num_gts'], [3, 0])
+        self.assertEqual(batch['img_paths'], ['0.jpg', '1.jpg'])
+
+    def test_batch_stats_with_gt_records(self):
+        data_batch = dict(
+            inputs=torch.zeros(2, 3, 16, 16),
+            data_samples=[DetDataSample(), DetDataSample()],
+            gt_records=dict(
+                records=torch.zeros(6, 6), split_sizes=[2, 1, 0, 3]))
+        batch = MemoryProfilerHook._batch_stats(data_batch)
+        self.assertEqual(batch['max_shape'], [16, 16])
+        self.assertEqual(batch['num_gts'], [2, 0])
@@ -0,0 +1,106 @@
+import json
+import os.path as osp
+import tempfile
+from unittest import TestCase
+from unittest.mock import Mock
+
+import numpy as np
+from mmengine.dataset import Compose
+
+from mydet.engine.hooks import PipelineProfilerHook
+from mydet.engine.hooks.pipeline_profiler_hook import ProfiledCompose
+
+
+class _AddArray:
+
+    def __call__(self, results):
+        results['img'] = np.zeros((4, 8), dtype=np.float32)
+        return results
+
+
+class _DropOdd:
+
+    def __call__(self, results):
+        return None if results['img_id'] % 2 else results
+
+
+class _Identity:
+
+    def __call__(self, results):
+        return results
+
+
+class TestPipelineProfilerHook(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dataset = Mock(spec=['pipeline'])
+        self.dataset.pipeline = Compose(
+            [_AddArray(), _DropOdd(), _Identity()])
+        self.runner = Mock()
+        self.runner.train_dataloader.dataset = Mock(
+            spec=['dataset'], dataset=self.dataset)
+        self.runner.train_dataloader.num_workers = 2
+        self.runner.log_dir = self.tmp_dir.name
+        self.runner.epoch = 0
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_profile(self):
+        hook = PipelineProfilerHook(trace_interval=2)
+        hook.before_train(self.runner)
+        pipeline = self.dataset.pipeline
+        self.assertIsInstance(pipeline, ProfiledCompose)
+        # (num_workers + 1, num_transforms, stats + histogram)
+        self.assertEqual(pipeline.table.shape[:2], (3, 3))
+
+        outputs = [pipeline(dict(img_id=i, img_path=f'{i}.jpg'))
+                   for i in range(4)]
+        self.assertEqual([output is None for output in outputs],
+                         [False, True, False, True])
+        counters = pipeline.table.numpy()
+        # 主进程写第 0 行，被丢弃的样本不再执行后面的变换
+        np.testing.assert_array_equal(counters[0, :, 0], [4, 4, 2])
+        np.testing.assert_array_equal(counters[1:], 0)
+        # 输出中 img 的大小为 128 字节，返回 None 时为 0
+        np.testing.assert_array_equal(counters[0, :, 5],
+                                      [4 * 128, 2 * 128, 2 * 128])
+        np.testing.assert_array_equal(counters[0, :, 6:].sum(axis=1),
+                                      counters[0, :, 0])
+
+        hook.after_train_epoch(self.runner)
+        self.assertEqual(pipeline.table.numpy().sum(), 0)
+        log = self.runner.logger.info.call_args[0][0]
+        for name in ('0:_AddArray', '1:_DropOdd', '2:_Identity'):
+            self.assertIn(name, log)
+
+        trace_file = osp.join(self.tmp_dir.name, 'pipeline_profile',
+                              'pipeline_trace_epoch_1.json')
+        with open(trace_file) as f:
+            events = json.load(f)['traceEvents']
+        self.assertEqual(events[0]['ph'], 'M')
+        samples = [event for event in events if event['name'] == 'sample']
+        # one of every two samples is traced
+        self.assertEqual([event['args']['img_id'] for event in samples],
+                         [0, 2])
+        self.assertEqual(
+            sum(event['name'] == '2:_Identity' for event in events), 2)
+
+        # 下一个 epoch 只合并新的事件
+        pipeline(dict(img_id=4))
+        self.runner.epoch = 1
+        hook.after_train_epoch(self.runner)
+        with open(trace_file.replace('epoch_1', 'epoch_2')) as f:
+            events = json.load(f)['traceEvents']
+        samples = [event for event in events if event['name'] == 'sample']
+        self.assertEqual([event['args']['img_id'] for event in samples], [4])
+        self.assertEqual(events[0]['ph'], 'M')
+
+    def test_without_pipeline(self):
+        self.runner.train_dataloader.dataset = Mock(spec=[])
+        hook = PipelineProfilerHook()
+        hook.before_train(self.runner)
+        self.runner.logger.warning.assert_called_once()
+        hook.after_train_epoch(self.runner)
+        self.runner.logger.info.assert_not_called()
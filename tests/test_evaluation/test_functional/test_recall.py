@@ -0,0 +1,100 @@
+from unittest import TestCase
+
+import numpy as np
+
+from mydet.evaluation.functional import bbox_overlaps, eval_recalls
+
+
+def _random_boxes(rng, num, size=100):
+    xy = rng.uniform(0, size, (num, 2))
+    wh = rng.uniform(1, size / 2, (num, 2))
+    return np.concatenate([xy, xy + wh], axis=1)
+
+
+def _brute_force_iou(box1, box2, extra_length):
+    w = min(box1[2], box2[2]) - max(box1[0], box2[0]) + extra_length
+    h = min(box1[3], box2[3]) - max(box1[1], box2[1]) + extra_length
+    overlap = max(w, 0) * max(h, 0)
+    area1 = (box1[2] - box1[0] + extra_length) * (
+        box1[3] - box1[1] + extra_length)
+    area2 = (box2[2] - box2[0] + extra_length) * (
+        box2[3] - box2[1] + extra_length)
+    return overlap / max(area1 + area2 - overlap, 1e-6)
+
+
+def _brute_force_recalls(gts, proposals, proposal_nums, iou_thrs,
+                         extra_length=0):
+    """按定义逐个 proposal 数量计算 recall"""
+    recalls = np.zeros((len(proposal_nums), len(iou_thrs)))
+    num_gts = sum(len(gt) for gt in gts)
+    for i, num in enumerate(proposal_nums):
+        best_ious = []
+        for gt, props in zip(gts, proposals):
+            if props.shape[1] == 5:
+                props = props[np.argsort(props[:, 4])[::-1]]
+            props = props[:num]
+            for box in gt:
+                best_ious.append(
+                    max([
+                        _brute_force_iou(box, prop, extra_length)
+                        for prop in props
+                    ],
+                        default=0))
+        for j, thr in enumerate(iou_thrs):
+            recalls[i, j] = np.sum(np.array(best_ious) >= thr) / num_gts
+    return recalls
+
+
+class TestEvalRecalls(TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.gts, self.proposals = [], []
+        for num_gts, num_props in ((5, 30), (0, 10), (3, 0), (8, 50)):
+            gts = _random_boxes(rng, num_gts)
+            # proposals around the GTs and random ones, with scores
+            near = np.repeat(gts, 3, axis=0) + rng.uniform(
+                -8, 8, (num_gts * 3, 4))
+            props = np.concatenate([near, _random_boxes(rng, num_props)])
+            scores = rng.uniform(0, 1, (len(props), 1))
+            self.gts.append(gts)
+            self.proposals.append(np.concatenate([props, scores], axis=1))
+
+    def test_eval_recalls(self):
+        proposal_nums = [1, 5, 20, 100]
+        iou_thrs = [0.3, 0.5, 0.7]
+        expected = _brute_force_recalls(self.gts, self.proposals,
+                                        proposal_nums, iou_thrs)
+        for nproc in (0, 2):
+            recalls = eval_recalls(
+                self.gts,
+                self.proposals,
+                proposal_nums,
+                iou_thrs,
+                nproc=nproc)
+            np.testing.assert_allclose(recalls, expected, atol=1e-6)
+
+    def test_legacy_coordinate(self):
+        proposals = [props[:, :4] for props in self.proposals]
+        expected = _brute_force_recalls(
+            self.gts, proposals, [10, 1000], [0.5], extra_length=1)
+        recalls = eval_recalls(
+            self.gts,
+            proposals, [10, 1000],
+            0.5,
+            use_legacy_coordinate=True)
+        np.testing.assert_allclose(recalls, expected, atol=1e-6)
+
+    def test_no_gt(self):
+        recalls = eval_recalls([np.zeros((0, 4))], [np.zeros((3, 4))], 10)
+        np.testing.assert_array_equal(recalls, np.zeros((1, 1)))
+
+    def test_bbox_overlaps(self):
+        boxes1, boxes2 = self.gts[0], self.proposals[0][:, :4]
+        ious = bbox_overlaps(boxes1, boxes2)
+        self.assertEqual(ious.shape, (len(boxes1), len(boxes2)))
+        for i, box1 in enumerate(boxes1):
+            for j, box2 in enumerate(boxes2):
+                self.assertAlmostEqual(
+                    ious[i, j], _brute_force_iou(box1, box2, 0), places=5)
+        self.assertEqual(bbox_overlaps(boxes1, boxes2[:0]).shape, (5, 0))
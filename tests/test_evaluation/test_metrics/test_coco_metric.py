@@ -0,0 +1,162 @@
+import json
+import os.path as osp
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+import torch
+
+from mydet.datasets.api_wrappers import COCO, COCOeval, IncrementalCOCOeval
+from mydet.evaluation.metrics.coco_metric import CocoMetric
+
+
+def _make_coco_json(path, seed=0):
+    """Write a small synthetic GT set with crowd, small, medium and large
+    boxes, and return random detections around the boxes."""
+    rng = np.random.RandomState(seed)
+    images, annotations, detections = [], [], []
+    categories = [dict(id=cat_id, name=f'cls{cat_id}') for cat_id in (1, 3)]
+    # GT 的 id 从 0 开始，覆盖 COCOeval 对 id 为 0 的 GT 的处理
+    ann_id = 0
+    for img_id in (5, 1, 2, 7):
+        images.append(dict(id=img_id, file_name=f'{img_id}.jpg',
+                           width=300, height=300))
+        for _ in range(rng.randint(0, 6)):
+            x, y = rng.uniform(0, 150, 2)
+            w, h = rng.choice([6, 20, 60, 140]) * rng.uniform(0.8, 1.2, 2)
+            cat_id = int(rng.choice([1, 3]))
+            annotations.append(
+                dict(id=ann_id, image_id=img_id, category_id=cat_id,
+                     bbox=[x, y, w, h], area=w * h,
+                     iscrowd=int(ann_id % 5 == 3)))
+            ann_id += 1
+            for _ in range(rng.randint(0, 3)):
+                jitter = rng.uniform(-0.2, 0.2, 4) * [w, h, w, h]
+                detections.append(
+                    dict(image_id=img_id, category_id=cat_id,
+                         bbox=(np.array([x, y, w, h]) + jitter).tolist(),
+                         score=float(rng.uniform())))
+        # false positives, including a category without any GT
+        for _ in range(rng.randint(0, 4)):
+            x, y = rng.uniform(0, 200, 2)
+            w, h = rng.uniform(5, 100, 2)
+            detections.append(
+                dict(image_id=img_id, category_id=int(rng.choice([1, 3])),
+                     bbox=[x, y, w, h], score=float(rng.uniform())))
+    with open(path, 'w') as f:
+        json.dump(
+            dict(
+                images=images,
+                annotations=annotations,
+                categories=categories), f)
+    return detections
+
+
+def _evaluate_records(coco_eval, detections):
+    records = []
+    for img_id in coco_eval.params.imgIds:
+        dets = [det for det in detections if det['image_id'] == img_id]
+        records.append(
+            coco_eval.evaluate_img(img_id,
+                                   [det['category_id'] for det in dets],
+                                   [det['score'] for det in dets],
+                                   np.array([det['bbox'] for det in dets])))
+    return records
+
+
+class TestIncrementalCOCOeval(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.ann_file = osp.join(self.tmp_dir.name, 'ann.json')
+        self.detections = _make_coco_json(self.ann_file)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _assert_eval_equal(self, coco_eval, ref_eval):
+        for key in ('precision', 'recall', 'scores'):
+            np.testing.assert_array_equal(coco_eval.eval[key],
+                                          ref_eval.eval[key])
+        np.testing.assert_array_equal(coco_eval.stats, ref_eval.stats)
+
+    def test_accumulate(self):
+        coco_gt = COCO(self.ann_file)
+        ref_eval = COCOeval(coco_gt, coco_gt.loadRes(self.detections),
+                            'bbox')
+        ref_eval.evaluate()
+        ref_eval.accumulate()
+        ref_eval.summarize()
+
+        for nproc in (0, 1, 2):
+            coco_eval = IncrementalCOCOeval(coco_gt, 'bbox')
+            records = _evaluate_records(coco_eval, self.detections)
+            # 记录的顺序与图片顺序无关
+            coco_eval.accumulate(records[::-1], nproc=nproc)
+            coco_eval.summarize()
+            self._assert_eval_equal(coco_eval, ref_eval)
+
+    def test_accumulate_with_params(self):
+        coco_gt = COCO(self.ann_file)
+        ref_eval = COCOeval(coco_gt, coco_gt.loadRes(self.detections),
+                            'bbox')
+        coco_eval = IncrementalCOCOeval(coco_gt, 'bbox')
+        for params in (ref_eval.params, coco_eval.params):
+            params.imgIds = [7, 1, 5]
+            params.maxDets = [3, 1, 100]
+            params.iouThrs = [0.5, 0.75]
+        ref_eval.evaluate()
+        ref_eval.accumulate()
+        records = _evaluate_records(coco_eval, self.detections)
+        coco_eval.accumulate(records, nproc=2)
+        for key in ('precision', 'recall', 'scores'):
+            np.testing.assert_array_equal(coco_eval.eval[key],
+                                          ref_eval.eval[key])
+
+
+class TestCocoMetric(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.ann_file = osp.join(self.tmp_dir.name, 'ann.json')
+        self.detections = _make_coco_json(self.ann_file)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _data_samples(self):
+        coco = COCO(self.ann_file)
+        cat_ids = coco.get_cat_ids()
+        data_samples = []
+        for img_id in coco.get_img_ids():
+            dets = [det for det in self.detections
+                    if det['image_id'] == img_id]
+            bboxes = np.array([det['bbox'] for det in dets],
+                              dtype=np.float32).reshape(-1, 4)
+            bboxes[:, 2:] += bboxes[:, :2]
+            data_samples.append(
+                dict(
+                    img_id=img_id,
+                    ori_shape=(300, 300),
+                    pred_instances=dict(
+                        bboxes=torch.from_numpy(bboxes),
+                        scores=torch.tensor(
+                            [det['score'] for det in dets]),
+                        labels=torch.tensor(
+                            [cat_ids.index(det['category_id'])
+                             for det in dets],
+                            dtype=torch.long))))
+        return data_samples
+
+    def test_incremental(self):
+        data_samples = self._data_samples()
+        eval_results = []
+        for kwargs in (dict(), dict(incremental=True),
+                       dict(incremental=True, nproc=2)):
+            metric = CocoMetric(
+                ann_file=self.ann_file, classwise=True, **kwargs)
+            metric.dataset_meta = dict(classes=('cls1', 'cls3'))
+            metric.process({}, data_samples)
+            eval_results.append(metric.evaluate(size=len(data_samples)))
+        self.assertEqual(eval_results[1], eval_results[0])
+        self.assertEqual(eval_results[2], eval_results[0])
@@ -0,0 +1,145 @@
+import copy
+from unittest import TestCase
+
+import mmcv
+import numpy as np
+import torch
+from mmengine.dataset import pseudo_collate
+
+from mydet.datasets import padded_collate
+from mydet.models.data_preprocessors import (BatchPhotoMetricAugment,
+                                             DetDataPreprocessor)
+from mydet.structures import DetDataSample
+
+
+def _make_batch(shapes, gt_records=None):
+    batch = []
+    for i, (h, w) in enumerate(shapes):
+        data_sample = DetDataSample(metainfo=dict(img_shape=(h, w)))
+        data = dict(
+            inputs=torch.randint(0, 255, (3, h, w), dtype=torch.uint8),
+            data_samples=data_sample)
+        if gt_records is not None:
+            data['gt_records'] = gt_records[i]
+        batch.append(data)
+    return batch
+
+
+class TestDetDataPreprocessor(TestCase):
+
+    def test_padded_collate(self):
+        processor = DetDataPreprocessor(
+            mean=[0, 100, 200],
+            std=[1, 2, 3],
+            pad_size_divisor=8,
+            pad_value=7,
+            bgr_to_rgb=True)
+        batch = _make_batch([(10, 13), (17, 6), (16, 16)])
+
+        expected = processor(pseudo_collate(copy.deepcopy(batch)))
+        outputs = processor(padded_collate(batch, pad_size_divisor=8))
+        self.assertEqual(outputs['inputs'].shape, (3, 3, 24, 16))
+        torch.testing.assert_close(outputs['inputs'], expected['inputs'],
+                                   rtol=0, atol=0)
+        for data_sample, expected_sample in zip(outputs['data_samples'],
+                                                expected['data_samples']):
+            self.assertEqual(data_sample.pad_shape,
+                             expected_sample.pad_shape)
+            self.assertEqual(data_sample.batch_input_shape,
+                             expected_sample.batch_input_shape)
+        self.assertEqual(
+            [data_sample.pad_shape for data_sample in outputs['data_samples']],
+            [(16, 16), (24, 8), (16, 16)])
+
+    def test_unpack_gt_records(self):
+        processor = DetDataPreprocessor()
+        gt_records = [
+            torch.tensor([[0, 0, 5, 5, 1, 0], [1, 1, 4, 4, 2, 1],
+                          [2, 2, 6, 6, 0, 0]], dtype=torch.float32),
+            torch.zeros((0, 6)),
+            torch.tensor([[3, 3, 7, 7, 1, 1]], dtype=torch.float32),
+        ]
+        batch = _make_batch([(8, 8)] * 3, gt_records)
+        data_samples = processor(padded_collate(batch))['data_samples']
+
+        gt_instances = data_samples[0].gt_instances
+        torch.testing.assert_close(gt_instances.bboxes,
+                                   gt_records[0][[0, 2], :4])
+        self.assertEqual(gt_instances.labels.tolist(), [1, 0])
+        self.assertEqual(gt_instances.labels.dtype, torch.long)
+        ignored_instances = data_samples[0].ignored_instances
+        torch.testing.assert_close(ignored_instances.bboxes,
+                                   gt_records[0][[1], :4])
+        self.assertEqual(ignored_instances.labels.tolist(), [2])
+
+        # an image without any instance
+        self.assertEqual(data_samples[1].gt_instances.bboxes.shape, (0, 4))
+        self.assertEqual(len(data_samples[1].ignored_instances), 0)
+        # an image with only ignored instances
+        self.assertEqual(data_samples[2].gt_instances.bboxes.shape, (0, 4))
+        torch.testing.assert_close(data_samples[2].ignored_instances.bboxes,
+                                   gt_records[2][:, :4])
+
+
+class TestBatchPhotoMetricAugment(TestCase):
+
+    def setUp(self):
+        self.inputs = torch.randint(0, 256, (2, 3, 12, 10)).float()
+        self.data_samples = [
+            DetDataSample(metainfo=dict(img_shape=(12, 10))),
+            DetDataSample(metainfo=dict(img_shape=(7, 6)))
+        ]
+
+    def _build(self, **kwargs):
+        cfg = dict(
+            prob=1.0,
+            brightness=None,
+            contrast=None,
+            saturation=None,
+            hue=None)
+        cfg.update(kwargs)
+        return BatchPhotoMetricAugment(**cfg)
+
+    def test_identity(self):
+        mean, std = [10, 20, 30], [2, 3, 4]
+        normalized = (self.inputs - torch.tensor(mean).view(1, 3, 1, 1)) / \
+            torch.tensor(std).view(1, 3, 1, 1)
+        augment = BatchPhotoMetricAugment(
+            mean=mean, std=std, prob=0, posterize=(2, 4), equalize=True)
+        outputs, data_samples = augment(normalized, self.data_samples)
+        self.assertIs(data_samples, self.data_samples)
+        # the hue rotation matrix is the identity up to rounding errors
+        torch.testing.assert_close(outputs, normalized, rtol=0, atol=1e-3)
+
+    def test_brightness_and_posterize(self):
+        augment = self._build(brightness=(2, 2))
+        outputs, _ = augment(self.inputs)
+        torch.testing.assert_close(outputs, (self.inputs * 2).clamp(0, 255))
+
+        augment = self._build(posterize=(4, 4))
+        outputs, _ = augment(self.inputs)
+        torch.testing.assert_close(outputs, (self.inputs // 16) * 16)
+
+    def test_padding_unchanged(self):
+        augment = self._build(
+            brightness=(0.5, 1.5),
+            contrast=(0.5, 1.5),
+            saturation=(0.5, 1.5),
+            hue=(-18, 18),
+            equalize=True)
+        outputs, _ = augment(self.inputs, self.data_samples)
+        torch.testing.assert_close(outputs[1, :, 7:], self.inputs[1, :, 7:])
+        torch.testing.assert_close(outputs[1, :, :, 6:],
+                                   self.inputs[1, :, :, 6:])
+        self.assertTrue(((outputs >= 0) & (outputs <= 255)).all())
+
+    def test_equalize(self):
+        augment = self._build(equalize=True)
+        outputs, _ = augment(self.inputs, self.data_samples)
+        for img, output, data_sample in zip(self.inputs, outputs,
+                                            self.data_samples):
+            h, w = data_sample.img_shape
+            img = img[:, :h, :w].permute(1, 2, 0).numpy().astype(np.uint8)
+            expected = mmcv.imequalize(img).astype(np.float32)
+            np.testing.assert_array_equal(
+                output[:, :h, :w].permute(1, 2, 0).numpy(), expected)
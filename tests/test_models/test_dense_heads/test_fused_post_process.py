@@ -0,0 +1,77 @@
+from unittest import TestCase
+
+import torch
+from mmengine.config import ConfigDict
+
+from mydet.models.dense_heads import FCOSHead, RetinaHead
+
+# 两张图片的 img_shape 不同，都 pad 到 256，缩放比例各向异性
+BATCH_IMG_METAS = [
+    dict(img_shape=(256, 256), pad_shape=(256, 256), scale_factor=(0.5, 0.8)),
+    dict(img_shape=(200, 240), pad_shape=(256, 256), scale_factor=(1.5, 1.2)),
+]
+
+
+def _test_cfg(**kwargs):
+    cfg = dict(
+        nms_pre=200,
+        min_bbox_size=8,
+        score_thr=0.3,
+        nms=dict(type='nms', iou_threshold=0.5),
+        max_per_img=50)
+    cfg.update(kwargs)
+    return ConfigDict(cfg)
+
+
+class TestFusedPostProcess(TestCase):
+
+    def _check_parity(self, head, outs, cfg):
+        for rescale in (False, True):
+            expected = head.predict_by_feat(
+                *outs,
+                batch_img_metas=BATCH_IMG_METAS,
+                cfg=cfg,
+                rescale=rescale)
+            fused_cfg = cfg.copy()
+            fused_cfg.fused_post_process = True
+            results = head.predict_by_feat(
+                *outs,
+                batch_img_metas=BATCH_IMG_METAS,
+                cfg=fused_cfg,
+                rescale=rescale)
+            self.assertEqual(len(results), len(expected))
+            for result, target in zip(results, expected):
+                self.assertGreater(len(target), 0)
+                for key in ('bboxes', 'scores', 'labels'):
+                    self.assertTrue(
+                        torch.equal(result.get(key), target.get(key)),
+                        f'{key} differs with rescale={rescale}')
+
+    def test_retina_head(self):
+        torch.manual_seed(0)
+        head = RetinaHead(
+            num_classes=4, in_channels=1, stacked_convs=1, feat_channels=1)
+        num_anchors = head.num_base_priors
+        sizes = [256 // stride[0] for stride in head.prior_generator.strides]
+        cls_scores = [
+            torch.randn(2, num_anchors * 4, s, s) - 1 for s in sizes
+        ]
+        bbox_preds = [torch.randn(2, num_anchors * 4, s, s) for s in sizes]
+        self._check_parity(head, (cls_scores, bbox_preds), _test_cfg())
+        self._check_parity(head, (cls_scores, bbox_preds),
+                           _test_cfg(min_bbox_size=-1, nms_pre=-1))
+
+    def test_fcos_head(self):
+        torch.manual_seed(0)
+        head = FCOSHead(
+            num_classes=4,
+            in_channels=1,
+            stacked_convs=1,
+            feat_channels=1,
+            norm_cfg=None)
+        sizes = [256 // stride[0] for stride in head.prior_generator.strides]
+        cls_scores = [torch.randn(2, 4, s, s) for s in sizes]
+        bbox_preds = [torch.rand(2, 4, s, s) * 64 for s in sizes]
+        centernesses = [torch.randn(2, 1, s, s) for s in sizes]
+        self._check_parity(head, (cls_scores, bbox_preds, centernesses),
+                           _test_cfg(score_thr=0.2))
@@ -0,0 +1,80 @@
+from unittest import TestCase
+
+import torch
+
+from mydet.models.layers import batched_multiclass_nms, multiclass_nms
+
+
+def _random_boxes(*shape, img_size=800):
+    xy = torch.rand(*shape, 2) * img_size
+    wh = torch.rand(*shape, 2) * img_size / 4 + 1
+    return torch.cat([xy, xy + wh], dim=-1)
+
+
+class TestBatchedMulticlassNMS(TestCase):
+
+    def _check_parity(self,
+                      num_imgs=3,
+                      num_bboxes=200,
+                      num_classes=4,
+                      per_class_boxes=False,
+                      with_score_factors=False,
+                      nms_cfg=dict(type='nms', iou_threshold=0.5),
+                      max_num=30):
+        torch.manual_seed(0)
+        if per_class_boxes:
+            bboxes = _random_boxes(num_imgs, num_bboxes, num_classes).view(
+                num_imgs, num_bboxes, -1)
+        else:
+            bboxes = _random_boxes(num_imgs, num_bboxes)
+        scores = torch.rand(num_imgs, num_bboxes, num_classes)
+        score_factors = torch.rand(num_imgs, num_bboxes) \
+            if with_score_factors else None
+
+        results = batched_multiclass_nms(
+            bboxes,
+            scores,
+            0.3,
+            nms_cfg,
+            max_num=max_num,
+            score_factors=score_factors,
+            return_inds=True)
+        self.assertEqual(len(results), num_imgs)
+        for i, (dets, labels, inds) in enumerate(results):
+            # multiclass_nms 的分数最后一列是背景
+            img_scores = torch.cat(
+                [scores[i], scores.new_zeros(num_bboxes, 1)], dim=1)
+            expected = multiclass_nms(
+                bboxes[i],
+                img_scores,
+                0.3,
+                nms_cfg,
+                max_num=max_num,
+                score_factors=None
+                if score_factors is None else score_factors[i],
+                return_inds=True)
+            for result, target in zip((dets, labels, inds), expected):
+                self.assertTrue(torch.equal(result, target))
+
+    def test_parity_with_multiclass_nms(self):
+        self._check_parity()
+        self._check_parity(per_class_boxes=True)
+        self._check_parity(with_score_factors=True)
+        self._check_parity(max_num=-1)
+        self._check_parity(
+            nms_cfg=dict(
+                type='nms', iou_threshold=0.5, class_agnostic=True))
+
+    def test_parity_above_split_thr(self):
+        # 每张图片的候选框超过 batched_nms 默认的 split_thr=10000
+        self._check_parity(num_imgs=2, num_bboxes=8000, num_classes=3)
+
+    def test_empty(self):
+        bboxes = _random_boxes(2, 10)
+        scores = torch.zeros(2, 10, 3)
+        results = batched_multiclass_nms(
+            bboxes, scores, 0.3, dict(type='nms', iou_threshold=0.5))
+        self.assertEqual(len(results), 2)
+        for dets, labels in results:
+            self.assertEqual(dets.shape, (0, 5))
+            self.assertEqual(labels.shape, (0, ))
@@ -0,0 +1,37 @@
+from unittest import TestCase
+
+import torch
+from mmengine.structures import InstanceData
+
+from mydet.models.task_modules.assigners import MaxIoUAssigner
+
+
+class TestMaxIoUAssigner(TestCase):
+
+    def test_sparse_with_isolated_gt(self):
+        priors = torch.FloatTensor([
+            [0, 0, 10, 10],
+            [10, 10, 20, 20],
+            [5, 5, 15, 15],
+            [32, 32, 38, 42],
+        ])
+        # the last gt does not intersect any prior
+        gt_bboxes = torch.FloatTensor([
+            [0, 0, 10, 9],
+            [30, 32, 40, 42],
+            [100, 100, 110, 110],
+        ])
+        gt_labels = torch.LongTensor([2, 3, 4])
+        pred_instances = InstanceData(priors=priors)
+        gt_instances = InstanceData(bboxes=gt_bboxes, labels=gt_labels)
+
+        dense = MaxIoUAssigner(pos_iou_thr=0.5, neg_iou_thr=0.5)
+        sparse = MaxIoUAssigner(pos_iou_thr=0.5, neg_iou_thr=0.5, sparse=True)
+        for overlaps_budget in (-1, 4):
+            sparse.overlaps_budget = overlaps_budget
+            expected = dense.assign(pred_instances, gt_instances)
+            result = sparse.assign(pred_instances, gt_instances)
+            self.assertTrue(torch.equal(result.gt_inds, expected.gt_inds))
+            self.assertTrue(torch.equal(result.labels, expected.labels))
+            self.assertTrue(
+                torch.allclose(result.max_overlaps, expected.max_overlaps))
@@ -0,0 +1,98 @@
+from unittest import TestCase
+
+import torch
+
+from mydet.models.task_modules.prior_generators import (AnchorGenerator,
+                                                        MlvlPointGenerator,
+                                                        PriorCache)
+
+
+class TestPriorCache(TestCase):
+
+    def test_get(self):
+        calls = []
+
+        def generate(key):
+
+            def fn():
+                calls.append(key)
+                return [torch.full((2, ), key)]
+
+            return fn
+
+        cache = PriorCache(max_size=2)
+        first = cache.get(0, generate(0))
+        second = cache.get(0, generate(0))
+        self.assertEqual(calls, [0])
+        # 每次返回新的 list，但共享缓存的张量
+        self.assertIsNot(first, second)
+        self.assertIs(first[0], second[0])
+
+        cache.get(1, generate(1))
+        # 访问 0 之后 1 是最久未使用的一项
+        cache.get(0, generate(0))
+        cache.get(2, generate(2))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(calls, [0, 1, 2])
+        cache.get(0, generate(0))
+        self.assertEqual(calls, [0, 1, 2])
+        cache.get(1, generate(1))
+        self.assertEqual(calls, [0, 1, 2, 1])
+
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_disabled(self):
+        calls = []
+        cache = PriorCache(max_size=0)
+        for _ in range(2):
+            cache.get(0, lambda: calls.append(0) or [])
+        self.assertEqual(calls, [0, 0])
+        self.assertEqual(len(cache), 0)
+
+    def test_anchor_generator(self):
+        featmap_sizes = [(8, 10), torch.Size([4, 5])]
+        cached = AnchorGenerator(
+            strides=[8, 16], ratios=[0.5, 1.0], scales=[4], cache_size=2)
+        uncached = AnchorGenerator(
+            strides=[8, 16], ratios=[0.5, 1.0], scales=[4], cache_size=0)
+        for _ in range(2):
+            anchors = cached.grid_priors(featmap_sizes, device='cpu')
+            flags = cached.valid_flags(featmap_sizes, (60, 70), device='cpu')
+            expected_anchors = uncached.grid_priors(
+                featmap_sizes, device='cpu')
+            expected_flags = uncached.valid_flags(
+                featmap_sizes, (60, 70), device='cpu')
+            for a, b in zip(anchors + flags,
+                            expected_anchors + expected_flags):
+                self.assertTrue(torch.equal(a, b))
+        self.assertEqual(len(cached.prior_cache), 2)
+        self.assertEqual(len(uncached.prior_cache), 0)
+
+        # 不同的 pad_shape 对应不同的 valid flags
+        cached.valid_flags(featmap_sizes, (20, 70), device='cpu')
+        self.assertEqual(len(cached.prior_cache), 2)
+        flags = cached.valid_flags(featmap_sizes, (20, 70), device='cpu')
+        expected_flags = uncached.valid_flags(
+            featmap_sizes, (20, 70), device='cpu')
+        for a, b in zip(flags, expected_flags):
+            self.assertTrue(torch.equal(a, b))
+
+    def test_point_generator(self):
+        featmap_sizes = [(8, 10), (4, 5)]
+        cached = MlvlPointGenerator(strides=[8, 16], cache_size=4)
+        uncached = MlvlPointGenerator(strides=[8, 16], cache_size=0)
+        for with_stride in (False, True, False):
+            points = cached.grid_priors(
+                featmap_sizes, device='cpu', with_stride=with_stride)
+            expected = uncached.grid_priors(
+                featmap_sizes, device='cpu', with_stride=with_stride)
+            for a, b in zip(points, expected):
+                self.assertTrue(torch.equal(a, b))
+        self.assertEqual(len(cached.prior_cache), 2)
+
+        flags = cached.valid_flags(featmap_sizes, (60, 70), device='cpu')
+        expected = uncached.valid_flags(featmap_sizes, (60, 70), device='cpu')
+        for a, b in zip(flags, expected):
+            self.assertTrue(torch.equal(a, b))
+        self.assertEqual(len(cached.prior_cache), 3)
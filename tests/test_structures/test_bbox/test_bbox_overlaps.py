@@ -0,0 +1,96 @@
+from unittest import TestCase
+
+import torch
+
+from mydet.structures.bbox import (bbox_overlaps, bbox_overlaps_max,
+                                   dequantize_overlaps,
+                                   iter_bbox_overlaps_tiles,
+                                   tiled_bbox_overlaps)
+
+
+def _random_boxes(num, size=50):
+    xy = torch.rand(num, 2) * size
+    wh = torch.rand(num, 2) * size / 2 + 1
+    return torch.cat([xy, xy + wh], dim=1)
+
+
+class TestTiledBboxOverlaps(TestCase):
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.bboxes1 = _random_boxes(13)
+        self.bboxes2 = _random_boxes(29)
+
+    def test_iter_tiles(self):
+        covered = torch.zeros(13, 29, dtype=torch.long)
+        for rows, cols, tile in iter_bbox_overlaps_tiles(
+                self.bboxes1, self.bboxes2, max_elems=40):
+            self.assertLessEqual(tile.numel(), 40)
+            covered[rows, cols] += 1
+        self.assertTrue((covered == 1).all())
+
+    def test_tiled_bbox_overlaps(self):
+        for mode in ('iou', 'iof', 'giou'):
+            expected = bbox_overlaps(self.bboxes1, self.bboxes2, mode)
+            for max_elems in (1, 7, 40, 10000):
+                overlaps = tiled_bbox_overlaps(
+                    self.bboxes1, self.bboxes2, mode, max_elems=max_elems)
+                torch.testing.assert_close(overlaps, expected)
+
+            bboxes2 = self.bboxes2[:13]
+            expected = bbox_overlaps(
+                self.bboxes1, bboxes2, mode, is_aligned=True)
+            overlaps = tiled_bbox_overlaps(
+                self.bboxes1, bboxes2, mode, is_aligned=True, max_elems=4)
+            torch.testing.assert_close(overlaps, expected)
+
+    def test_out_dtype(self):
+        for mode, dtype, scale in (('iou', torch.uint8, 255),
+                                   ('iof', torch.uint8, 255),
+                                   ('giou', torch.int8, 127)):
+            expected = bbox_overlaps(self.bboxes1, self.bboxes2, mode)
+            overlaps = tiled_bbox_overlaps(
+                self.bboxes1,
+                self.bboxes2,
+                mode,
+                max_elems=7,
+                out_dtype='int8')
+            self.assertEqual(overlaps.dtype, dtype)
+            # 量化误差不超过半个量化步长
+            dequantized = dequantize_overlaps(overlaps, mode)
+            self.assertLessEqual((dequantized - expected).abs().max(),
+                                 0.5 / scale + 1e-6)
+
+            overlaps = tiled_bbox_overlaps(
+                self.bboxes1, self.bboxes2, mode, out_dtype='fp16')
+            self.assertEqual(overlaps.dtype, torch.float16)
+            torch.testing.assert_close(
+                overlaps.float(), expected, rtol=0, atol=1e-3)
+
+    def test_bbox_overlaps_max(self):
+        # duplicated boxes give ties, which keep the smallest index
+        bboxes1 = torch.cat([self.bboxes1, self.bboxes1[:3]])
+        bboxes2 = torch.cat([self.bboxes2[:5], self.bboxes2])
+        for mode in ('iou', 'iof', 'giou'):
+            overlaps = bbox_overlaps(bboxes1, bboxes2, mode)
+            for max_elems in (1, 7, 100000):
+                results = bbox_overlaps_max(
+                    bboxes1, bboxes2, mode, max_elems=max_elems)
+                for dim, (values, inds) in enumerate(results):
+                    expected_values, expected_inds = overlaps.max(dim=dim)
+                    torch.testing.assert_close(values, expected_values)
+                    self.assertTrue(torch.equal(inds, expected_inds))
+
+            values, inds = bbox_overlaps_max(
+                bboxes1, bboxes2, mode, dims=1, max_elems=7)
+            expected_values, expected_inds = overlaps.max(dim=1)
+            torch.testing.assert_close(values, expected_values)
+            self.assertTrue(torch.equal(inds, expected_inds))
+
+    def test_bbox_overlaps_max_empty(self):
+        (values0, inds0), (values1, inds1) = bbox_overlaps_max(
+            self.bboxes1[:0], self.bboxes2)
+        self.assertTrue((values0 == 0).all() and (inds0 == -1).all())
+        self.assertEqual(values0.shape, (29, ))
+        self.assertEqual(values1.shape, (0, ))
+        self.assertEqual(inds1.shape, (0, ))
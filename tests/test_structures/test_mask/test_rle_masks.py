@@ -0,0 +1,95 @@
+from unittest import TestCase
+
+import numpy as np
+import pycocotools.mask as maskUtils
+
+from mydet.structures.mask import BitmapMasks, RLEMasks
+
+
+def _random_bitmaps(num_masks, height, width, seed=0):
+    rng = np.random.RandomState(seed)
+    bitmaps = np.zeros((num_masks, height, width), dtype=np.uint8)
+    for i in range(num_masks):
+        x1, y1 = rng.randint(0, width // 2), rng.randint(0, height // 2)
+        x2 = rng.randint(x1 + 2, width + 1)
+        y2 = rng.randint(y1 + 2, height + 1)
+        bitmaps[i, y1:y2, x1:x2] = rng.rand(y2 - y1, x2 - x1) > 0.3
+    return bitmaps
+
+
+def _encode(bitmaps):
+    return maskUtils.encode(np.asfortranarray(bitmaps.transpose(1, 2, 0)))
+
+
+class TestRLEMasks(TestCase):
+
+    def setUp(self):
+        self.bitmaps = _random_bitmaps(3, 13, 17)
+        self.rle_masks = RLEMasks(_encode(self.bitmaps), 13, 17)
+        self.bitmap_masks = BitmapMasks(self.bitmaps, 13, 17)
+
+    def _assert_same(self, rle_masks, bitmap_masks):
+        self.assertEqual((rle_masks.height, rle_masks.width),
+                         (bitmap_masks.height, bitmap_masks.width))
+        np.testing.assert_array_equal(rle_masks.to_ndarray(),
+                                      bitmap_masks.to_ndarray())
+
+    def test_to_ndarray(self):
+        self._assert_same(self.rle_masks, self.bitmap_masks)
+        empty = RLEMasks([], 13, 17)
+        self.assertEqual(empty.to_ndarray().shape, (0, 13, 17))
+
+    def test_resize_flip_crop_pad(self):
+        # integer upscaling keeps nearest resizing exact in both classes
+        for direction in ('horizontal', 'vertical', 'diagonal'):
+            bbox = np.array([3, 5, 23, 20])
+            rle = self.rle_masks.resize((26, 34)).flip(direction).crop(
+                bbox).pad((20, 24))
+            bitmap = self.bitmap_masks.resize((26, 34)).flip(
+                direction).crop(bbox).pad((20, 24))
+            self._assert_same(rle, bitmap)
+
+    def test_crop_then_pad(self):
+        # the padding must not bring back the content outside the crop
+        bbox = np.array([2, 3, 9, 11])
+        rle = self.rle_masks.crop(bbox).pad((13, 17))
+        bitmap = self.bitmap_masks.crop(bbox).pad((13, 17))
+        self._assert_same(rle, bitmap)
+        self.assertEqual(rle.to_ndarray()[:, 8:].sum(), 0)
+        np.testing.assert_allclose(rle.areas, bitmap.areas)
+
+    def test_areas(self):
+        np.testing.assert_allclose(self.rle_masks.areas,
+                                   self.bitmap_masks.areas)
+        bbox = np.array([4, 2, 30, 20])
+        rle = self.rle_masks.resize((26, 34)).flip().crop(bbox)
+        bitmap = self.bitmap_masks.resize((26, 34)).flip().crop(bbox)
+        np.testing.assert_allclose(rle.areas, bitmap.areas)
+
+    def test_crop_and_resize_flipped(self):
+        bboxes = np.array([[1.5, 2., 12., 10.], [0., 0., 17., 13.],
+                           [5., 3.5, 9., 12.]])
+        inds = np.array([2, 0, 2])
+        for direction in ('horizontal', 'vertical', 'diagonal'):
+            rle = self.rle_masks.flip(direction).crop_and_resize(
+                bboxes, (7, 7), inds, binarize=False)
+            bitmap = self.bitmap_masks.flip(direction).crop_and_resize(
+                bboxes, (7, 7), inds, binarize=False)
+            np.testing.assert_allclose(
+                rle.to_ndarray(), bitmap.to_ndarray(), atol=1e-5)
+        empty = self.rle_masks.crop_and_resize(
+            np.zeros((0, 4)), (7, 7), np.zeros(0, dtype=np.int64))
+        self.assertEqual(empty.to_ndarray().shape, (0, 7, 7))
+
+    def test_cat(self):
+        # the same frame keeps the RLEs, different frames are re-encoded
+        same = RLEMasks.cat([self.rle_masks[:1], self.rle_masks[1:]])
+        self.assertIs(same.masks[0], self.rle_masks.masks[0])
+        self._assert_same(same, self.bitmap_masks)
+
+        flipped = self.rle_masks.flip()
+        mixed = RLEMasks.cat([flipped, self.rle_masks[:2]])
+        expected = BitmapMasks.cat(
+            [self.bitmap_masks.flip(), self.bitmap_masks[:2]])
+        self.assertEqual(len(mixed), 5)
+        self._assert_same(mixed, expected)
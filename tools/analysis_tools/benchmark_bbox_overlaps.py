@@ -0,0 +1,114 @@
+import argparse
+import os.path as osp
+import sys
+import time
+
+sys.path.append(osp.dirname(osp.dirname(osp.dirname(osp.abspath(__file__)))))
+
+import torch
+
+from mydet.structures.bbox import (bbox_overlaps, bbox_overlaps_max,
+                                   tiled_bbox_overlaps)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='比较 bbox_overlaps 的稠密计算与分块计算的耗时和显存')
+    parser.add_argument('--num-gts', type=int, default=500)
+    parser.add_argument('--num-priors', type=int, default=200000)
+    parser.add_argument('--mode', default='iou', choices=['iou', 'iof', 'giou'])
+    parser.add_argument('--max-elems', type=int, nargs='+',
+        default=[1 << 20, 1 << 22, 1 << 24],
+        help='the tile sizes to benchmark')
+    parser.add_argument('--device', default='cuda' if torch.cuda.is_available()
+        else 'cpu')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    return args
+
+
+def random_boxes(num, img_size, device):
+    xy = torch.rand(num, 2, device=device) * img_size
+    wh = torch.rand(num, 2, device=device) * img_size / 4 + 1
+    return torch.cat([xy, xy + wh], dim=1)
+
+
+def benchmark(name, func, device, repeat):
+    """Run ``func`` and return (name, ms per run, peak MB, result).
+
+    The peak memory is relative to the memory allocated before the runs.
+    """
+    result = func()  # warm up
+    del result
+    if device.type == 'cuda':
+        torch.cuda.synchronize(device)
+        torch.cuda.reset_peak_memory_stats(device)
+        baseline = torch.cuda.memory_allocated(device)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    if device.type == 'cuda':
+        torch.cuda.synchronize(device)
+        peak = (torch.cuda.max_memory_allocated(device) - baseline) / 2**20
+    else:
+        # CPU 上没有分配器的统计
+        peak = float('nan')
+    elapsed = (time.perf_counter() - start) / repeat * 1e3
+    return name, elapsed, peak, result
+
+
+def main():
+    args = parse_args()
+    device = torch.device(args.device)
+    torch.manual_seed(0)
+    gts = random_boxes(args.num_gts, 1333, device)
+    priors = random_boxes(args.num_priors, 1333, device)
+
+    rows = []
+    try:
+        name, ms, peak, dense = benchmark(
+            'dense', lambda: bbox_overlaps(gts, priors, args.mode), device,
+            args.repeat)
+        dense_max = [dense.max(dim=0), dense.max(dim=1)]
+        rows.append((name, ms, peak, 0.))
+        rows.append(
+            benchmark('dense + max',
+                      lambda: [bbox_overlaps(gts, priors, args.mode).max(
+                          dim=d) for d in (0, 1)], device, args.repeat)[:3] +
+            (0., ))
+    except RuntimeError as e:
+        # 稠密计算内存不足
+        print(f'dense: {e}')
+        dense = dense_max = None
+
+    for max_elems in args.max_elems:
+        for out_dtype in (None, 'fp16', 'int8'):
+            name, ms, peak, tiled = benchmark(
+                f'tiled {max_elems} {out_dtype or ""}',
+                lambda: tiled_bbox_overlaps(
+                    gts, priors, args.mode, max_elems=max_elems,
+                    out_dtype=out_dtype), device, args.repeat)
+            if out_dtype == 'int8':
+                tiled = tiled.float() / (127. if args.mode == 'giou' else 255.)
+            err = (tiled.float() - dense).abs().max().item() \
+                if dense is not None else float('nan')
+            rows.append((name, ms, peak, err))
+        name, ms, peak, reduced = benchmark(
+            f'fused max {max_elems}',
+            lambda: bbox_overlaps_max(
+                gts, priors, args.mode, max_elems=max_elems), device,
+            args.repeat)
+        err = float('nan')
+        if dense_max is not None:
+            err = max((v - dv).abs().max().item() + (i != di).sum().item()
+                      for (v, i), (dv, di) in zip(reduced, dense_max))
+        rows.append((name, ms, peak, err))
+
+    print(f'{args.num_gts} x {args.num_priors} {args.mode} on {device}')
+    print(f'{"method":<28}{"ms":>10}{"peak MB":>12}{"max err":>12}')
+    for name, ms, peak, err in rows:
+        print(f'{name:<28}{ms:>10.2f}{peak:>12.1f}{err:>12.2e}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import os.path as osp
+import sys
+from functools import partial
+from multiprocessing import Pool
+
+sys.path.append(osp.dirname(osp.dirname(osp.dirname(osp.abspath(__file__)))))
+
+from mmengine.config import Config, DictAction
+from mmengine.utils import ProgressBar
+
+from mydet.datasets.image_shard import (SHARD_MODES, ImageShardWriter,
+                                        encode_image)
+from mydet.registry import DATASETS
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='将数据集的图片打包成 shard，配合 LoadImageFromShard 使用')
+    parser.add_argument('config', help='config file path')
+    parser.add_argument('out_dir', help='the directory to save the shards')
+    parser.add_argument('--split', default='train',
+        choices=['train', 'val', 'test'], help='which dataloader to pack')
+    parser.add_argument('--mode', default='encoded', choices=SHARD_MODES,
+        help='"encoded" keeps the file bytes, "decoded" stores the pixels')
+    parser.add_argument('--scale', type=int, nargs=2, default=None,
+        help='pre-resize the images to fit in (w, h) with the aspect ratio '
+        'kept, only for the "decoded" mode')
+    parser.add_argument('--color-type', default='color',
+        help='the flag to decode the images, should be the same as the '
+        'color_type of LoadImageFromShard')
+    parser.add_argument('--key-root', default=None,
+        help='store the image paths relative to this directory, the same '
+        'value should be passed to LoadImageFromShard')
+    parser.add_argument('--shard-size', type=int, default=1024,
+        help='size of each shard in MiB')
+    parser.add_argument('--nproc', type=int, default=8,
+        help='number of processes to read and decode the images')
+    parser.add_argument('--cfg-options', nargs='+', action=DictAction,
+        help='override some settings in the used config, the key-value pair '
+        'in xxx=yyy format will be merged into config file.')
+    args = parser.parse_args()
+    return args
+
+
+def main():
+    args = parse_args()
+    cfg = Config.fromfile(args.config)
+    if args.cfg_options is not None:
+        cfg.merge_from_dict(args.cfg_options)
+
+    dataset_cfg = cfg[f'{args.split}_dataloader'].dataset
+    # 只需要图片路径，不需要执行 pipeline
+    dataset_cfg.pipeline = []
+    dataset = DATASETS.build(dataset_cfg)
+    img_paths = [
+        dataset.get_data_info(i)['img_path'] for i in range(len(dataset))
+    ]
+    # 同一张图片可能出现多次，例如 RepeatDataset
+    img_paths = list(dict.fromkeys(img_paths))
+    backend_args = dataset_cfg.get('backend_args', None)
+    scale = tuple(args.scale) if args.scale is not None else None
+    encode = partial(
+        encode_image,
+        mode=args.mode,
+        scale=scale,
+        backend_args=backend_args,
+        color_type=args.color_type)
+
+    progress_bar = ProgressBar(len(img_paths))
+    with ImageShardWriter(
+            args.out_dir, mode=args.mode,
+            shard_size=args.shard_size << 20) as writer, Pool(
+                args.nproc) as pool:
+        # imap 保持顺序，shard 中的图片与数据集的顺序一致，训练时顺序读取
+        for img_path, (payload, ori_shape, shape) in zip(
+                img_paths, pool.imap(encode, img_paths, chunksize=16)):
+            key = img_path if args.key_root is None else osp.relpath(
+                img_path, args.key_root)
+            writer.write(key, payload, ori_shape, shape)
+            progress_bar.update()
+    print(f'\nPacked {len(img_paths)} images into {args.out_dir}')
+
+
+if __name__ == '__main__':
+    main()